@@ -1,8 +1,18 @@
+from src.utils import startup_profile
+from config.settings import FLASK_HOST, FLASK_PORT, FLASK_DEBUG, STARTUP_PROFILE_CONFIG
+
+if STARTUP_PROFILE_CONFIG['enabled']:
+    startup_profile.start_import_profiling()
+
 from flask import Flask
 from src.api.routes import api
-from config.settings import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
-from src.services.dingtalk import send_dingtalk_message
+from src.services.dingtalk_directory import directory
+from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+from src.services.escalation import escalation_manager
+from src.services.health import record_scheduler_heartbeat, record_scheduler_started
 from src.services.excel_handler import get_original_duty_person, get_today_date, get_bug_assignment_person
+from src.services.team_registry import get_team, team_registry
+from src.services.notification_dispatcher import dispatch_combined_notifications, oncall_mention, render_combined_notification
 from src.utils.logger import get_logger, log_execution_time, LogContext
 import schedule
 import time
@@ -18,6 +28,10 @@ _scheduler_started = False
 _scheduler_lock = threading.Lock()
 _process_id = os.getpid()  # 获取当前进程ID
 
+startup_profile.mark("模块导入完成")
+# 只统计本模块的导入；导入 app 而不调用 create_app 的进程（模拟器、脚本）也不会一直保留计时钩子
+startup_profile.stop_import_profiling()
+
 
 def create_app():
     """创建Flask应用"""
@@ -31,64 +45,79 @@ def create_app():
             from src.api.routes import dingtalk_webhook
             return dingtalk_webhook()
 
+        @app.before_request
+        def record_first_request():
+            elapsed = startup_profile.mark_first_request()
+            if elapsed is not None:
+                logger.info("⏱️ [进程%s] 首个请求到达，距启动 %.3f秒", os.getpid(), elapsed)
+
         logger.info("Flask应用创建成功")
-        return app
+
+    startup_profile.mark("Flask应用创建完成")
+    if STARTUP_PROFILE_CONFIG['enabled']:
+        startup_profile.log_startup_report(logger, STARTUP_PROFILE_CONFIG['top_n'])
+    return app
 
 
 @log_execution_time
-def send_bug_assignment_notification(test_data=None):
-    """发送每日禅道指派人员通知"""
+def send_bug_assignment_notification(test_data=None, team=None):
+    """发送每日禅道指派人员通知（team 为 None 时使用默认团队）"""
     logger.info('发送每日禅道指派人员通知')
+    team = team or get_team()
 
     with LogContext("发送禅道指派通知"):
         today = get_today_date()
-        logger.info(f'发送日期：{today}')
-        bug_person = get_bug_assignment_person(today)
+        logger.info('发送日期：%s', today)
+        bug_person = get_bug_assignment_person(today, team)
 
         if bug_person:
-            content = f"【今日禅道指派】\n日期：{today}\n指派人员：{bug_person}"
-            logger.info(f"准备发送钉钉通知，内容：{content}")
+            mention_text, at = team.mention(bug_person)
+            content = f"【今日禅道指派】\n日期：{today}\n指派人员：{bug_person} {mention_text}".rstrip()
+            logger.info("准备发送钉钉通知，内容：%s", content)
 
             # 发送钉钉通知
             try:
-                send_dingtalk_message(content)
-                logger.info(f"✅ 已发送{today}禅道指派通知给{bug_person}")
+                send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret, **at)
+                logger.info("✅ 已发送%s禅道指派通知给%s", today, bug_person)
             except Exception as e:
-                logger.error(f"❌ 发送{today}禅道指派通知失败: {str(e)}")
+                logger.error("❌ 发送%s禅道指派通知失败: %s", today, e)
                 raise
         else:
-            logger.warning(f"⚠️ 未找到{today}的禅道指派人员")
+            logger.warning("⚠️ 未找到%s的禅道指派人员", today)
 
 
 @log_execution_time
-def send_daily_notification(test_data=None):
-    """发送每日值班通知"""
-    logger.info(f"[进程{os.getpid()}] 开始发送值班通知 - {time.strftime('%Y-%m-%d %H:%M:%S')}")
+def send_daily_notification(test_data=None, team=None):
+    """发送每日值班通知（team 为 None 时使用默认团队）"""
+    logger.info("[进程%s] 开始发送值班通知 - %s", os.getpid(), time.strftime('%Y-%m-%d %H:%M:%S'))
+    team = team or get_team()
 
     with LogContext("发送每日值班通知"):
         today = get_today_date()
-        logger.info(f"查询{today}的值班人员")
-        oncall_person = get_original_duty_person(today)
+        logger.info("查询%s的值班人员", today)
+        oncall_person = get_original_duty_person(today, team)
 
         if oncall_person:
-            content = f"【今日值班通知】\n日期：{today}\n值班人：{oncall_person}"
-            logger.info(f"准备发送钉钉通知，内容：{content}")
+            mention_text, at = team.mention(oncall_person)
+            content = f"【今日值班通知】\n日期：{today}\n值班人：{oncall_person} {mention_text}".rstrip()
+            logger.info("准备发送钉钉通知，内容：%s", content)
 
             # 发送钉钉通知
             try:
-                send_dingtalk_message(content)
-                logger.info(f"✅ [进程{os.getpid()}] 已发送{today}值班通知给{oncall_person}")
+                send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret, **at)
+                logger.info("✅ [进程%s] 已发送%s值班通知给%s", os.getpid(), today, oncall_person)
             except Exception as e:
-                logger.error(f"❌ [进程{os.getpid()}] 发送{today}值班通知失败: {str(e)}")
+                logger.error("❌ [进程%s] 发送%s值班通知失败: %s", os.getpid(), today, e)
                 raise
         else:
-            logger.warning(f"⚠️ [进程{os.getpid()}] 未找到{today}的值班人员")
+            logger.warning("⚠️ [进程%s] 未找到%s的值班人员", os.getpid(), today)
 
 
 @log_execution_time
-def send_combined_notification(test_data=None):
-    """发送综合通知（值班+禅道指派）"""
-    logger.info(f"[进程{os.getpid()}] 开始发送综合通知 - {time.strftime('%Y-%m-%d %H:%M:%S')}")
+def send_combined_notification(test_data=None, team=None):
+    """发送综合通知（值班+禅道指派，team 为 None 时使用默认团队）"""
+    logger.info("[进程%s] 开始发送综合通知 - %s", os.getpid(), time.strftime('%Y-%m-%d %H:%M:%S'))
+    team = team or get_team()
 
     with LogContext("发送综合工作安排通知"):
 
@@ -97,35 +126,51 @@ def send_combined_notification(test_data=None):
             logger.debug("使用今天作为目标日期")
         else:
             today = test_data
-            logger.debug(f"使用指定日期: {test_data}")
+            logger.debug("使用指定日期: %s", test_data)
 
-        logger.info(f"查询{today}的工作安排")
+        logger.info("查询团队 %s %s的工作安排", team.team_id, today)
 
-        oncall_person = get_original_duty_person(today)
-        bug_person = get_bug_assignment_person(today)
+        content = render_combined_notification(team, today)
 
-        logger.info(f"值班人员: {oncall_person or '未找到'}, 禅道指派: {bug_person or '未找到'}")
-
-        content_parts = [f"【OnCall】\n日期：{today}"]
-
-        if oncall_person:
-            content_parts.append(f"值班人：{oncall_person}")
-
-        if bug_person:
-            content_parts.append(f"禅道指派：{bug_person}")
-
-        if len(content_parts) > 1:  # 除了标题还有其他内容
-            content = "\n".join(content_parts)
-            logger.info(f"准备发送综合通知，内容：{content}")
+        if content:
+            logger.info("准备发送综合通知，内容：%s", content)
 
+            _, at = oncall_mention(team, today)
             try:
-                send_dingtalk_message(content)
-                logger.info(f"✅ [进程{os.getpid()}] 已发送{today}综合工作安排通知")
+                send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret, **at)
+                logger.info("✅ [进程%s] 已发送%s综合工作安排通知", os.getpid(), today)
+                # 等待值班人回复「收到」，超时未确认则升级
+                escalation_manager.track(team, today, get_original_duty_person(today, team))
             except Exception as e:
-                logger.error(f"❌ [进程{os.getpid()}] 发送{today}综合通知失败: {str(e)}")
+                logger.error("❌ [进程%s] 发送%s综合通知失败: %s", os.getpid(), today, e)
                 raise
         else:
-            logger.warning(f"⚠️ [进程{os.getpid()}] 未找到{today}的工作安排信息")
+            logger.warning("⚠️ [进程%s] 未找到%s的工作安排信息", os.getpid(), today)
+
+
+@log_execution_time
+def send_scheduled_notifications(teams, test_data=None):
+    """并发向同一时间点的多个团队发送综合通知"""
+    logger.info("[进程%s] 开始分发综合通知: %s", os.getpid(), ', '.join(team.team_id for team in teams))
+    summary = dispatch_combined_notifications(teams, test_data)
+
+    # 发送成功的团队开始等待值班人回复「收到」，超时未确认则升级
+    for team, result in zip(teams, summary["results"]):
+        if result["status"] == "sent":
+            escalation_manager.track(team, summary["date"], get_original_duty_person(summary["date"], team))
+    return summary
+
+
+def scheduled_jobs():
+    """
+    定时任务列表 [(通知时间 HH:MM, 团队列表)]，按时间排序
+    同一时间点的团队合并为一个任务并发发送，避免逐个发送导致后面的群通知延迟
+    """
+    teams_by_time = {}
+    for team in team_registry.all():
+        for at_time in team.schedule_times:
+            teams_by_time.setdefault(at_time, []).append(team)
+    return sorted(teams_by_time.items())
 
 
 def run_scheduler():
@@ -133,39 +178,53 @@ def run_scheduler():
     global _scheduler_started
     with _scheduler_lock:
         if _scheduler_started:
-            logger.info(f"[进程{os.getpid()}] 定时任务已启动，跳过重复启动")
+            logger.info("[进程%s] 定时任务已启动，跳过重复启动", os.getpid())
             return
         _scheduler_started = True
-        logger.info(f"[进程{os.getpid()}] 启动定时任务调度器")
+        record_scheduler_started()
+        logger.info("[进程%s] 启动定时任务调度器", os.getpid())
 
     # 清除所有现有的定时任务
     schedule.clear()
-    logger.info(f"[进程{os.getpid()}] 已清除所有现有定时任务")
+    logger.info("[进程%s] 已清除所有现有定时任务", os.getpid())
 
-    # 分别设置不同的时间发送不同类型的通知
+    # 按团队各自的通知时间发送综合工作安排通知
     # schedule.every().day.at("08:30").do(send_bug_assignment_notification)
-    schedule.every().day.at("08:30").do(send_combined_notification)
-    schedule.every().day.at("17:20").do(send_combined_notification)
-
     logger.info("�� 定时任务配置完成:")
-    logger.info("  - 08:30 发送禅道指派通知")
-    logger.info("  - 17:20 发送综合工作安排通知")
+    for at_time, teams in scheduled_jobs():
+        schedule.every().day.at(at_time).do(send_scheduled_notifications, teams=teams)
+        logger.info("  - %s 发送综合工作安排通知: %s",
+                    at_time, ', '.join(f'{team.team_id}（{team.name}）' for team in teams))
     logger.info("开始运行调度器...")
 
+    # 后台加载钉钉通讯录并按TTL刷新，通知时@值班人只查内存字典
+    if directory.start():
+        logger.info("钉钉通讯录缓存已启动，刷新间隔 %s秒", directory.ttl)
+
+    # 预先加载各团队的值班计划，就绪检查只读取内存中的缓存
+    for team in team_registry.all():
+        try:
+            team.get_plan()
+        except Exception as e:
+            logger.error("预加载团队 %s 值班计划失败: %s", team.team_id, e)
+
     while True:
         try:
             schedule.run_pending()
+            next_job = min(schedule.jobs, key=lambda job: job.next_run) if schedule.jobs else None
+            record_scheduler_heartbeat(next_job.next_run if next_job else None,
+                                       f"{next_job.at_time} {next_job.job_func.__name__}" if next_job else None)
             time.sleep(60)
         except Exception as e:
-            logger.error(f"定时任务执行异常: {str(e)}")
+            logger.error("定时任务执行异常: %s", e)
             time.sleep(60)  # 继续运行，不中断
 
 
 if __name__ == "__main__":
     try:
         logger.info("🚀 === OnCall系统启动 ===")
-        logger.info(f"进程ID: {os.getpid()}")
-        logger.info(f"Flask配置: {FLASK_HOST}:{FLASK_PORT}, Debug: {FLASK_DEBUG}")
+        logger.info("进程ID: %s", os.getpid())
+        logger.info("Flask配置: %s:%s, Debug: %s", FLASK_HOST, FLASK_PORT, FLASK_DEBUG)
 
         app = create_app()
 
@@ -175,7 +234,7 @@ if __name__ == "__main__":
         scheduler_thread.start()
         logger.info("定时任务线程启动成功")
 
-        logger.info(f"✅ 应用启动成功，监听端口 {FLASK_PORT}")
+        logger.info("✅ 应用启动成功，监听端口 %s", FLASK_PORT)
         logger.info("系统已就绪，等待请求...")
 
         app.run(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG)
@@ -183,7 +242,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("�� 收到中断信号，正在关闭系统...")
     except Exception as e:
-        logger.critical(f"�� 应用启动失败: {str(e)}")
+        logger.critical("�� 应用启动失败: %s", e)
         raise
     finally:
         logger.info("👋 OnCall系统已关闭")
@@ -20,7 +20,7 @@ FLASK_HOST = "0.0.0.0"
 FLASK_PORT = 5008
 FLASK_DEBUG = False
 
-# 值班人员列表
+# 值班人员列表（可选字段 mobile / userid 用于告警消息中@该人员）
 duty_persons = [
     {"id": 1, "name": "武恒"},
     {"id": 2, "name": "马刘磊"},
@@ -55,10 +55,18 @@ LOG_CONFIG = {
     'log_file': 'oncall.log',
     'error_log_file': 'oncall_error.log',
 
-    # 文件轮转配置
+    # 文件轮转方式: size（按大小）, daily（每天零点）, hourly（每个整点）
+    'rotation': 'daily',
+
+    # 按大小轮转配置（rotation 为 size 时生效）
     'max_bytes': 10 * 1024 * 1024,  # 10MB
     'backup_count': 5,  # 保留5个备份文件
 
+    # 按时间轮转配置（rotation 为 daily / hourly 时生效）
+    # 轮转时只重命名文件，压缩和清理在后台线程完成
+    'compression': 'gzip',  # gzip, zstd（需安装 zstandard，未安装时使用 gzip）, None 不压缩
+    'retention_count': 180,  # 保留的归档数量（daily 约半年，hourly 约一周）
+
     # 控制台输出
     'console_output': True,
     'console_level': 'INFO',
@@ -66,4 +74,187 @@ LOG_CONFIG = {
     # 是否记录到文件
     'file_output': True,
     'file_level': 'DEBUG',
+    # 日志文件格式: text（与控制台相同的文本格式）, json（JSON Lines，每行一条记录）
+    'file_format': 'text',
+
+    # 单个日志字段（或消息）的最大长度，超出部分截断，0 表示不截断
+    'max_field_length': 2000,
+    # 结构化事件采样: 事件名 -> N，每N条只记录1条（高频、大体积事件使用）
+    'sample_every': {},
+}
+
+# 启动性能分析配置
+STARTUP_PROFILE_CONFIG = {
+    # 是否在启动时统计模块导入耗时并输出启动报告
+    'enabled': True,
+    # 报告中列出的最慢导入模块数量
+    'top_n': 15,
+}
+
+# 日历订阅配置
+CALENDAR_FEED_CONFIG = {
+    # 已生成日历的LRU缓存容量（按 计划版本+人员 缓存）
+    'cache_size': 256,
+    # 日历名称前缀
+    'calendar_name': 'OnCall值班',
+}
+
+# 多团队配置：每个团队拥有独立的值班计划、人员名单、机器人和通知时间
+# - plan_file: 值班计划表路径
+# - duty_persons / bug_persons: 值班人员 / 禅道指派人员
+# - webhook / webhook_secret: 钉钉自定义机器人地址及签名密钥
+# - schedule_times: 每日发送综合通知的时间
+# - conversation_ids: 该团队的钉钉群会话ID，机器人收到这些群的消息时按该团队回复
+# 默认团队沿用上面的全局配置
+DEFAULT_TEAM_ID = "default"
+TEAMS = {
+    DEFAULT_TEAM_ID: {
+        "name": "默认团队",
+        "plan_file": ORIGINAL_DUTY_EXCEL,
+        "duty_persons": duty_persons,
+        "bug_persons": bug_persons,
+        "webhook": DINGTALK_ROBOT_WEBHOOK,
+        "webhook_secret": None,
+        "schedule_times": ["08:30", "17:20"],
+        "conversation_ids": [],
+    },
+}
+
+# 定时通知并发分发配置
+NOTIFICATION_DISPATCH_CONFIG = {
+    # 并发发送的最大线程数
+    'max_workers': 8,
+    # 每个Webhook在 rate_period 秒内最多发送的消息数（钉钉自定义机器人限制为每分钟20条）
+    'rate_limit': 20,
+    'rate_period': 60,
+    # 单次发送请求的超时时间（秒）
+    'timeout': 10,
+}
+
+# 钉钉发送容错配置
+DINGTALK_RESILIENCE_CONFIG = {
+    # 可重试错误的最大重试次数
+    'max_retries': 3,
+    # 指数退避：首次重试等待 base_delay 秒，每次翻倍，最多 max_delay 秒，并加随机抖动
+    'base_delay': 1.0,
+    'max_delay': 30.0,
+    # 重试预算：budget_period 秒内的重试次数不超过 max(budget_min_retries, 请求数 * budget_ratio)
+    'budget_ratio': 0.2,
+    'budget_min_retries': 10,
+    'budget_period': 60,
+    # 熔断：同一Webhook连续失败 breaker_failure_threshold 次后熔断，breaker_reset_timeout 秒后放行一次试探请求
+    'breaker_failure_threshold': 5,
+    'breaker_reset_timeout': 60,
+    # 机器人Webhook不可用（重试耗尽或熔断）时，是否改用企业应用API发送
+    'fallback_enterprise': False,
+}
+
+# 钉钉通讯录缓存配置：通过企业应用API批量拉取 姓名 -> userId/手机号，通知时只@值班人
+DINGTALK_DIRECTORY_CONFIG = {
+    # 是否启用（企业应用需开通通讯录只读权限）
+    'enabled': False,
+    # 开放平台地址，联调时可指向本地桩服务（python -m tools.dingtalk_stub）
+    'api_base': 'https://oapi.dingtalk.com',
+    # 从这些部门开始递归拉取成员，1 为根部门
+    'root_dept_ids': [1],
+    # 缓存有效期（秒），到期后在后台线程中刷新；刷新失败时继续使用旧数据，retry_interval 秒后重试
+    'ttl': 6 * 3600,
+    'retry_interval': 300,
+    # 成员列表每页条数（钉钉接口上限100）
+    'page_size': 100,
+    # 单次请求超时（秒）
+    'timeout': 10,
+    # 找不到值班人的 userId/手机号时，是否退回为@所有人
+    'fallback_at_all': True,
+}
+
+# 告警接入配置（/api/alerts，兼容 Alertmanager Webhook 格式）
+ALERTS_CONFIG = {
+    # 访问令牌（请求头 Authorization: Bearer <令牌>，对应 Alertmanager 的 http_config.authorization）；
+    # 为 None 时只允许本机访问
+    'token': None,
+    # 单条钉钉消息中最多列出的告警条数，超出部分只计数
+    'max_lines': 20,
+    # 单条告警描述的最大长度
+    'max_text_length': 200,
+    # 后台发送告警消息的线程数
+    'send_workers': 2,
+    # 是否启用聚合：去重后按标签分组，每组在时间窗口结束时发送一条汇总消息
+    'aggregate': True,
+    # 分组时间窗口（秒）
+    'group_window': 30,
+    # 分组使用的标签，为空时按完整标签集合分组
+    'group_by': ['alertname', 'severity'],
+    # 同一指纹、同一状态的告警在该时间（秒）内重复出现只计数
+    'dedupe_ttl': 300,
+    # 指纹LRU容量
+    'fingerprint_cache_size': 10000,
+    # 同时累计的分组数上限，超出时提前发送最早的组
+    'max_groups': 1000,
+}
+
+# 值班通知确认与升级配置
+ESCALATION_CONFIG = {
+    # 是否跟踪值班通知的确认（值班人在群里回复「收到」）
+    'enabled': True,
+    # 通知发出后多少秒内未确认则升级给备份值班人（duty_persons 中的下一位）
+    'ack_timeout': 15 * 60,
+    # 最多升级的次数
+    'max_escalations': 2,
+    # 是否允许任何人确认；False 时只有值班人及已升级的备份值班人可以确认
+    'ack_by_anyone': False,
+    # 时间轮刻度（秒）和槽位数
+    'tick_seconds': 1.0,
+    'wheel_slots': 3600,
+}
+
+# 健康检查配置（/api/ready）
+HEALTH_CONFIG = {
+    # 调度器心跳超过该秒数视为调度线程已停止（调度循环每60秒一轮）
+    'max_heartbeat_age': 180,
+    # 到期任务超过该秒数仍未执行视为调度延迟
+    'max_job_lag': 120,
+}
+
+# 管理接口配置（/api/admin/...）
+ADMIN_CONFIG = {
+    # 访问令牌（请求头 X-Admin-Token）；为 None 时只允许本机访问
+    'token': None,
+    # 日志查询单次返回的最大条数
+    'log_search_max_limit': 2000,
+}
+
+# 值班计划上传配置（POST /api/duty_schedule）
+PLAN_UPLOAD_CONFIG = {
+    # 上传文件大小上限（字节）和最大行数
+    'max_bytes': 5 * 1024 * 1024,
+    'max_rows': 20000,
+    # 是否检查姓名在团队的 duty_persons 名单中
+    'check_names': True,
+    # 是否允许日期不连续（不允许时缺少日期视为错误；缺少的日期在查询时会触发自动重新生成计划）
+    'allow_gaps': False,
+    # 替换前是否保留旧计划表备份（<计划表>.bak）
+    'keep_backup': True,
+    # 校验报告中最多列出的错误 / 警告条数
+    'max_report_issues': 100,
+    # 后台处理线程数、保留的任务记录数
+    'max_workers': 2,
+    'job_history': 50,
+}
+
+# 值班计划变更通知配置（计划重新生成或上传后，只通知值班发生变化的人员）
+PLAN_CHANGE_NOTIFY_CONFIG = {
+    'enabled': True,
+    # 每条通知中最多列出的日期数
+    'max_dates_listed': 10,
+    # 通知中附带的计划下载地址，None 表示不附带
+    'download_url': "http://myai.myds.me:5008/api/download_duty_schedule",
+}
+
+# 命令行工具配置（./oncall 或 python -m src.cli）
+CLI_CONFIG = {
+    # 编译后的值班计划缓存目录，按计划文件的修改时间和大小失效；None 表示不使用磁盘缓存
+    'plan_cache_dir': './.plan_cache',
+    # range 子命令未指定结束日期时显示的天数
+    'range_days': 14,
 }
@@ -1,9 +1,22 @@
-from flask import Blueprint, request, jsonify, send_file, abort
+from flask import Blueprint, Response, request, jsonify, send_file, abort
+from src.services.alerts import forward_alerts, parse_alerts
+from src.services.calendar_feed import calendar_cache, calendar_etag
+from src.services.duty_commands import default_reply, dispatch_message
+from src.services.duty_plan import PlanFormatError, get_duty_plan, plan_version
+from src.services.health import liveness, readiness
 from src.services.excel_handler import get_original_duty_person, get_bug_assignment_person, get_today_date
+from src.services.plan_exports import EXPORT_FORMATS, get_plan_export
+from src.services.plan_upload import plan_upload_manager
+from src.services.team_registry import team_registry
+from src.utils.log_index import normalize_hour, search_logs
 from src.utils.logger import get_logger
-import json
+from src.utils.structured_log import LazyJSON, log_event
+from config.settings import ADMIN_CONFIG, ALERTS_CONFIG, LOG_CONFIG
+import hmac
+import logging
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+from urllib.parse import quote
 
 # 获取日志器
 logger = get_logger('api')
@@ -12,13 +25,30 @@ logger = get_logger('api')
 api = Blueprint('api', __name__)
 
 
+def content_disposition_header(filename: str) -> str:
+    """构建附件下载头，兼容中文文件名"""
+    return f"attachment; filename*=UTF-8''{quote(filename)}"
+
+
+def _request_team():
+    """根据查询参数 team 获取团队，未指定时为默认团队，不存在时返回None"""
+    return team_registry.resolve(request.args.get('team'))
+
+
+def _unknown_team_response():
+    """团队不存在时的错误响应"""
+    team_id = request.args.get('team')
+    logger.warning("参数校验失败：未找到团队 %s", team_id)
+    return jsonify({"status": "error", "message": f"未找到团队: {team_id}"}), 404
+
+
 @api.route('/dingtalk/webhook', methods=['GET', 'POST'])
 def dingtalk_webhook():
     """钉钉企业机器人Webhook接口，处理@机器人的消息"""
 
     # 记录请求信息
     client_ip = request.remote_addr
-    logger.info(f"收到钉钉Webhook请求 - IP: {client_ip}, 方法: {request.method}")
+    logger.info("收到钉钉Webhook请求 - IP: %s, 方法: %s", client_ip, request.method)
 
     # 处理GET请求（钉钉连接测试）
     if request.method == 'GET':
@@ -28,40 +58,33 @@ def dingtalk_webhook():
     # 处理POST请求（实际消息处理）
     try:
         data = request.json
-        logger.info(f"收到钉钉消息数据: {json.dumps(data, ensure_ascii=False)}")
+        # 完整消息体只在DEBUG级别输出，序列化和截断都在真正输出时才执行
+        log_event(logger, logging.DEBUG, 'dingtalk.webhook.payload', payload=data)
 
         # 检查消息类型
         msg_type = data.get('msgtype', '')
-        logger.debug(f"消息类型: {msg_type}")
+        logger.debug("消息类型: %s", msg_type)
 
         if msg_type == 'text':
             # 获取消息内容
             text_content = data.get('text', {}).get('content', '').strip()
-            logger.info(f"收到文本消息: {text_content}")
+            logger.info("收到文本消息: %s", text_content)
 
-            # 检查是否包含关键词
-            if '值班' in text_content or '今天谁值班' in text_content:
-                logger.info("匹配到关键词，开始处理")
-                # 获取今天的工作安排
-                today = get_today_date()
-                duty_person = get_original_duty_person(today)
-                bug_person = get_bug_assignment_person(today)
-
-                logger.info(f"查询结果 - 值班人: {duty_person or '未找到'}, 禅道指派: {bug_person or '未找到'}")
-
-                # 构建回复内容
-                reply_parts = [f"📅 {today} 工作安排："]
-
-                if duty_person:
-                    reply_parts.append(f"🔧 值班人：{duty_person}")
-                else:
-                    reply_parts.append("❌ 未找到值班人员")
-
-                if bug_person:
-                    reply_parts.append(f"🐛 禅道指派：{bug_person}")
+            # 按会话ID（或查询参数 team）确定团队，只查询该团队的数据
+            team = team_registry.resolve(request.args.get('team'), data.get('conversationId'))
+            if team is None:
+                logger.warning("未找到团队: %s", request.args.get('team'))
+                return jsonify({
+                    "msgtype": "text",
+                    "text": {"content": "未找到对应的团队配置，请联系管理员"}
+                })
+            logger.debug("消息所属团队: %s", team.team_id)
 
-                reply_content = "\n".join(reply_parts)
-                logger.info(f"准备回复内容: {reply_content}")
+            # 通过命令路由器分发（一次扫描匹配所有命令关键词和参数）
+            result = dispatch_message(text_content, data.get('senderNick'), data, team)
+            if result is not None:
+                command_name, reply_content = result
+                logger.info("匹配到命令 %s，准备回复内容: %s", command_name, reply_content)
 
                 # 返回回复消息
                 return jsonify({
@@ -73,29 +96,205 @@ def dingtalk_webhook():
         logger.info("未匹配到关键词，返回默认回复")
         return jsonify({
             "msgtype": "text",
-            "text": {"content": "您好！我是OnCall值班机器人🤖\n\n发送「值班」或「今天谁值班」可以查询今日工作安排"}
+            "text": {"content": default_reply()}
         })
 
     except Exception as e:
-        logger.error(f"处理钉钉消息失败: {str(e)}")
+        logger.error("处理钉钉消息失败: %s", e)
         return jsonify({
             "msgtype": "text",
             "text": {"content": "处理消息时出现错误，请稍后重试"}
         })
 
 
+@api.route('/health', methods=['GET'])
+def health():
+    """存活检查（只读内存状态，可高频轮询）"""
+    return jsonify(liveness())
+
+
+@api.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：调度器心跳、下一个任务及延迟、值班计划加载状态、最近一次钉钉发送结果"""
+    result = readiness(team_registry.all())
+    return jsonify(result), 200 if result["ready"] else 503
+
+
+def _admin_forbidden():
+    """管理接口鉴权：配置了令牌时校验 X-Admin-Token，否则只允许本机访问；通过返回None"""
+    token = ADMIN_CONFIG['token']
+    if token:
+        if request.headers.get('X-Admin-Token') == token:
+            return None
+    elif request.remote_addr in ('127.0.0.1', '::1'):
+        return None
+    logger.warning("拒绝管理接口访问 - IP: %s", request.remote_addr)
+    return jsonify({"status": "error", "message": "无权访问"}), 403
+
+
+@api.route('/admin/logs', methods=['GET'])
+def search_log_records():
+    """
+    按 时间范围 / 级别 / 日志器 / 关键字 查询日志（含压缩归档，按块索引直接读取命中范围）
+    参数: from, to（YYYY-MM-DD 或 YYYY-MM-DD HH）, level, logger, q, limit, file=main|error
+    """
+    forbidden = _admin_forbidden()
+    if forbidden is not None:
+        return forbidden
+
+    try:
+        start = normalize_hour(request.args.get('from'))
+        end = normalize_hour(request.args.get('to'), end=True)
+        limit = int(request.args.get('limit', 200))
+        if limit <= 0:
+            raise ValueError(f"limit 必须为正整数: {limit}")
+        # search_logs 把 0 视为不限条数，这里保证至少为1且不超过上限
+        limit = max(1, min(limit, ADMIN_CONFIG['log_search_max_limit']))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    level = request.args.get('level')
+    if level:
+        level = level.upper()
+    file_name = LOG_CONFIG['error_log_file'] if request.args.get('file') == 'error' else LOG_CONFIG['log_file']
+    base_filename = os.path.abspath(os.path.join(LOG_CONFIG['log_dir'], file_name))
+
+    records = search_logs(base_filename, start, end, level, request.args.get('logger'),
+                          request.args.get('q'), limit)
+    return jsonify({
+        "status": "success",
+        "data": {
+            "count": len(records),
+            "truncated": len(records) >= limit,
+            "records": records,
+        }
+    })
+
+
+@api.route('/duty_schedule', methods=['POST'])
+def upload_duty_schedule():
+    """
+    上传值班计划表（xlsx / CSV，表单字段 file），参数 team、dry_run=1（只校验）
+    文件保存后立即返回202和任务ID，校验和替换在后台完成，通过 /api/duty_schedule/jobs/<任务ID> 查询结果
+    """
+    forbidden = _admin_forbidden()
+    if forbidden is not None:
+        return forbidden
+
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        logger.warning("参数校验失败：缺少上传文件")
+        return jsonify({"status": "error", "message": "缺少上传文件（表单字段 file）"}), 400
+
+    dry_run = request.args.get('dry_run') in ('1', 'true')
+    try:
+        job = plan_upload_manager.submit(team, upload.stream, upload.filename, dry_run)
+    except ValueError as e:
+        logger.warning("值班计划上传被拒绝: %s", e)
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    return jsonify({
+        "status": "success",
+        "data": {
+            "job_id": job.job_id,
+            "job_status": job.status,
+            "status_url": f"/api/duty_schedule/jobs/{job.job_id}",
+        }
+    }), 202
+
+
+@api.route('/duty_schedule/jobs/<job_id>', methods=['GET'])
+def get_duty_schedule_job(job_id):
+    """查询值班计划上传任务的状态和校验报告"""
+    forbidden = _admin_forbidden()
+    if forbidden is not None:
+        return forbidden
+
+    job = plan_upload_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"未找到上传任务: {job_id}"}), 404
+    return jsonify({"status": "success", "data": job.to_dict()})
+
+
+def _alerts_forbidden():
+    """告警接口鉴权：配置了令牌时校验 Authorization: Bearer <令牌>，否则只允许本机访问；通过返回None"""
+    token = ALERTS_CONFIG['token']
+    if token:
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token):
+            return None
+    elif request.remote_addr in ('127.0.0.1', '::1'):
+        return None
+    logger.warning("拒绝告警接口访问 - IP: %s", request.remote_addr)
+    return jsonify({"status": "error", "message": "无权访问"}), 403
+
+
+@api.route('/alerts', methods=['POST'])
+def receive_alerts():
+    """
+    接收告警（兼容 Alertmanager Webhook 格式，也支持告警列表），
+    整批转发给当天值班人员（钉钉消息 + @值班人），消息在后台发送
+    """
+    forbidden = _alerts_forbidden()
+    if forbidden is not None:
+        return forbidden
+
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        logger.warning("告警请求体不是合法的JSON")
+        return jsonify({"status": "error", "message": "请求体必须是JSON"}), 400
+
+    try:
+        alerts = parse_alerts(payload)
+    except ValueError as e:
+        logger.warning("告警格式错误: %s", e)
+        return jsonify({"status": "error", "message": f"告警格式错误: {str(e)}"}), 400
+
+    if not alerts:
+        return jsonify({"status": "success", "data": {"team": team.team_id, "accepted": 0}})
+
+    result = forward_alerts(alerts, team)
+    logger.info("收到告警 %s 条（告警 %s，恢复 %s，重复 %s），团队 %s，值班人 %s",
+                result['accepted'], result['firing'], result['resolved'], result.get('duplicates', 0),
+                team.team_id, result['oncall'] or '未找到')
+    return jsonify({"status": "success", "data": result}), 202
+
+
 @api.route('/download_duty_schedule', methods=['GET'])
 def download_duty_schedule():
-    """下载值班计划表Excel文件"""
-    logger.info("收到下载值班计划表请求")
+    """
+    下载值班计划表（默认Excel，可通过 format=csv/json 获取其他格式）
+    支持 ETag / Last-Modified 条件请求，计划未变化时返回304
+    """
+    fmt = request.args.get('format', 'xlsx').lower()
+    logger.info("收到下载值班计划表请求，格式: %s", fmt)
+
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    if fmt != 'xlsx' and fmt not in EXPORT_FORMATS:
+        logger.warning("参数校验失败：不支持的导出格式 %s", fmt)
+        return jsonify({
+            "status": "error",
+            "message": f"不支持的导出格式: {fmt}（可选: xlsx, {', '.join(EXPORT_FORMATS)}）"
+        }), 400
 
     try:
         # 值班计划表文件路径
-        excel_file_path = './data/值班计划表.xlsx'
+        excel_file_path = team.plan_file
 
         # 检查文件是否存在
         if not os.path.exists(excel_file_path):
-            logger.error(f"值班计划表文件不存在: {excel_file_path}")
+            logger.error("值班计划表文件不存在: %s", excel_file_path)
             return jsonify({
                 "status": "error",
                 "message": "值班计划表文件不存在"
@@ -103,33 +302,187 @@ def download_duty_schedule():
 
         # 生成下载文件名（包含当前日期）
         current_date = datetime.now().strftime("%Y%m%d")
-        download_filename = f"值班计划表_{current_date}.xlsx"
-
-        logger.info(f"准备下载文件: {excel_file_path} -> {download_filename}")
 
-        # 使用send_file发送文件，设置正确的MIME类型和下载文件名
-        return send_file(
-            excel_file_path,
-            as_attachment=True,  # 强制下载
-            download_name=download_filename,  # 下载时的文件名
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'  # Excel文件MIME类型
-        )
+        if fmt == 'xlsx':
+            # Excel原文件无需解析，直接以文件版本作为ETag
+            stat = os.stat(excel_file_path)
+            download_filename = f"值班计划表_{current_date}.xlsx"
+            logger.info("准备下载文件: %s -> %s", excel_file_path, download_filename)
+
+            # 使用send_file发送文件，设置正确的MIME类型和下载文件名，并支持条件请求
+            response = send_file(
+                excel_file_path,
+                as_attachment=True,  # 强制下载
+                download_name=download_filename,  # 下载时的文件名
+                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',  # Excel文件MIME类型
+                etag=f"{plan_version(stat)}-xlsx",
+                last_modified=stat.st_mtime,
+                conditional=True
+            )
+        else:
+            # 其他格式按计划版本缓存，同一版本只生成一次
+            plan = get_duty_plan(excel_file_path)
+            mimetype, extension = EXPORT_FORMATS[fmt]
+            download_filename = f"值班计划表_{current_date}.{extension}"
+
+            response = Response(get_plan_export(plan, fmt), mimetype=mimetype)
+            response.headers['Content-Disposition'] = content_disposition_header(download_filename)
+            response.set_etag(f"{plan.version}-{fmt}")
+            response.last_modified = datetime.fromtimestamp(plan.mtime, tz=timezone.utc)
+            response = response.make_conditional(request)
+
+        # 允许缓存，但每次使用前必须重新验证
+        response.cache_control.no_cache = True
+        if response.status_code == 304:
+            logger.info("值班计划表未变化，返回304: %s", download_filename)
+        return response
 
     except Exception as e:
-        logger.error(f"下载值班计划表失败: {str(e)}")
+        logger.error("下载值班计划表失败: %s", e)
         return jsonify({
             "status": "error",
             "message": f"下载文件失败: {str(e)}"
         }), 500
 
 
+def _team_plan(team):
+    """读取团队的值班计划，返回 (计划, None)；计划表不存在或格式错误时返回 (None, 404错误响应)"""
+    try:
+        return team.get_plan(), None
+    except FileNotFoundError:
+        logger.error("值班计划表文件不存在: %s", team.plan_file)
+        return None, (jsonify({"status": "error", "message": "值班计划表文件不存在"}), 404)
+    except PlanFormatError as e:
+        logger.error("值班计划表缺少必需的列: %s", ', '.join(e.missing_columns))
+        return None, (jsonify({"status": "error", "message": "值班计划表格式错误"}), 404)
+
+
+def _calendar_response(person=None):
+    """返回日历订阅内容，支持ETag条件请求"""
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    plan, error = _team_plan(team)
+    if error is not None:
+        return error
+
+    feed = calendar_cache.get_feed(team, plan, person)
+    if feed is None:
+        logger.warning("日历订阅：未找到人员 %s 的值班或禅道指派记录", person)
+        return jsonify({"status": "error", "message": f"未找到{person}的值班记录"}), 404
+
+    response = Response(feed, mimetype='text/calendar; charset=utf-8')
+    response.set_etag(calendar_etag(team, plan, person))
+    response.last_modified = datetime.fromtimestamp(plan.mtime, tz=timezone.utc)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@api.route('/calendar/<person>.ics', methods=['GET'])
+def person_calendar(person):
+    """个人值班日历订阅（iCalendar）"""
+    # 日历客户端会频繁轮询，使用DEBUG级别避免刷屏
+    logger.debug("收到日历订阅请求 - 人员: %s", person)
+    return _calendar_response(person)
+
+
+@api.route('/calendar.ics', methods=['GET'])
+def team_calendar():
+    """全员值班日历订阅（iCalendar）"""
+    logger.debug("收到全员日历订阅请求")
+    return _calendar_response()
+
+
+def _parse_date_arg(name):
+    """解析 YYYY-MM-DD 格式的查询参数，未提供返回None，格式错误抛出ValueError"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+@api.route('/next_shift', methods=['GET'])
+def get_next_shift():
+    """查询某人的下一次值班日期（默认从今天起，含今天）"""
+    logger.info("收到查询下次值班请求")
+
+    person = request.args.get('person')
+    logger.info("请求参数 - 人员: %s, 起始日期: %s", person, request.args.get('after'))
+
+    if not person:
+        logger.warning("参数校验失败：缺少人员参数")
+        return jsonify({"status": "error", "message": "缺少人员参数（person）"}), 400
+
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    try:
+        after = _parse_date_arg('after') or datetime.strptime(get_today_date(), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"status": "error", "message": "日期格式错误，应为YYYY-MM-DD"}), 400
+
+    plan, error = _team_plan(team)
+    if error is not None:
+        return error
+    next_date = plan.next_shift(person, after, inclusive=True)
+    if not next_date:
+        logger.warning("未找到%s在%s之后的值班记录", person, after)
+        return jsonify({"status": "error", "message": f"未找到{person}在{after}之后的值班记录"}), 404
+
+    return jsonify({
+        "status": "success",
+        "data": {
+            "person": person,
+            "next_shift": next_date
+        }
+    })
+
+
+@api.route('/shifts', methods=['GET'])
+def get_shifts():
+    """查询某人在日期区间内（含两端）的所有值班日期"""
+    logger.info("收到查询值班日期请求")
+
+    person = request.args.get('person')
+    logger.info("请求参数 - 人员: %s, 区间: %s ~ %s", person, request.args.get('start'), request.args.get('end'))
+
+    if not person:
+        logger.warning("参数校验失败：缺少人员参数")
+        return jsonify({"status": "error", "message": "缺少人员参数（person）"}), 400
+
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    try:
+        start = _parse_date_arg('start')
+        end = _parse_date_arg('end')
+    except ValueError:
+        return jsonify({"status": "error", "message": "日期格式错误，应为YYYY-MM-DD"}), 400
+
+    plan, error = _team_plan(team)
+    if error is not None:
+        return error
+    dates = plan.shifts(person, start, end)
+
+    return jsonify({
+        "status": "success",
+        "data": {
+            "person": person,
+            "shifts": dates
+        }
+    })
+
+
 @api.route('/update_duty_replace', methods=['POST'])
 def update_duty_replace():
     """更新值班替换记录的接口"""
     logger.info("收到更新值班替换记录请求")
 
     data = request.json
-    logger.info(f"请求数据: {json.dumps(data, ensure_ascii=False)}")
+    logger.info("请求数据: %s", LazyJSON(data))
 
     # 校验必填参数
     required_fields = ["date", "replace_person"]
@@ -137,10 +490,14 @@ def update_duty_replace():
         logger.warning("参数校验失败：缺少必填参数")
         return jsonify({"status": "error", "message": "缺少必填参数（date/replace_person）"}), 400
 
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
     # 获取原值班人
-    original_person = get_original_duty_person(data["date"])
+    original_person = get_original_duty_person(data["date"], team)
     if not original_person:
-        logger.warning(f"未找到{data['date']}的原始值班记录")
+        logger.warning("未找到%s的原始值班记录", data['date'])
         return jsonify({"status": "error", "message": f"未找到{data['date']}的原始值班记录"}), 404
 
 
@@ -150,15 +507,19 @@ def get_bug_assignment():
     logger.info("收到获取禅道指派人员请求")
 
     date = request.args.get('date')
-    logger.info(f"请求参数 - 日期: {date}")
+    logger.info("请求参数 - 日期: %s", date)
 
     if not date:
         logger.warning("参数校验失败：缺少日期参数")
         return jsonify({"status": "error", "message": "缺少日期参数"}), 400
 
-    bug_person = get_bug_assignment_person(date)
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    bug_person = get_bug_assignment_person(date, team)
     if bug_person:
-        logger.info(f"找到禅道指派人员: {bug_person}")
+        logger.info("找到禅道指派人员: %s", bug_person)
         return jsonify({
             "status": "success",
             "data": {
@@ -167,7 +528,7 @@ def get_bug_assignment():
             }
         })
     else:
-        logger.warning(f"未找到{date}的禅道指派人员")
+        logger.warning("未找到%s的禅道指派人员", date)
         return jsonify({"status": "error", "message": f"未找到{date}的禅道指派人员"}), 404
 
 
@@ -177,16 +538,20 @@ def get_daily_work():
     logger.info("收到获取每日工作安排请求")
 
     date = request.args.get('date')
-    logger.info(f"请求参数 - 日期: {date}")
+    logger.info("请求参数 - 日期: %s", date)
 
     if not date:
         logger.warning("参数校验失败：缺少日期参数")
         return jsonify({"status": "error", "message": "缺少日期参数"}), 400
 
-    duty_person = get_original_duty_person(date)
-    bug_person = get_bug_assignment_person(date)
+    team = _request_team()
+    if team is None:
+        return _unknown_team_response()
+
+    duty_person = get_original_duty_person(date, team)
+    bug_person = get_bug_assignment_person(date, team)
 
-    logger.info(f"查询结果 - 值班人: {duty_person or '未找到'}, 禅道指派: {bug_person or '未找到'}")
+    logger.info("查询结果 - 值班人: %s, 禅道指派: %s", duty_person or '未找到', bug_person or '未找到')
 
     result = {
         "status": "success",
@@ -0,0 +1,278 @@
+"""
+OnCall 命令行工具
+不启动 Flask、不加载整个应用，每个子命令只导入自己需要的模块；值班计划的编译结果缓存在磁盘上
+（CLI_CONFIG['plan_cache_dir']），计划文件未变化时查询不需要重新解析Excel
+
+用法（在项目根目录下执行）:
+    ./oncall who                      # 今天的值班人和禅道指派
+    ./oncall who 2025-10-20 --team default
+    ./oncall range 2025-10-20 2025-10-31
+    ./oncall next 张三 -n 3
+    ./oncall send --dry-run           # 只打印将要发送的综合通知
+    ./oncall regenerate --start 2025-11-01
+    python -m src.cli who --json
+
+退出码: 0 成功，1 查询无结果或执行失败，2 参数错误
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+
+class CliError(Exception):
+    """命令执行失败，消息输出到标准错误"""
+
+    def __init__(self, message: str, exit_code: int = 1):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def _today() -> date:
+    from src.utils.clock import get_clock
+    return get_clock().now().date()
+
+
+def _parse_date(value: str) -> date:
+    """解析命令行中的日期：YYYY-MM-DD、today、tomorrow、yesterday"""
+    offsets = {'today': 0, 'tomorrow': 1, 'yesterday': -1}
+    if value in offsets:
+        return _today() + timedelta(days=offsets[value])
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日期格式应为 YYYY-MM-DD: {value}")
+
+
+def _label(day: date) -> str:
+    from src.services.duty_plan import WEEKDAY_NAMES
+    return f"{day.isoformat()}（{WEEKDAY_NAMES[day.weekday()]}）"
+
+
+def _print_json(data):
+    print(json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def _get_team(args):
+    from src.services.team_registry import get_team
+
+    team = get_team(args.team)
+    if team is None:
+        raise CliError(f"团队不存在: {args.team}", 2)
+    return team
+
+
+def _load_plan(team, args):
+    """读取团队的值班计划，计划文件未变化时直接使用磁盘缓存"""
+    from config.settings import CLI_CONFIG
+    from src.services.duty_plan import PlanFormatError, load_duty_plan_snapshot
+
+    cache_dir = None if args.no_cache else CLI_CONFIG['plan_cache_dir']
+    try:
+        return load_duty_plan_snapshot(team.plan_file, cache_dir)
+    except FileNotFoundError:
+        raise CliError(f"值班计划表不存在: {team.plan_file}")
+    except PlanFormatError as e:
+        raise CliError(f"值班计划表缺少必需的列: {', '.join(e.missing_columns)}")
+
+
+def _require_date(plan, day: date):
+    """计划中没有该日期时报错（命令行查询不会像定时任务那样自动重新生成计划）"""
+    if day.isoformat() not in plan:
+        raise CliError(f"值班计划中没有 {day.isoformat()} 的记录（计划截至 {plan.last_date or '无'}），"
+                       f"可执行 oncall regenerate 重新生成")
+
+
+def cmd_who(args) -> int:
+    from src.services.bug_rotation import bug_assignment_person_for
+
+    team = _get_team(args)
+    plan = _load_plan(team, args)
+    day = args.date or _today()
+    _require_date(plan, day)
+    oncall = plan.get_person(day.isoformat())
+    bug = bug_assignment_person_for(datetime.combine(day, datetime.min.time()), team.bug_persons)
+
+    if args.json:
+        _print_json({"team": team.team_id, "date": day.isoformat(), "oncall": oncall, "bug": bug})
+    else:
+        print(f"{_label(day)} 值班人：{oncall or '无'}  禅道指派：{bug or '无'}")
+    return 0
+
+
+def cmd_range(args) -> int:
+    from config.settings import CLI_CONFIG
+
+    team = _get_team(args)
+    plan = _load_plan(team, args)
+    start = args.start or _today()
+    end = args.end or start + timedelta(days=(args.days or CLI_CONFIG['range_days']) - 1)
+    if end < start:
+        raise CliError("结束日期不能早于起始日期", 2)
+
+    rows = []
+    day = start
+    while day <= end:
+        rows.append((day, plan.get_person(day.isoformat()), day.isoformat() in plan))
+        day += timedelta(days=1)
+
+    if args.json:
+        _print_json([{"date": day.isoformat(), "oncall": person, "planned": planned}
+                     for day, person, planned in rows])
+    else:
+        for day, person, planned in rows:
+            print(f"{_label(day)} {person if planned else '（未排班）'}")
+    return 0 if any(planned for _, _, planned in rows) else 1
+
+
+def cmd_next(args) -> int:
+    team = _get_team(args)
+    plan = _load_plan(team, args)
+    start = args.start or _today()
+    # 包含起始日期当天
+    shifts = plan.shifts(args.person, start)[:args.count]
+
+    if args.json:
+        _print_json({"person": args.person, "shifts": shifts})
+    elif shifts:
+        for shift in shifts:
+            print(_label(date.fromisoformat(shift)))
+    if not shifts:
+        if args.person not in plan.persons():
+            raise CliError(f"值班计划中没有 {args.person}")
+        raise CliError(f"{args.person} 在 {start.isoformat()} 之后没有值班（计划截至 {plan.last_date}）")
+    return 0
+
+
+def cmd_send(args) -> int:
+    from config.settings import DINGTALK_DIRECTORY_CONFIG
+
+    team = _get_team(args)
+    plan = _load_plan(team, args)
+    day = args.date or _today()
+    _require_date(plan, day)
+
+    # 命令行进程没有后台刷新线程，发送前同步加载一次通讯录，用于@值班人
+    if DINGTALK_DIRECTORY_CONFIG['enabled']:
+        from src.services.dingtalk_directory import directory
+        directory.refresh()
+
+    from src.services.notification_dispatcher import oncall_mention, render_combined_notification
+
+    target = day.isoformat()
+    content = render_combined_notification(team, target)
+    if content is None:
+        raise CliError(f"{target} 没有工作安排")
+    _, at = oncall_mention(team, target)
+
+    if args.dry_run:
+        if args.json:
+            _print_json({"team": team.team_id, "date": target, "content": content, "at": at, "sent": False})
+        else:
+            print(f"[dry-run] 团队 {team.team_id}，@：{at}")
+            print(content)
+        return 0
+
+    from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+
+    # dingtalk 模块会向标准输出打印发送结果，命令行只输出自己的结果
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        result = send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret, **at)
+    sent = result.get('errcode') == 0
+    if args.json:
+        _print_json({"team": team.team_id, "date": target, "content": content, "at": at, "sent": sent,
+                     "result": result})
+    elif sent:
+        print(f"已发送 {target} 综合通知到团队 {team.team_id}")
+    if not sent:
+        raise CliError(f"发送失败: {result.get('errmsg')}")
+    return 0
+
+
+def cmd_regenerate(args) -> int:
+    from config.settings import CLI_CONFIG
+    from src.services.excel_handler import regenerate_duty_plan
+    from src.services.plan_diff import diff_plans
+
+    team = _get_team(args)
+    old_plan = _load_plan(team, args)
+    start = args.start or _today()
+    plan = regenerate_duty_plan(team, start.isoformat(), notify=not args.no_notify)
+    # 立即刷新磁盘缓存，之后的查询不需要再解析Excel
+    if not args.no_cache:
+        from src.services.duty_plan import save_duty_plan_snapshot
+        save_duty_plan_snapshot(plan, CLI_CONFIG['plan_cache_dir'])
+    diff = diff_plans(old_plan, plan, since=start)
+
+    if args.json:
+        _print_json({"team": team.team_id, "start": start.isoformat(), "last_date": plan.last_date,
+                     "changed_dates": diff.changed_dates, "changes": diff.summary()})
+    else:
+        print(f"已重新生成团队 {team.team_id} 的值班计划: {start.isoformat()} ~ {plan.last_date}，"
+              f"{diff.changed_dates} 天变化")
+        for person, counts in diff.summary().items():
+            print(f"  {person}: 新增 {counts['added']} 天，取消 {counts['removed']} 天")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--team', help="团队ID，默认为默认团队")
+    common.add_argument('--json', action='store_true', help="以JSON格式输出")
+    common.add_argument('--no-cache', action='store_true', help="不使用磁盘上的值班计划缓存")
+    common.add_argument('-v', '--verbose', action='store_true', help="在控制台输出日志")
+
+    parser = argparse.ArgumentParser(prog='oncall', description="OnCall 值班查询与通知命令行工具")
+    subparsers = parser.add_subparsers(dest='command', metavar='<command>')
+    subparsers.required = True
+
+    who = subparsers.add_parser('who', parents=[common], help="查询某天的值班人")
+    who.add_argument('date', nargs='?', type=_parse_date, help="日期（YYYY-MM-DD / today / tomorrow），默认今天")
+    who.set_defaults(handler=cmd_who)
+
+    range_ = subparsers.add_parser('range', parents=[common], help="列出一段时间的值班安排")
+    range_.add_argument('start', nargs='?', type=_parse_date, help="起始日期，默认今天")
+    range_.add_argument('end', nargs='?', type=_parse_date, help="结束日期（含）")
+    range_.add_argument('--days', type=int, help="未指定结束日期时显示的天数")
+    range_.set_defaults(handler=cmd_range)
+
+    next_ = subparsers.add_parser('next', parents=[common], help="查询某人接下来的值班日期")
+    next_.add_argument('person', help="值班人姓名")
+    next_.add_argument('--from', dest='start', type=_parse_date, help="起始日期（含），默认今天")
+    next_.add_argument('-n', '--count', type=int, default=1, help="显示的次数，默认1")
+    next_.set_defaults(handler=cmd_next)
+
+    send = subparsers.add_parser('send', parents=[common], help="手动发送综合通知（值班+禅道指派）")
+    send.add_argument('--date', type=_parse_date, help="日期，默认今天")
+    send.add_argument('--dry-run', action='store_true', help="只打印消息内容，不发送")
+    send.set_defaults(handler=cmd_send)
+
+    regenerate = subparsers.add_parser('regenerate', parents=[common],
+                                       help="从指定日期起按人员顺序重新生成值班计划（会改写计划表）")
+    regenerate.add_argument('--start', type=_parse_date, help="起始日期，默认今天")
+    regenerate.add_argument('--no-notify', action='store_true', help="不通知值班发生变化的人员")
+    regenerate.set_defaults(handler=cmd_regenerate)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    # 日志默认只写文件，控制台只保留命令本身的输出，便于脚本解析
+    from config.settings import LOG_CONFIG
+    LOG_CONFIG['console_output'] = args.verbose
+
+    try:
+        return args.handler(args)
+    except CliError as e:
+        print(f"oncall: {e}", file=sys.stderr)
+        return e.exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
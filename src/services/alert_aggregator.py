@@ -0,0 +1,175 @@
+"""
+告警聚合模块
+位于告警转发与钉钉发送之间：
+- 去重：按告警指纹 + 状态去重，dedupe_ttl 秒内重复触发的告警只计数不重复列出；指纹表为定长LRU，内存有上限
+- 分组：按 group_by 标签（为空时使用完整标签集合）分组，每组在 group_window 秒的时间窗口内累计
+- 发送：后台线程在窗口结束时为每组发送一条汇总消息（含告警/恢复/重复次数）
+
+每条告警的处理只有常数次字典操作，与窗口内累计的告警数量无关
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('alert_aggregator')
+
+
+class FingerprintLRU:
+    """定长LRU：记录 指纹 -> (状态, 最近一次通知时间)，超出容量时淘汰最久未出现的指纹"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def seen(self, fingerprint: str, status: str, now: float) -> bool:
+        """
+        记录一次出现，返回是否为 ttl 内的重复（指纹和状态都相同）
+        重复不更新通知时间：持续触发的告警在上次通知 ttl 秒后会再次通知
+        """
+        previous = self._items.get(fingerprint)
+        duplicate = previous is not None and previous[0] == status and now - previous[1] < self.ttl
+        if not duplicate:
+            self._items[fingerprint] = (status, now)
+        self._items.move_to_end(fingerprint)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+        return duplicate
+
+    def __len__(self):
+        return len(self._items)
+
+
+class AlertGroup:
+    """一个时间窗口内同组告警的累计结果"""
+
+    __slots__ = ('team', 'key', 'labels', 'opened_at', 'firing', 'resolved', 'duplicates', 'samples')
+
+    def __init__(self, team, key: Tuple, labels: Dict[str, str], opened_at: float):
+        self.team = team
+        self.key = key
+        self.labels = labels
+        self.opened_at = opened_at
+        self.firing = 0
+        self.resolved = 0
+        self.duplicates = 0
+        # 保留前若干条告警作为消息中的示例
+        self.samples: List = []
+
+    @property
+    def total(self) -> int:
+        return self.firing + self.resolved + self.duplicates
+
+
+class AlertAggregator:
+    """告警去重与分组聚合，窗口结束后通过 flush_callback(team, group) 发送"""
+
+    def __init__(self, flush_callback: Callable, group_window: float, dedupe_ttl: float,
+                 fingerprint_cache_size: int, group_by: Optional[List[str]] = None,
+                 max_samples: int = 20, max_groups: int = 1000):
+        self.flush_callback = flush_callback
+        self.group_window = group_window
+        self.group_by = list(group_by or [])
+        self.max_samples = max_samples
+        self.max_groups = max_groups
+        self._fingerprints = FingerprintLRU(fingerprint_cache_size, dedupe_ttl)
+        # 按创建时间排序，最早的组最先到期
+        self._groups: "OrderedDict[Tuple, AlertGroup]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _group_labels(self, labels: Dict[str, str]) -> Dict[str, str]:
+        if not self.group_by:
+            return labels
+        return {name: labels.get(name, '') for name in self.group_by}
+
+    def add(self, alerts: List, team) -> dict:
+        """加入一批告警，返回 {"new": 新告警数, "duplicates": 重复数}"""
+        self._ensure_started()
+        now = time.monotonic()
+        new = duplicates = 0
+        overflow = []
+        with self._lock:
+            for alert in alerts:
+                labels = self._group_labels(alert.labels)
+                key = (team.team_id, tuple(sorted(labels.items())))
+                group = self._groups.get(key)
+                if group is None:
+                    group = AlertGroup(team, key, labels, now)
+                    self._groups[key] = group
+                    if len(self._groups) > self.max_groups:
+                        # 分组数超出上限时提前发送最早的组，保证内存有界
+                        overflow.append(self._groups.popitem(last=False)[1])
+
+                if self._fingerprints.seen(alert.fingerprint, alert.status, now):
+                    group.duplicates += 1
+                    duplicates += 1
+                    continue
+
+                new += 1
+                if alert.status == 'resolved':
+                    group.resolved += 1
+                else:
+                    group.firing += 1
+                if len(group.samples) < self.max_samples:
+                    group.samples.append(alert)
+
+        for group in overflow:
+            self._flush_group(group)
+        return {"new": new, "duplicates": duplicates}
+
+    def _due_groups(self, now: float, force: bool = False) -> List[AlertGroup]:
+        due = []
+        with self._lock:
+            while self._groups:
+                key, group = next(iter(self._groups.items()))
+                if not force and now - group.opened_at < self.group_window:
+                    break
+                del self._groups[key]
+                due.append(group)
+        return due
+
+    def _flush_group(self, group: AlertGroup):
+        if group.firing == 0 and group.resolved == 0:
+            # 窗口内全部是重复告警，之前的窗口已经通知过
+            logger.debug(f"告警组 {group.labels} 窗口内只有 {group.duplicates} 条重复告警，不再发送")
+            return
+        try:
+            self.flush_callback(group.team, group)
+        except Exception as e:
+            logger.error(f"❌ 发送告警汇总失败: {group.labels}，{str(e)}")
+
+    def flush(self, force: bool = False) -> int:
+        """发送已到期（force=True 时为全部）的告警组，返回发送的组数"""
+        groups = self._due_groups(time.monotonic(), force)
+        for group in groups:
+            self._flush_group(group)
+        return len(groups)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(min(1.0, self.group_window))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"告警聚合后台线程异常: {str(e)}")
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-aggregator', daemon=True)
+                self._thread.start()
+                logger.info(f"告警聚合后台线程已启动，窗口 {self.group_window}秒")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"groups": len(self._groups), "fingerprints": len(self._fingerprints)}
@@ -0,0 +1,285 @@
+"""
+告警转发模块
+接收 Alertmanager 兼容格式的告警，转发给当天的值班人员（钉钉消息 + @值班人）
+
+高并发下的处理方式：
+- 整批解析：一次请求中的所有告警只做一次JSON解析和字段提取
+- 每批只查询一次值班人员，直接读取内存中的值班计划缓存，不会逐条告警读取Excel
+- 每批只发送一条钉钉消息，在后台线程中发送，接口立即返回
+- 启用聚合时，告警先经过去重和分组（见 alert_aggregator），每组在时间窗口结束时发送一条汇总消息
+"""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from config.settings import ALERTS_CONFIG
+from src.services.alert_aggregator import AlertAggregator, AlertGroup
+from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+from src.services.excel_handler import get_original_duty_person, get_today_date
+from src.services.notification_dispatcher import dispatcher
+from src.services.team_registry import Team
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('alerts')
+
+STATUS_FIRING = 'firing'
+STATUS_RESOLVED = 'resolved'
+
+STATUS_TITLES = {
+    STATUS_FIRING: '🔥 告警',
+    STATUS_RESOLVED: '✅ 恢复',
+}
+
+
+class Alert:
+    """单条告警（Alertmanager 格式）"""
+
+    __slots__ = ('status', 'labels', 'annotations', 'starts_at', 'ends_at', 'generator_url', 'fingerprint')
+
+    def __init__(self, status: str, labels: Dict[str, str], annotations: Dict[str, str],
+                 starts_at: str = '', ends_at: str = '', generator_url: str = '', fingerprint: str = ''):
+        self.status = status
+        self.labels = labels
+        self.annotations = annotations
+        self.starts_at = starts_at
+        self.ends_at = ends_at
+        self.generator_url = generator_url
+        self.fingerprint = fingerprint or label_fingerprint(labels)
+
+    @property
+    def name(self) -> str:
+        return self.labels.get('alertname', '未命名告警')
+
+    @property
+    def summary(self) -> str:
+        return (self.annotations.get('summary') or self.annotations.get('description')
+                or self.annotations.get('message') or '')
+
+
+def label_fingerprint(labels: Dict[str, str]) -> str:
+    """按标签集合计算指纹（Alertmanager 未提供 fingerprint 时使用）"""
+    text = '\x00'.join(f"{key}\x01{value}" for key, value in sorted(labels.items()))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _mapping(value, field: str) -> dict:
+    """取对象类型的字段，缺省为空字典，类型不符时抛出 ValueError"""
+    if not value:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{field} 必须是对象")
+    return value
+
+
+def _text(item: dict, field: str) -> str:
+    """取字符串类型的字段，缺省为空字符串，类型不符时抛出 ValueError"""
+    value = item.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{field} 必须是字符串")
+    return value
+
+
+def _parse_one(item: dict, default_status: str, common_labels: dict, common_annotations: dict) -> Alert:
+    labels = _mapping(item.get('labels'), 'labels')
+    annotations = _mapping(item.get('annotations'), 'annotations')
+    if common_labels:
+        labels = {**common_labels, **labels}
+    if common_annotations:
+        annotations = {**common_annotations, **annotations}
+    ends_at = _text(item, 'endsAt')
+    status = _text(item, 'status') or default_status
+    # Alertmanager API v2 推送格式没有 status，按 endsAt 是否已设置区分
+    if not status:
+        status = STATUS_RESOLVED if ends_at and not ends_at.startswith('0001') else STATUS_FIRING
+    return Alert(status, labels, annotations, _text(item, 'startsAt'), ends_at,
+                 _text(item, 'generatorURL'), _text(item, 'fingerprint'))
+
+
+def parse_alerts(payload) -> List[Alert]:
+    """
+    整批解析告警，支持：
+    - Alertmanager Webhook 格式：{"status": ..., "alerts": [...], "commonLabels": ...}
+    - 多个 Webhook 负载组成的列表
+    - 告警列表（Alertmanager API v2 推送格式）
+
+    格式错误时抛出 ValueError
+    """
+    if isinstance(payload, dict):
+        if not isinstance(payload.get('alerts'), list):
+            raise ValueError("缺少 alerts 列表")
+        common_labels = _mapping(payload.get('commonLabels'), 'commonLabels')
+        common_annotations = _mapping(payload.get('commonAnnotations'), 'commonAnnotations')
+        default_status = _text(payload, 'status')
+        return [_parse_one(item, default_status, common_labels, common_annotations)
+                for item in payload['alerts'] if isinstance(item, dict)]
+
+    if isinstance(payload, list):
+        alerts = []
+        for item in payload:
+            if not isinstance(item, dict):
+                raise ValueError("告警必须是JSON对象")
+            if 'alerts' in item:
+                alerts.extend(parse_alerts(item))
+            else:
+                alerts.append(_parse_one(item, '', {}, {}))
+        return alerts
+
+    raise ValueError("请求体必须是JSON对象或数组")
+
+
+def resolve_oncall(team: Team, target_date: Optional[str] = None) -> Optional[str]:
+    """查询团队当天的值班人员：优先读取内存中的值班计划，计划缺少该日期时才走完整查询（可能重新生成计划）"""
+    target_date = target_date or get_today_date()
+    try:
+        person = team.get_plan().get_person(target_date)
+    except Exception as e:
+        logger.warning(f"读取值班计划失败: {str(e)}")
+        person = None
+    if person:
+        return person
+    return get_original_duty_person(target_date, team)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def render_alert_message(alerts: List[Alert], person: Optional[str], mention_text: str,
+                         max_lines: int, max_text_length: int) -> str:
+    """渲染一批告警的钉钉消息"""
+    firing = sum(1 for alert in alerts if alert.status == STATUS_FIRING)
+    resolved = len(alerts) - firing
+
+    lines = [f"【告警通知】共{len(alerts)}条（告警 {firing}，恢复 {resolved}）"]
+    for alert in alerts[:max_lines]:
+        title = STATUS_TITLES.get(alert.status, alert.status)
+        line = f"{title} {alert.name}"
+        severity = alert.labels.get('severity')
+        if severity:
+            line += f" [{severity}]"
+        if alert.summary:
+            line += f"：{alert.summary}"
+        lines.append(_truncate(line, max_text_length))
+    if len(alerts) > max_lines:
+        lines.append(f"……另有{len(alerts) - max_lines}条未列出")
+
+    if person:
+        # mention_text 为 Team.mention 给出的 @手机号 / @userId，找不到时只写姓名
+        lines.append(f"值班人：{person} {mention_text or '@' + person}")
+    else:
+        lines.append("⚠️ 未找到今日值班人员")
+    return "\n".join(lines)
+
+
+def render_group_message(group: AlertGroup, person: Optional[str], mention_text: str,
+                         max_lines: int, max_text_length: int) -> str:
+    """渲染一个告警组的汇总消息"""
+    labels = ' '.join(f"{key}={value}" for key, value in group.labels.items() if value) or '全部标签'
+    lines = [f"【告警汇总】{labels}",
+             f"告警 {group.firing} 条，恢复 {group.resolved} 条，重复 {group.duplicates} 条"]
+    for alert in group.samples[:max_lines]:
+        title = STATUS_TITLES.get(alert.status, alert.status)
+        line = f"{title} {alert.name}"
+        # 列出分组标签以外的标签，区分同组内的不同告警
+        extra = ' '.join(f"{key}={value}" for key, value in alert.labels.items()
+                         if key not in group.labels and key != 'alertname')
+        if extra:
+            line += f" ({extra})"
+        if alert.summary:
+            line += f"：{alert.summary}"
+        lines.append(_truncate(line, max_text_length))
+    unique = group.firing + group.resolved
+    if unique > min(len(group.samples), max_lines):
+        lines.append(f"……另有{unique - min(len(group.samples), max_lines)}条未列出")
+
+    if person:
+        # mention_text 为 Team.mention 给出的 @手机号 / @userId，找不到时只写姓名
+        lines.append(f"值班人：{person} {mention_text or '@' + person}")
+    else:
+        lines.append("⚠️ 未找到今日值班人员")
+    return "\n".join(lines)
+
+
+class AlertForwarder:
+    """
+    按批转发告警：每批查询一次值班人员、发送一条消息（后台发送）；
+    启用聚合时交给聚合器，由聚合器按组定时回调发送
+    """
+
+    def __init__(self, config: dict):
+        self.max_lines = config['max_lines']
+        self.max_text_length = config['max_text_length']
+        self._executor = ThreadPoolExecutor(max_workers=config['send_workers'], thread_name_prefix='alert')
+        self._lock = threading.Lock()
+        self.received = 0
+        self.batches = 0
+        self.aggregator: Optional[AlertAggregator] = None
+        if config['aggregate']:
+            self.aggregator = AlertAggregator(
+                self._send_group,
+                group_window=config['group_window'],
+                dedupe_ttl=config['dedupe_ttl'],
+                fingerprint_cache_size=config['fingerprint_cache_size'],
+                group_by=config['group_by'],
+                max_samples=self.max_lines,
+                max_groups=config['max_groups'],
+            )
+
+    def _send(self, team: Team, content: str, person: Optional[str], at: dict):
+        try:
+            # 与定时通知共用按Webhook的限流
+            dispatcher.rate_limiter.acquire(team.webhook)
+            result = send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret,
+                                                    **at)
+            if result.get('errcode') == 0:
+                logger.info(f"✅ 告警消息已发送: 团队 {team.team_id}，值班人 {person or '未找到'}")
+            else:
+                logger.error(f"❌ 告警消息发送失败: 团队 {team.team_id}，{result}")
+        except Exception as e:
+            logger.error(f"❌ 告警消息发送异常: 团队 {team.team_id}，{str(e)}")
+
+    def _send_group(self, team: Team, group: AlertGroup):
+        """聚合器回调：窗口结束时发送一组告警的汇总（在聚合器后台线程中执行）"""
+        person = resolve_oncall(team)
+        mention_text, at = team.mention(person)
+        content = render_group_message(group, person, mention_text, self.max_lines, self.max_text_length)
+        self._executor.submit(self._send, team, content, person, at)
+
+    def forward(self, alerts: List[Alert], team: Team) -> dict:
+        """转发一批告警，返回受理结果（消息在后台发送）"""
+        with self._lock:
+            self.received += len(alerts)
+            self.batches += 1
+
+        firing = sum(1 for alert in alerts if alert.status == STATUS_FIRING)
+        result = {
+            "team": team.team_id,
+            "accepted": len(alerts),
+            "firing": firing,
+            "resolved": len(alerts) - firing,
+        }
+
+        person = resolve_oncall(team)
+        result["oncall"] = person
+        if self.aggregator is not None:
+            result.update(self.aggregator.add(alerts, team))
+            return result
+
+        mention_text, at = team.mention(person)
+        content = render_alert_message(alerts, person, mention_text, self.max_lines, self.max_text_length)
+        self._executor.submit(self._send, team, content, person, at)
+        return result
+
+
+# 全局告警转发器
+alert_forwarder = AlertForwarder(ALERTS_CONFIG)
+
+
+def forward_alerts(alerts: List[Alert], team: Team) -> dict:
+    """转发一批告警的便捷函数"""
+    return alert_forwarder.forward(alerts, team)
@@ -0,0 +1,18 @@
+"""
+禅道指派轮换
+按距离基准日期的天数在 bug_persons 中轮换，不依赖其他模块，命令行等场景可以单独导入
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+# 禅道指派轮换的基准日期：从该日期开始计算天数差，确保轮换的一致性
+BUG_ROTATION_BASE_DATE = datetime(2025, 1, 1)
+
+
+def bug_assignment_person_for(target_date: datetime, bug_persons: List[dict]) -> Optional[str]:
+    """按轮换规则计算指定日期的禅道指派人员（不记录日志，供批量计算使用）"""
+    if not bug_persons:
+        return None
+    days_diff = (target_date - BUG_ROTATION_BASE_DATE).days
+    return bug_persons[days_diff % len(bug_persons)]["name"]
@@ -0,0 +1,180 @@
+"""
+iCalendar 订阅模块
+根据值班计划生成个人/全员的 .ics 日历（值班日 + 禅道指派日）
+
+每个计划版本只遍历一次计划，生成按人员分组的事件；渲染后的日历放入LRU缓存，
+日历客户端频繁轮询时直接返回缓存内容
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import CALENDAR_FEED_CONFIG
+from src.services.bug_rotation import bug_assignment_person_for
+from src.services.duty_plan import DutyPlan
+from src.services.team_registry import Team
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('calendar_feed')
+
+# 事件: (日期 YYYY-MM-DD, 事件类型 duty/bug, 人员)
+CalendarEvent = Tuple[str, str, str]
+
+EVENT_TITLES = {
+    'duty': '值班',
+    'bug': '禅道指派',
+}
+
+
+def _escape_text(text: str) -> str:
+    """按 RFC 5545 转义文本值"""
+    return (text.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _fold_line(line: str) -> str:
+    """按 RFC 5545 折行：每行不超过75个字节"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+
+    parts = []
+    current = ''
+    current_len = 0
+    limit = 75
+    for char in line:
+        char_len = len(char.encode('utf-8'))
+        if current_len + char_len > limit:
+            parts.append(current)
+            current = ''
+            current_len = 0
+            limit = 74  # 续行以一个空格开头
+        current += char
+        current_len += char_len
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def _person_key(person: Optional[str]) -> str:
+    """将人员名转换为适合放入ETag/UID的ASCII标识"""
+    if person is None:
+        return 'team'
+    return hashlib.sha1(person.encode('utf-8')).hexdigest()[:12]
+
+
+def build_events(plan: DutyPlan, bug_persons: List[dict]) -> Dict[str, List[CalendarEvent]]:
+    """遍历一次计划，生成按人员分组的事件"""
+    events: Dict[str, List[CalendarEvent]] = {}
+    for date_str, person in plan.items():
+        # 无法解析的日期（如备注行）不生成任何事件，渲染时可直接按 YYYY-MM-DD 解析
+        try:
+            day = datetime.strptime(date_str, "%Y-%m-%d")
+        except ValueError:
+            continue
+        if person:
+            events.setdefault(person, []).append((date_str, 'duty', person))
+        bug_person = bug_assignment_person_for(day, bug_persons)
+        if bug_person:
+            events.setdefault(bug_person, []).append((date_str, 'bug', bug_person))
+    return events
+
+
+def render_calendar(plan: DutyPlan, events: List[CalendarEvent], person: Optional[str] = None) -> bytes:
+    """
+    渲染 iCalendar 内容
+
+    参数:
+        plan: 值班计划（用于生成稳定的时间戳）
+        events: 要输出的事件
+        person: 人员名，None表示全员日历
+
+    返回:
+        UTF-8编码的 .ics 内容
+    """
+    calendar_name = CALENDAR_FEED_CONFIG['calendar_name']
+    if person:
+        calendar_name = f"{calendar_name} - {person}"
+
+    # 使用计划文件修改时间作为时间戳，保证同一版本输出完全一致
+    dtstamp = datetime.fromtimestamp(plan.mtime, tz=timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//OnCall//Duty Calendar//CN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape_text(calendar_name)}",
+        "X-WR-TIMEZONE:Asia/Shanghai",
+    ]
+    for date_str, kind, name in sorted(events):
+        start = datetime.strptime(date_str, "%Y-%m-%d")
+        end = start + timedelta(days=1)
+        title = EVENT_TITLES[kind] if person else f"{EVENT_TITLES[kind]}：{name}"
+        lines.extend([
+            "BEGIN:VEVENT",
+            f"UID:{kind}-{start.strftime('%Y%m%d')}-{_person_key(name)}@oncall",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{end.strftime('%Y%m%d')}",
+            f"SUMMARY:{_escape_text(title)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ])
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold_line(line) for line in lines) + "\r\n").encode('utf-8')
+
+
+class CalendarFeedCache:
+    """按 (团队, 计划版本) 缓存事件，按 (团队, 计划版本, 人员) 缓存渲染结果（LRU）"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._feeds: "OrderedDict[Tuple[str, str, Optional[str]], bytes]" = OrderedDict()
+        self._events: Dict[str, Tuple[str, Dict[str, List[CalendarEvent]]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_events(self, team: Team, plan: DutyPlan) -> Dict[str, List[CalendarEvent]]:
+        cached = self._events.get(team.team_id)
+        if cached is not None and cached[0] == plan.version:
+            return cached[1]
+        events = build_events(plan, team.bug_persons)
+        self._events[team.team_id] = (plan.version, events)
+        logger.info(f"✅ 已生成日历事件: 团队 {team.team_id}，版本 {plan.version}，{len(events)}人")
+        return events
+
+    def get_feed(self, team: Team, plan: DutyPlan, person: Optional[str] = None) -> Optional[bytes]:
+        """获取日历内容，人员在计划和禅道指派中都不存在时返回None"""
+        key = (team.team_id, plan.version, person)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None:
+                self._feeds.move_to_end(key)
+                return feed
+
+            events = self._get_events(team, plan)
+            if person is None:
+                person_events = [event for items in events.values() for event in items]
+            elif person in events:
+                person_events = events[person]
+            else:
+                return None
+
+            feed = render_calendar(plan, person_events, person)
+            self._feeds[key] = feed
+            if len(self._feeds) > self.maxsize:
+                self._feeds.popitem(last=False)
+            return feed
+
+
+# 全局日历缓存
+calendar_cache = CalendarFeedCache(CALENDAR_FEED_CONFIG['cache_size'])
+
+
+def calendar_etag(team: Team, plan: DutyPlan, person: Optional[str] = None) -> str:
+    """日历的ETag：团队 + 计划版本 + 人员标识"""
+    return f"{_person_key(team.team_id)}-{plan.version}-{_person_key(person)}"
@@ -1,4 +1,3 @@
-import requests
 import time
 import json
 import hmac
@@ -7,9 +6,20 @@ import base64
 import urllib.parse
 from config.settings import DINGTALK_ROBOT_WEBHOOK
 
+# 企业应用API的访问令牌（进程内缓存，过期前复用）：令牌地址 -> (令牌, 过期时间)
+_access_tokens = {}
 
-def send_dingtalk_message(content, webhook_url=None, at_all=True, secret=None):
-    """发送文本消息到钉钉群（使用自定义机器人方式）"""
+
+def send_dingtalk_message(content, webhook_url=None, at_all=True, secret=None, session=None, timeout=None,
+                          at_mobiles=None, at_user_ids=None):
+    """
+    发送文本消息到钉钉群（使用自定义机器人方式）
+
+    at_mobiles / at_user_ids: 需要@的人员手机号 / 钉钉userId（手机号需同时出现在消息内容中，如「@138xxxx」）
+
+    session: 可选的 requests.Session，批量发送时复用长连接
+    timeout: 请求超时（秒），None 表示不限制
+    """
 
     # 使用配置中的Webhook URL
     if not webhook_url:
@@ -29,6 +39,14 @@ def send_dingtalk_message(content, webhook_url=None, at_all=True, secret=None):
             "isAtAll": True
         }
 
+    # @指定人员
+    if at_mobiles or at_user_ids:
+        data["at"] = {
+            "atMobiles": list(at_mobiles or []),
+            "atUserIds": list(at_user_ids or []),
+            "isAtAll": bool(at_all)
+        }
+
     headers = {"Content-Type": "application/json;charset=utf-8"}
 
     # 如果配置了签名密钥，需要添加签名
@@ -46,8 +64,17 @@ def send_dingtalk_message(content, webhook_url=None, at_all=True, secret=None):
         else:
             webhook_url += f'?timestamp={timestamp}&sign={sign}'
 
+    # requests 仅在真正发送时导入，避免拖慢启动
+    import requests
+
     try:
-        response = requests.post(webhook_url, json=data, headers=headers)
+        poster = session.post if session is not None else requests.post
+        response = poster(webhook_url, json=data, headers=headers, timeout=timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            # 限流或服务端错误：返回体不一定是JSON，统一转换为可重试的错误
+            result = {"errcode": -1, "errmsg": f"HTTP {response.status_code}", "http_status": response.status_code}
+            print(f"发送消息失败: {result}")
+            return result
         result = response.json()
         print(f"发送消息结果: {result}")
         return result
@@ -56,47 +83,52 @@ def send_dingtalk_message(content, webhook_url=None, at_all=True, secret=None):
         return {"errcode": -1, "errmsg": str(e)}
 
 
+def get_access_token(token_url=None, session=None, timeout=None):
+    """
+    获取企业应用API的访问令牌（按令牌地址缓存，过期前5分钟刷新）
+
+    token_url: 令牌接口地址，默认 DINGTALK_GET_TOKEN_URL（指向本地桩服务时可传入桩服务地址）
+    """
+    import requests
+    from config.settings import DINGTALK_APP_KEY, DINGTALK_APP_SECRET, DINGTALK_GET_TOKEN_URL
+
+    url = token_url or DINGTALK_GET_TOKEN_URL
+
+    # 如果令牌还有效，直接返回
+    cached = _access_tokens.get(url)
+    if cached and time.time() < cached[1]:
+        return cached[0]
+
+    # 获取新的访问令牌
+    params = {
+        'appkey': DINGTALK_APP_KEY,
+        'appsecret': DINGTALK_APP_SECRET
+    }
+
+    try:
+        getter = session.get if session is not None else requests.get
+        response = getter(url, params=params, timeout=timeout)
+        result = response.json()
+
+        if result.get('errcode') == 0:
+            access_token = result.get('access_token')
+            # 设置令牌过期时间（提前5分钟刷新）
+            _access_tokens[url] = (access_token, time.time() + result.get('expires_in', 7200) - 300)
+            print("获取访问令牌成功")
+            return access_token
+        else:
+            print(f"获取访问令牌失败: {result}")
+            return None
+    except Exception as e:
+        print(f"获取访问令牌异常: {str(e)}")
+        return None
+
+
 # 保留原有的企业应用API方式作为备用
 def send_dingtalk_message_enterprise(content, at_all=True):
     """发送文本消息到钉钉群（企业应用API方式）"""
-    from config.settings import DINGTALK_APP_KEY, DINGTALK_APP_SECRET, DINGTALK_GET_TOKEN_URL, DINGTALK_SEND_MESSAGE_URL
-
-    # 全局变量存储访问令牌
-    global _access_token, _token_expire_time
-    _access_token = None
-    _token_expire_time = 0
-
-    def get_access_token():
-        """获取钉钉访问令牌"""
-        global _access_token, _token_expire_time
-
-        # 如果令牌还有效，直接返回
-        if _access_token and time.time() < _token_expire_time:
-            return _access_token
-
-        # 获取新的访问令牌
-        url = DINGTALK_GET_TOKEN_URL
-        params = {
-            'appkey': DINGTALK_APP_KEY,
-            'appsecret': DINGTALK_APP_SECRET
-        }
-
-        try:
-            response = requests.get(url, params=params)
-            result = response.json()
-
-            if result.get('errcode') == 0:
-                _access_token = result.get('access_token')
-                # 设置令牌过期时间（提前5分钟刷新）
-                _token_expire_time = time.time() + result.get('expires_in', 7200) - 300
-                print(f"获取访问令牌成功: {_access_token}")
-                return _access_token
-            else:
-                print(f"获取访问令牌失败: {result}")
-                return None
-        except Exception as e:
-            print(f"获取访问令牌异常: {str(e)}")
-            return None
+    import requests
+    from config.settings import DINGTALK_SEND_MESSAGE_URL
 
     access_token = get_access_token()
     if not access_token:
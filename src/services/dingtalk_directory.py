@@ -0,0 +1,165 @@
+"""
+钉钉通讯录缓存
+通过企业应用API批量拉取部门成员，在内存中保存 姓名 -> (userId, 手机号) 的字典，供通知时@值班人使用：
+- 发送通知时只做一次字典查找，不会为每条消息调用通讯录接口
+- 后台线程按 TTL 定期整体刷新，新字典构建完成后一次性替换；刷新失败时继续使用旧数据并稍后重试
+- 同名成员无法区分，不参与@（人员配置中可用 mobile / userid 字段显式指定）
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import DINGTALK_DIRECTORY_CONFIG
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('dingtalk_directory')
+
+# 姓名 -> (userId, 手机号)，手机号需要通讯录个人信息权限，没有权限时为None
+DirectoryEntries = Dict[str, Tuple[str, Optional[str]]]
+
+
+class DirectoryError(Exception):
+    """通讯录接口返回错误"""
+
+
+class DingTalkDirectory:
+    """钉钉通讯录缓存，配置项见 DINGTALK_DIRECTORY_CONFIG"""
+
+    def __init__(self, config: dict):
+        self.enabled = config['enabled']
+        # 开放平台地址（令牌、部门、成员接口都在该地址下）
+        self.api_base = config['api_base'].rstrip('/')
+        self.root_dept_ids = list(config['root_dept_ids'])
+        self.ttl = config['ttl']
+        self.retry_interval = config['retry_interval']
+        self.page_size = config['page_size']
+        self.timeout = config['timeout']
+        self._entries: DirectoryEntries = {}
+        self._ambiguous: List[str] = []
+        self._loaded_at: Optional[float] = None
+        self._last_error: Optional[Tuple[float, str]] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def lookup(self, name: Optional[str]) -> Optional[Tuple[str, Optional[str]]]:
+        """按姓名查找 (userId, 手机号)，只读内存中的字典；未加载或找不到时返回None"""
+        if not name:
+            return None
+        return self._entries.get(name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _call(self, session, path: str, access_token: str, body: dict) -> dict:
+        response = session.post(f"{self.api_base}{path}", params={'access_token': access_token},
+                                json=body, timeout=self.timeout)
+        result = response.json()
+        if result.get('errcode') != 0:
+            raise DirectoryError(f"{path}: {result.get('errcode')} {result.get('errmsg')}")
+        return result.get('result') or {}
+
+    def fetch(self) -> Tuple[DirectoryEntries, List[str]]:
+        """从钉钉拉取完整通讯录，返回 (姓名字典, 同名而无法区分的姓名)"""
+        import requests
+        from src.services.dingtalk import get_access_token
+
+        with requests.Session() as session:
+            access_token = get_access_token(f"{self.api_base}/gettoken", session=session, timeout=self.timeout)
+            if not access_token:
+                raise DirectoryError("无法获取访问令牌")
+
+            # 广度优先展开部门树
+            dept_ids = list(self.root_dept_ids)
+            seen_depts = set(dept_ids)
+            index = 0
+            while index < len(dept_ids):
+                result = self._call(session, '/topapi/v2/department/listsubid', access_token,
+                                    {'dept_id': dept_ids[index]})
+                for dept_id in result.get('dept_id_list', []):
+                    if dept_id not in seen_depts:
+                        seen_depts.add(dept_id)
+                        dept_ids.append(dept_id)
+                index += 1
+
+            # 逐部门分页拉取成员；同一成员可能属于多个部门，按 userId 去重
+            users: Dict[str, Tuple[str, Optional[str]]] = {}
+            for dept_id in dept_ids:
+                cursor = 0
+                while True:
+                    result = self._call(session, '/topapi/v2/user/list', access_token,
+                                        {'dept_id': dept_id, 'cursor': cursor, 'size': self.page_size})
+                    for user in result.get('list', []):
+                        if user.get('userid') and user.get('name'):
+                            users[user['userid']] = (user['name'], user.get('mobile') or None)
+                    if not result.get('has_more'):
+                        break
+                    cursor = result.get('next_cursor')
+
+        entries: DirectoryEntries = {}
+        ambiguous = set()
+        for userid, (name, mobile) in users.items():
+            if name in entries:
+                ambiguous.add(name)
+            else:
+                entries[name] = (userid, mobile)
+        for name in ambiguous:
+            del entries[name]
+        return entries, sorted(ambiguous)
+
+    def refresh(self) -> bool:
+        """立即刷新一次，成功返回True；失败时保留旧数据"""
+        with self._refresh_lock:
+            started = time.monotonic()
+            try:
+                entries, ambiguous = self.fetch()
+            except Exception as e:
+                self._last_error = (time.time(), str(e))
+                logger.error("❌ 刷新钉钉通讯录失败（继续使用现有 %s 条）: %s", len(self._entries), e)
+                return False
+            # 整体替换，查找方始终看到完整的一份字典
+            self._entries = entries
+            self._ambiguous = ambiguous
+            self._loaded_at = time.time()
+            self._last_error = None
+        logger.info("✅ 钉钉通讯录已刷新: %s 人，耗时 %.2f秒", len(entries), time.monotonic() - started)
+        if ambiguous:
+            logger.warning("⚠️ 通讯录中存在同名成员，不会自动@: %s", '、'.join(ambiguous))
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            interval = self.ttl if self.refresh() else self.retry_interval
+            self._stop.wait(interval)
+
+    def start(self) -> bool:
+        """启动后台刷新线程（首次加载也在后台进行，不阻塞启动），未启用时返回False"""
+        if not self.enabled:
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='dingtalk-directory', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        """缓存状态，用于健康检查"""
+        now = time.time()
+        status = {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "age": round(now - self._loaded_at, 3) if self._loaded_at is not None else None,
+            "ambiguous": list(self._ambiguous),
+        }
+        if self._last_error is not None:
+            status["last_error"] = {"age": round(now - self._last_error[0], 3), "message": self._last_error[1]}
+        return status
+
+
+# 全局通讯录缓存
+directory = DingTalkDirectory(DINGTALK_DIRECTORY_CONFIG)
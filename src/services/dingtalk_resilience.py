@@ -0,0 +1,233 @@
+"""
+钉钉发送容错模块
+在 send_dingtalk_message 外层提供：
+- 错误码分类：区分可重试错误（系统繁忙、限流、网络/服务端错误）和不可重试错误（签名、关键词、令牌等配置问题）
+- 指数退避 + 随机抖动重试
+- 重试预算：故障期间限制重试总量，避免重试放大流量
+- 熔断器：同一Webhook连续失败后快速失败，超时后放行试探请求
+- 可选回退：机器人Webhook不可用时改用企业应用API发送
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from config.settings import DINGTALK_RESILIENCE_CONFIG, DINGTALK_ROBOT_WEBHOOK
+from src.services.dingtalk import send_dingtalk_message, send_dingtalk_message_enterprise
+from src.services.health import record_dingtalk_send
+from src.utils.clock import get_clock
+from src.utils.log_utils import backoff_delay
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('dingtalk_resilience')
+
+# 可重试的钉钉错误码：-1 系统繁忙（网络异常、HTTP 429/5xx 也转换为 -1），130101 / 410100 发送过快被限流
+RETRYABLE_ERRCODES = {-1, 130101, 410100}
+
+# 熔断期间快速失败返回的错误码
+CIRCUIT_OPEN_ERRCODE = -2
+
+RESULT_OK = 'ok'
+RESULT_RETRYABLE = 'retryable'
+RESULT_FATAL = 'fatal'
+
+
+def classify_result(result: Optional[dict]) -> str:
+    """对发送结果分类：ok / retryable / fatal"""
+    if not isinstance(result, dict):
+        return RESULT_RETRYABLE
+    errcode = result.get('errcode')
+    if errcode == 0:
+        return RESULT_OK
+    if errcode in RETRYABLE_ERRCODES:
+        return RESULT_RETRYABLE
+    return RESULT_FATAL
+
+
+class RetryBudget:
+    """重试预算：period 秒内的重试次数不超过 max(min_retries, 请求数 * ratio)"""
+
+    def __init__(self, ratio: float, min_retries: int, period: float):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.period = period
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] >= self.period:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = get_clock().monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """申请一次重试，预算耗尽时返回False"""
+        with self._lock:
+            now = get_clock().monotonic()
+            self._trim(now)
+            allowed = max(self.min_retries, int(len(self._requests) * self.ratio))
+            if len(self._retries) >= allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    - closed: 正常放行，连续失败达到阈值后转为 open
+    - open: 快速失败，reset_timeout 秒后转为 half_open
+    - half_open: 只放行一个试探请求，成功则恢复 closed，失败则重新 open
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if get_clock().monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """结束本次请求但不计入成功或失败（如不可重试的配置错误），half_open 时允许下一个试探请求"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回本次是否触发熔断"""
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                tripped = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = get_clock().monotonic()
+                return tripped
+            return False
+
+
+class ResilientDingTalkClient:
+    """带重试、重试预算、熔断和回退的钉钉机器人发送客户端"""
+
+    def __init__(self, config: dict):
+        self.max_retries = config['max_retries']
+        self.base_delay = config['base_delay']
+        self.max_delay = config['max_delay']
+        self.fallback_enterprise = config['fallback_enterprise']
+        self.budget = RetryBudget(config['budget_ratio'], config['budget_min_retries'], config['budget_period'])
+        self._breaker_args = (config['breaker_failure_threshold'], config['breaker_reset_timeout'])
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get_breaker(self, webhook_url: str) -> CircuitBreaker:
+        """每个Webhook一个熔断器"""
+        with self._lock:
+            breaker = self._breakers.get(webhook_url)
+            if breaker is None:
+                breaker = CircuitBreaker(*self._breaker_args)
+                self._breakers[webhook_url] = breaker
+            return breaker
+
+    def breaker_states(self) -> Dict[str, str]:
+        with self._lock:
+            return {url.split('access_token=')[-1][:8]: breaker.state for url, breaker in self._breakers.items()}
+
+    def send(self, content, webhook_url=None, at_all=True, secret=None, session=None, timeout=None,
+             at_mobiles=None, at_user_ids=None) -> dict:
+        """发送消息，参数与 send_dingtalk_message 相同；返回最后一次的发送结果"""
+        webhook_url = webhook_url or DINGTALK_ROBOT_WEBHOOK
+        breaker = self.get_breaker(webhook_url)
+        self.budget.record_request()
+
+        result = None
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                logger.warning("⚡ 钉钉机器人处于熔断状态，快速失败")
+                result = {"errcode": CIRCUIT_OPEN_ERRCODE, "errmsg": "circuit open"}
+                break
+
+            result = send_dingtalk_message(content, webhook_url=webhook_url, at_all=at_all, secret=secret,
+                                           session=session, timeout=timeout,
+                                           at_mobiles=at_mobiles, at_user_ids=at_user_ids)
+            outcome = classify_result(result)
+            if outcome == RESULT_OK:
+                breaker.record_success()
+                if attempt:
+                    logger.info(f"✅ 钉钉消息重试成功，共重试 {attempt} 次")
+                return result
+
+            if outcome == RESULT_FATAL:
+                # 配置类错误（签名、关键词、令牌等）重试无意义，也不计入熔断；需释放 half_open 的试探名额
+                breaker.release()
+                logger.error(f"❌ 钉钉消息发送失败（不可重试）: {result}")
+                return result
+
+            if breaker.record_failure():
+                logger.error(f"⚡ 钉钉机器人连续失败 {breaker.failures} 次，熔断 {breaker.reset_timeout} 秒")
+
+            if attempt >= self.max_retries:
+                logger.error(f"❌ 钉钉消息发送失败，已重试 {attempt} 次: {result}")
+                break
+            if not self.budget.try_acquire():
+                logger.error(f"❌ 重试预算已耗尽，放弃重试: {result}")
+                break
+
+            attempt += 1
+            wait = backoff_delay(attempt, self.base_delay, 2.0, self.max_delay, jitter=True)
+            logger.warning(f"钉钉消息发送失败（可重试）: {result}，{wait:.2f}秒后第 {attempt}/{self.max_retries} 次重试")
+            get_clock().sleep(wait)
+
+        if self.fallback_enterprise:
+            logger.warning("↪️ 机器人Webhook不可用，改用企业应用API发送")
+            fallback_result = send_dingtalk_message_enterprise(content, at_all=at_all)
+            if classify_result(fallback_result) == RESULT_OK:
+                return fallback_result
+            logger.error(f"❌ 企业应用API发送失败: {fallback_result}")
+        return result
+
+
+# 全局容错客户端
+resilient_client = ResilientDingTalkClient(DINGTALK_RESILIENCE_CONFIG)
+
+
+def send_dingtalk_message_reliably(content, webhook_url=None, at_all=True, secret=None, session=None,
+                                   timeout=None, at_mobiles=None, at_user_ids=None) -> dict:
+    """带重试、熔断和回退的 send_dingtalk_message"""
+    result = resilient_client.send(content, webhook_url=webhook_url, at_all=at_all, secret=secret,
+                                   session=session, timeout=timeout,
+                                   at_mobiles=at_mobiles, at_user_ids=at_user_ids)
+    record_dingtalk_send(result)
+    return result
@@ -0,0 +1,195 @@
+"""
+钉钉机器人命令
+在全局命令路由器上注册值班相关的命令及参数词（日期、人员），供 Webhook 调用
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from src.services.duty_plan import WEEKDAY_NAMES, DutyPlan
+from src.services.escalation import escalation_manager
+from src.services.excel_handler import get_bug_assignment_person, get_today_date
+from src.services.team_registry import Team, get_team, team_registry
+from src.utils.command_router import CommandContext, CommandRouter
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('duty_commands')
+
+# 全局命令路由器
+router = CommandRouter()
+
+DEFAULT_REPLY = "您好！我是OnCall值班机器人🤖\n\n{commands}"
+
+
+def _weekday_resolver(weekday: int, week_offset: int = 0):
+    """「周三」「下周一」等：本周（或下N周）的指定周几"""
+
+    def resolve(context: CommandContext) -> date:
+        monday = context.today - timedelta(days=context.today.weekday())
+        return monday + timedelta(days=7 * week_offset + weekday)
+
+    return resolve
+
+
+def _day_offset_resolver(days: int):
+    """「今天」「明天」等：相对今天的偏移"""
+    return lambda context: context.today + timedelta(days=days)
+
+
+def _date_entities() -> Dict[str, object]:
+    entities = {
+        "今天": _day_offset_resolver(0),
+        "今日": _day_offset_resolver(0),
+        "明天": _day_offset_resolver(1),
+        "明日": _day_offset_resolver(1),
+        "后天": _day_offset_resolver(2),
+        "大后天": _day_offset_resolver(3),
+        "昨天": _day_offset_resolver(-1),
+        "前天": _day_offset_resolver(-2),
+        "本周": _day_offset_resolver(0),
+        "这周": _day_offset_resolver(0),
+        "下周": _day_offset_resolver(7),
+        "上周": _day_offset_resolver(-7),
+    }
+    for index, name in enumerate(WEEKDAY_NAMES):
+        suffix = name[1:]
+        suffixes = [suffix, "天"] if suffix == "日" else [suffix]
+        for suffix in suffixes:
+            for prefix, offset in (("", 0), ("本", 0), ("这", 0), ("下", 1), ("上", -1)):
+                entities[f"{prefix}周{suffix}"] = _weekday_resolver(index, offset)
+                entities[f"{prefix}星期{suffix}"] = _weekday_resolver(index, offset)
+    return entities
+
+
+def _person_entities(plans: List[Optional[DutyPlan]]) -> Dict[str, object]:
+    """人员参数词：各团队人员名单及值班计划中出现的姓名；「我」不作为参数词，未提及姓名时默认就是发送者"""
+    names = []
+    for team, plan in zip(team_registry.all(), plans):
+        names.extend(person["name"] for person in team.duty_persons + team.bug_persons)
+        if plan is not None:
+            names.extend(plan.persons())
+    return {name: (lambda context, name=name: name) for name in names}
+
+
+def _team_plans() -> List[Optional[DutyPlan]]:
+    plans = []
+    for team in team_registry.all():
+        try:
+            plans.append(team.get_plan())
+        except Exception as e:
+            logger.debug("读取团队 %s 的值班计划失败，人员参数词只使用人员名单: %s", team.team_id, e)
+            plans.append(None)
+    return plans
+
+
+_person_versions: Optional[tuple] = None
+_person_lock = threading.Lock()
+
+
+def sync_person_entities():
+    """各团队值班计划的版本变化时重建人员参数词"""
+    global _person_versions
+    plans = _team_plans()
+    versions = tuple(plan.version if plan is not None else None for plan in plans)
+    if versions == _person_versions:
+        return
+    with _person_lock:
+        if versions != _person_versions:
+            router.set_entities('person', _person_entities(plans))
+            _person_versions = versions
+
+
+router.add_entities('date', _date_entities())
+
+
+def today_date() -> date:
+    """今天日期（date）"""
+    return datetime.strptime(get_today_date(), "%Y-%m-%d").date()
+
+
+def _team(context: CommandContext) -> Team:
+    """消息所属的团队，未指定时为默认团队"""
+    return context.scope or get_team()
+
+
+@router.command('duty', ["值班", "谁值班", "工作安排", "值日", "oncall", "OnCall"],
+                "发送「值班」或「明天谁值班」可以查询工作安排")
+def handle_duty(context: CommandContext) -> str:
+    """查询指定日期（默认今天）的工作安排（只读计划，计划外的日期回复未排班，不会重新生成计划）"""
+    target = context.date.strftime("%Y-%m-%d")
+    team = _team(context)
+    plan = team.get_plan()
+    duty_person = plan.get_person(target)
+    bug_person = get_bug_assignment_person(target, team)
+
+    logger.info(f"查询结果 - 值班人: {duty_person or '未找到'}, 禅道指派: {bug_person or '未找到'}")
+
+    # 构建回复内容
+    reply_parts = [f"📅 {target} 工作安排："]
+
+    if duty_person:
+        reply_parts.append(f"🔧 值班人：{duty_person}")
+    elif target not in plan:
+        reply_parts.append(f"❌ 未排班（值班计划截至 {plan.last_date or '无'}）")
+    else:
+        reply_parts.append("❌ 未找到值班人员")
+
+    if bug_person:
+        reply_parts.append(f"🐛 禅道指派：{bug_person}")
+
+    return "\n".join(reply_parts)
+
+
+@router.command('week', ["周值班", "周安排", "本周谁值班", "这周谁值班", "下周谁值班", "一周值班"],
+                "发送「本周值班」或「下周值班」可以查询一周的值班安排")
+def handle_week(context: CommandContext) -> str:
+    """查询指定日期所在周（周一至周日）的值班安排"""
+    monday = context.date - timedelta(days=context.date.weekday())
+    plan = _team(context).get_plan()
+
+    reply_parts = [f"📅 {monday.strftime('%Y-%m-%d')} 起一周值班安排："]
+    for offset in range(7):
+        day = monday + timedelta(days=offset)
+        person = plan.get_person(day.strftime("%Y-%m-%d"))
+        reply_parts.append(f"{WEEKDAY_NAMES[offset]} {day.strftime('%m-%d')}：{person or '未排班'}")
+    return "\n".join(reply_parts)
+
+
+@router.command('next_shift', ["下次值班", "下一次值班", "下回值班", "什么时候值班", "哪天值班"],
+                "发送「我下次值班」或「<姓名>下次值班」可以查询下次值班日期")
+def handle_next_shift(context: CommandContext) -> str:
+    """查询某人（默认发送者）的下次值班日期，含今天"""
+    person = context.person
+    plan = _team(context).get_plan()
+    next_date = plan.next_shift(person, context.today, inclusive=True) if person else None
+    if next_date:
+        return f"📅 {person} 下次值班：{next_date}"
+    return f"❌ 未找到{person or '您'}在值班计划中的后续值班"
+
+
+@router.command('ack', ["收到", "已收到", "确认", "ack"], "值班人回复「收到」确认值班通知，超时未确认将升级给备份值班人",
+                exact=True)
+def handle_ack(context: CommandContext) -> str:
+    """确认本团队最近一条值班通知"""
+    return escalation_manager.acknowledge(_team(context), context.sender)
+
+
+@router.command('help', ["帮助", "help", "菜单", "怎么用"], "发送「帮助」查看所有命令")
+def handle_help(context: CommandContext) -> str:
+    """列出所有命令"""
+    return default_reply()
+
+
+def default_reply() -> str:
+    """默认回复：列出所有命令的说明"""
+    commands = "\n".join(command.description for command in router.commands if command.description)
+    return DEFAULT_REPLY.format(commands=commands)
+
+
+def dispatch_message(text: str, sender: Optional[str] = None, payload: Optional[dict] = None,
+                     team: Optional[Team] = None) -> Optional[Tuple[str, str]]:
+    """分发钉钉消息（按 team 限定查询范围），返回 (命令名, 回复内容)；未命中任何命令返回None"""
+    sync_person_entities()
+    return router.dispatch(text, today_date(), sender, payload, team)
@@ -0,0 +1,405 @@
+"""
+值班计划加载模块
+使用 openpyxl 只读（流式）模式逐行读取值班计划表，只提取「日期」「姓名」两列，
+直接编译为按日期索引的内存结构（同时构建 人员 -> 值班日 的反向索引），不再构建 DataFrame
+
+编译结果按文件路径缓存，文件修改时间或大小变化后自动重新加载；
+命令行等短生命周期进程还可以把编译结果存到磁盘（load_duty_plan_snapshot），文件未变化时不再解析Excel
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from config.settings import ORIGINAL_DUTY_EXCEL
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('duty_plan')
+
+DATE_COLUMN = "日期"
+NAME_COLUMN = "姓名"
+REQUIRED_COLUMNS = [DATE_COLUMN, NAME_COLUMN]
+
+# 支持的日期字符串格式
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%m-%d-%Y", "%m/%d/%Y",
+                "%Y年%m月%d日", "%m月%d日%Y年"]
+
+# 周几名称（按 date.weekday() 顺序）
+WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+# 在每个工作表的前几行中查找表头
+HEADER_SCAN_ROWS = 10
+
+
+class PlanFormatError(ValueError):
+    """值班计划表结构不正确（缺少必需的列）"""
+
+    def __init__(self, missing_columns: List[str], actual_columns: List[str]):
+        self.missing_columns = missing_columns
+        self.actual_columns = actual_columns
+        super().__init__(f"值班计划表缺少必需的列: {', '.join(missing_columns)}")
+
+
+def parse_plan_date(value) -> Optional[str]:
+    """将单元格中的日期（兼容多种格式）统一转换为 YYYY-MM-DD 字符串"""
+    if value is None:
+        return None
+    # 日期单元格（openpyxl 返回 datetime/date）
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    # 数值型（Excel日期序列）
+    if isinstance(value, (int, float)):
+        return (datetime(1899, 12, 30) + timedelta(days=value)).strftime("%Y-%m-%d")
+    # 字符串型（尝试常见格式）
+    if isinstance(value, str):
+        text = value.strip()
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+            except ValueError:
+                continue
+        return text  # 无法解析的格式返回原始值
+    return str(value)  # 其他类型转字符串
+
+
+def plan_version(stat: os.stat_result) -> str:
+    """计划版本号：由文件修改时间和大小决定，文件变化即版本变化"""
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def _to_ordinal(value: Union[str, date]) -> int:
+    """将 YYYY-MM-DD 字符串或日期转换为日序号"""
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+    return value.toordinal()
+
+
+class DutyPlan:
+    """编译后的值班计划：日期 -> 值班人，以及 人员 -> 值班日 的反向索引"""
+
+    __slots__ = ('path', 'version', 'mtime', 'size', 'loaded_at', 'row_count', 'last_date', '_by_date', '_by_person')
+
+    def __init__(self, path: str, by_date: Dict[str, Optional[str]], stat: os.stat_result, row_count: int):
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.version = plan_version(stat)
+        self.loaded_at = time.time()
+        self.row_count = row_count
+        self._by_date = by_date
+        self._by_person = self._build_person_index(by_date)
+        # 计划覆盖的最后一天（YYYY-MM-DD），用于检查计划是否即将用完
+        self.last_date = max(by_date) if by_date else None
+
+    @staticmethod
+    def _build_person_index(by_date: Dict[str, Optional[str]]) -> Dict[str, array]:
+        """构建反向索引：人员 -> 升序排列的值班日序号（date.toordinal()）"""
+        index: Dict[str, List[int]] = {}
+        for date_str, person in by_date.items():
+            if not person:
+                continue
+            try:
+                ordinal = _to_ordinal(date_str)
+            except ValueError:
+                continue  # 无法解析的日期不参与反向索引
+            index.setdefault(person, []).append(ordinal)
+        return {person: array('l', sorted(ordinals)) for person, ordinals in index.items()}
+
+    def get_person(self, date_str: str) -> Optional[str]:
+        """获取指定日期（YYYY-MM-DD）的值班人，未排班返回None"""
+        return self._by_date.get(date_str)
+
+    def __contains__(self, date_str: str) -> bool:
+        return date_str in self._by_date
+
+    def __len__(self) -> int:
+        return len(self._by_date)
+
+    def items(self) -> Iterator[Tuple[str, Optional[str]]]:
+        """按日期升序遍历 (日期, 值班人)"""
+        return iter(sorted(self._by_date.items()))
+
+    def persons(self) -> List[str]:
+        """计划中出现的所有值班人"""
+        return list(self._by_person)
+
+    def shift_index(self) -> Dict[str, array]:
+        """人员 -> 升序排列的值班日序号（只读，供批量计算使用）"""
+        return self._by_person
+
+    def next_shift(self, person: str, after: Union[str, date], inclusive: bool = False) -> Optional[str]:
+        """
+        查询某人在指定日期之后的下一次值班
+
+        参数:
+            person: 值班人姓名
+            after: 起始日期（YYYY-MM-DD 或 date）
+            inclusive: 是否包含起始日期当天
+
+        返回:
+            下一次值班日期（YYYY-MM-DD），计划内没有则返回None
+        """
+        ordinals = self._by_person.get(person)
+        if not ordinals:
+            return None
+        ordinal = _to_ordinal(after)
+        pos = bisect_left(ordinals, ordinal) if inclusive else bisect_right(ordinals, ordinal)
+        if pos >= len(ordinals):
+            return None
+        return date.fromordinal(ordinals[pos]).strftime("%Y-%m-%d")
+
+    def shifts(self, person: str, start: Union[str, date, None] = None,
+               end: Union[str, date, None] = None) -> List[str]:
+        """查询某人在 [start, end] 区间内（含两端）的所有值班日期"""
+        ordinals = self._by_person.get(person)
+        if not ordinals:
+            return []
+        lo = bisect_left(ordinals, _to_ordinal(start)) if start is not None else 0
+        hi = bisect_right(ordinals, _to_ordinal(end)) if end is not None else len(ordinals)
+        return [date.fromordinal(ordinal).strftime("%Y-%m-%d") for ordinal in ordinals[lo:hi]]
+
+
+def iter_plan_rows(rows: Iterator[tuple], numbered: bool = False) -> Iterator[tuple]:
+    """
+    从逐行迭代的表格数据（工作表或CSV）中流式取出 (日期, 姓名) 单元格值，缺少必需的列时抛出PlanFormatError
+    numbered 为 True 时返回 (行号, 日期, 姓名)，行号从1开始（含表头）
+    """
+    rows = iter(rows)
+
+    # 查找表头行，确定两列所在位置
+    actual_columns = []
+    for header_row in range(1, HEADER_SCAN_ROWS + 1):
+        header = next(rows, None)
+        if header is None:
+            break
+        columns = [str(cell).strip() if cell is not None else "" for cell in header]
+        if all(col in columns for col in REQUIRED_COLUMNS):
+            date_idx = columns.index(DATE_COLUMN)
+            name_idx = columns.index(NAME_COLUMN)
+            break
+        if not actual_columns:
+            actual_columns = [col for col in columns if col]
+    else:
+        header = None
+
+    if header is None:
+        missing = [col for col in REQUIRED_COLUMNS if col not in actual_columns]
+        raise PlanFormatError(missing, actual_columns)
+
+    width = max(date_idx, name_idx) + 1
+    for number, row in enumerate(rows, start=header_row + 1):
+        if len(row) < width:
+            continue
+        yield (number, row[date_idx], row[name_idx]) if numbered else (row[date_idx], row[name_idx])
+
+
+def _iter_sheet_rows(worksheet) -> Iterator[Tuple[object, object]]:
+    """流式读取单个工作表中的 (日期, 姓名) 单元格值"""
+    return iter_plan_rows(worksheet.iter_rows(values_only=True))
+
+
+def load_duty_plan(path: str = ORIGINAL_DUTY_EXCEL) -> DutyPlan:
+    """
+    以只读流式方式加载值班计划表
+
+    参数:
+        path: Excel文件路径，所有工作表中包含「日期」「姓名」列的都会被读取
+
+    返回:
+        DutyPlan，同一日期出现多次时以第一次出现的为准
+    """
+    # openpyxl 仅在加载Excel时导入，避免拖慢启动
+    import openpyxl
+
+    stat = os.stat(path)
+    by_date: Dict[str, Optional[str]] = {}
+    row_count = 0
+    sheet_errors = []
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            try:
+                for raw_date, raw_name in _iter_sheet_rows(worksheet):
+                    date_str = parse_plan_date(raw_date)
+                    if not date_str:
+                        continue
+                    row_count += 1
+                    if date_str not in by_date:
+                        name = str(raw_name).strip() if raw_name is not None else None
+                        by_date[date_str] = name or None
+            except PlanFormatError as e:
+                logger.debug(f"工作表 {worksheet.title} 缺少必需的列，已跳过")
+                sheet_errors.append(e)
+    finally:
+        workbook.close()
+
+    if sheet_errors and len(sheet_errors) == len(workbook.worksheets):
+        raise sheet_errors[0]
+
+    plan = DutyPlan(path, by_date, stat, row_count)
+    logger.info(f"✅ 值班计划加载完成: {path}，共{row_count}行，{len(plan)}个日期，版本 {plan.version}")
+    return plan
+
+
+_plan_cache: Dict[str, DutyPlan] = {}
+_plan_cache_lock = threading.Lock()
+# 最近一次加载失败：路径 -> (时间戳, 错误信息)，加载成功后清除
+_plan_errors: Dict[str, Tuple[float, str]] = {}
+
+
+def get_duty_plan(path: str = ORIGINAL_DUTY_EXCEL) -> DutyPlan:
+    """获取编译后的值班计划，文件未变化时直接返回缓存"""
+    key = os.path.abspath(path)
+    version = plan_version(os.stat(path))
+
+    plan = _plan_cache.get(key)
+    if plan is not None and plan.version == version:
+        return plan
+
+    with _plan_cache_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None and plan.version == version:
+            return plan
+        try:
+            plan = load_duty_plan(path)
+        except Exception as e:
+            _plan_errors[key] = (time.time(), str(e))
+            raise
+        _plan_errors.pop(key, None)
+        _plan_cache[key] = plan
+        return plan
+
+
+def peek_duty_plan(path: str = ORIGINAL_DUTY_EXCEL) -> Optional[DutyPlan]:
+    """返回已缓存的值班计划（不检查文件、不加载），未加载过时返回None"""
+    return _plan_cache.get(os.path.abspath(path))
+
+
+def last_plan_error(path: str = ORIGINAL_DUTY_EXCEL) -> Optional[Tuple[float, str]]:
+    """最近一次加载失败的 (时间戳, 错误信息)，最近一次加载成功时返回None"""
+    return _plan_errors.get(os.path.abspath(path))
+
+
+def install_duty_plan(path: str, by_date: Dict[str, Optional[str]], row_count: int) -> DutyPlan:
+    """把已编译好的计划（如刚上传并校验过的计划）直接放入缓存，不再重新读取文件"""
+    key = os.path.abspath(path)
+    with _plan_cache_lock:
+        plan = DutyPlan(path, by_date, os.stat(path), row_count)
+        _plan_cache[key] = plan
+        _plan_errors.pop(key, None)
+    logger.info("✅ 值班计划已更新: %s，共%s行，%s个日期，版本 %s", path, row_count, len(plan), plan.version)
+    return plan
+
+
+_plan_write_locks: Dict[str, threading.RLock] = {}
+
+
+def plan_write_lock(path: str) -> threading.RLock:
+    """计划表的写锁：重新生成、上传替换等改写同一计划表的操作串行执行（可重入）"""
+    with _plan_cache_lock:
+        return _plan_write_locks.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def replace_plan_file(path: str, write: Callable[[str], None], keep_backup: bool = False):
+    """
+    原子替换计划表：write(临时路径) 在同目录写出新文件，再用 os.replace 替换正式文件，
+    读取方只会看到旧文件或新文件；整个过程持有该计划表的写锁
+
+    参数:
+        path: 计划表路径
+        write: 写出新计划表的函数，参数为临时文件路径（扩展名与计划表相同）
+        keep_backup: 替换前是否保留旧文件备份（<计划表>.bak）
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    stem, ext = os.path.splitext(filename)
+    tmp_path = os.path.join(directory, f".{stem}-{uuid.uuid4().hex}{ext}")
+    with plan_write_lock(path):
+        try:
+            write(tmp_path)
+            if keep_backup and os.path.exists(path):
+                shutil.copy2(path, f"{path}.bak")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def invalidate_duty_plan(path: str = ORIGINAL_DUTY_EXCEL):
+    """丢弃指定文件的缓存，下次访问时重新加载"""
+    with _plan_cache_lock:
+        _plan_cache.pop(os.path.abspath(path), None)
+
+
+def _snapshot_file(cache_dir: str, path: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"plan-{digest}.json")
+
+
+def save_duty_plan_snapshot(plan: DutyPlan, cache_dir: str):
+    """把编译后的计划写入磁盘缓存（写入失败只记录警告）"""
+    snapshot = _snapshot_file(cache_dir, plan.path)
+    data = {"path": os.path.abspath(plan.path), "version": plan.version, "row_count": plan.row_count,
+            "by_date": dict(plan.items())}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 先写临时文件再替换，并发的进程不会读到写了一半的缓存
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, snapshot)
+    except OSError as e:
+        logger.warning("⚠️ 写入值班计划缓存失败: %s，%s", snapshot, e)
+
+
+def load_duty_plan_snapshot(path: str = ORIGINAL_DUTY_EXCEL, cache_dir: Optional[str] = None) -> DutyPlan:
+    """
+    获取编译后的值班计划，优先使用磁盘上的编译结果
+
+    磁盘缓存按文件版本（修改时间和大小）失效，版本不一致或缓存损坏时重新读取Excel并覆盖缓存；
+    结果同时放入进程内缓存，之后的 get_duty_plan 调用不会再读取文件
+
+    参数:
+        path: Excel文件路径
+        cache_dir: 缓存目录，None 时等同于 get_duty_plan
+    """
+    if cache_dir is None:
+        return get_duty_plan(path)
+
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    version = plan_version(stat)
+    plan = _plan_cache.get(key)
+    if plan is not None and plan.version == version:
+        return plan
+
+    snapshot = _snapshot_file(cache_dir, path)
+    plan = None
+    try:
+        with open(snapshot, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('path') == key and data.get('version') == version:
+            plan = DutyPlan(path, data['by_date'], stat, data['row_count'])
+    except (OSError, ValueError, KeyError, TypeError):
+        plan = None
+
+    if plan is None:
+        plan = load_duty_plan(path)
+        save_duty_plan_snapshot(plan, cache_dir)
+
+    with _plan_cache_lock:
+        _plan_cache[key] = plan
+        _plan_errors.pop(key, None)
+    return plan
@@ -0,0 +1,141 @@
+"""
+值班通知确认与升级
+综合通知发出后开始跟踪：值班人在群里回复「收到」即确认；超时未确认时升级给备份值班人
+（duty_persons 中的下一位），并继续等待确认，直到达到最大升级次数
+
+超时任务挂在哈希时间轮上，添加和取消都是 O(1)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from config.settings import ESCALATION_CONFIG
+from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+from src.services.team_registry import Team
+from src.utils.logger import get_logger
+from src.utils.timer_wheel import HashedTimerWheel, TimerHandle
+
+# 获取日志器
+logger = get_logger('escalation')
+
+
+class PendingAck:
+    """一条等待确认的通知"""
+
+    __slots__ = ('team', 'date', 'assignees', 'level', 'sent_at', 'timer')
+
+    def __init__(self, team: Team, date: str, person: str):
+        self.team = team
+        self.date = date
+        # 已通知的人员：值班人及依次升级的备份值班人
+        self.assignees: List[str] = [person]
+        self.level = 0
+        self.sent_at = time.time()
+        self.timer: Optional[TimerHandle] = None
+
+    @property
+    def assignee(self) -> str:
+        return self.assignees[-1]
+
+
+def backup_person(team: Team, person: str, exclude: List[str]) -> Optional[str]:
+    """duty_persons 中 person 之后的下一位（循环），跳过已通知过的人员"""
+    names = [item['name'] for item in team.duty_persons]
+    if not names:
+        return None
+    start = names.index(person) + 1 if person in names else 0
+    for offset in range(len(names)):
+        candidate = names[(start + offset) % len(names)]
+        if candidate not in exclude:
+            return candidate
+    return None
+
+
+class EscalationManager:
+    """按团队跟踪最近一条值班通知的确认状态（新通知会替换同团队未确认的旧通知）"""
+
+    def __init__(self, config: dict, wheel: Optional[HashedTimerWheel] = None):
+        self.enabled = config['enabled']
+        self.ack_timeout = config['ack_timeout']
+        self.max_escalations = config['max_escalations']
+        self.ack_by_anyone = config['ack_by_anyone']
+        self.wheel = wheel or HashedTimerWheel(config['tick_seconds'], config['wheel_slots'])
+        self._pending: Dict[str, PendingAck] = {}
+        self._lock = threading.Lock()
+        # 升级消息在独立线程中发送，避免阻塞时间轮
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='escalation')
+
+    def track(self, team: Team, date: str, person: Optional[str]) -> Optional[PendingAck]:
+        """通知发出后开始跟踪确认"""
+        if not self.enabled or not person:
+            return None
+        self.wheel.start()
+        item = PendingAck(team, date, person)
+        with self._lock:
+            previous = self._pending.get(team.team_id)
+            if previous is not None and previous.timer is not None:
+                previous.timer.cancel()
+            item.timer = self.wheel.schedule(self.ack_timeout, self._on_timeout, item)
+            self._pending[team.team_id] = item
+        logger.info(f"⏳ 开始跟踪值班通知确认: 团队 {team.team_id}，{date}，值班人 {person}，"
+                    f"{self.ack_timeout}秒内未确认将升级")
+        return item
+
+    def acknowledge(self, team: Team, sender: Optional[str] = None) -> str:
+        """确认团队当前的值班通知，返回回复内容"""
+        with self._lock:
+            item = self._pending.get(team.team_id)
+            if item is None:
+                return "当前没有待确认的值班通知"
+            if not self.ack_by_anyone and sender and sender not in item.assignees:
+                return f"仅值班人（{'、'.join(item.assignees)}）可以确认该通知"
+            del self._pending[team.team_id]
+            if item.timer is not None:
+                item.timer.cancel()
+
+        elapsed = int(time.time() - item.sent_at)
+        logger.info(f"✅ 值班通知已确认: 团队 {team.team_id}，{item.date}，确认人 {sender or '未知'}，"
+                    f"耗时 {elapsed}秒，升级 {item.level} 次")
+        return f"✅ 已确认 {item.date} 值班通知（确认人：{sender or item.assignee}）"
+
+    def _on_timeout(self, item: PendingAck):
+        """时间轮回调：超时未确认，升级给备份值班人"""
+        with self._lock:
+            if self._pending.get(item.team.team_id) is not item:
+                return
+            backup = None
+            if item.level < self.max_escalations:
+                backup = backup_person(item.team, item.assignee, item.assignees)
+            if backup is None:
+                del self._pending[item.team.team_id]
+                logger.warning(f"⚠️ 值班通知始终未确认: 团队 {item.team.team_id}，{item.date}，"
+                               f"已通知 {'、'.join(item.assignees)}")
+                return
+            previous = item.assignee
+            item.assignees.append(backup)
+            item.level += 1
+            item.timer = self.wheel.schedule(self.ack_timeout, self._on_timeout, item)
+
+        logger.warning(f"⏫ 值班通知未确认，升级: 团队 {item.team.team_id}，{item.date}，{previous} -> {backup}")
+        self._executor.submit(self._send_escalation, item.team, item.date, previous, backup)
+
+    def _send_escalation(self, team: Team, date: str, previous: str, backup: str):
+        minutes = max(1, self.ack_timeout // 60)
+        # 找不到备份值班人的 userId/手机号时与其他通知一样按 fallback_at_all 退回
+        mention_text, at = team.mention(backup)
+        content = (f"【值班未确认】\n日期：{date}\n{previous} 在{minutes}分钟内未确认值班通知，"
+                   f"请备份值班人 {backup} 跟进处理，处理后回复「收到」确认 {mention_text or '@' + backup}")
+        try:
+            send_dingtalk_message_reliably(content, webhook_url=team.webhook, secret=team.webhook_secret, **at)
+        except Exception as e:
+            logger.error(f"❌ 发送升级通知失败: 团队 {team.team_id}，{str(e)}")
+
+    def pending(self) -> List[PendingAck]:
+        with self._lock:
+            return list(self._pending.values())
+
+
+# 全局升级管理器
+escalation_manager = EscalationManager(ESCALATION_CONFIG)
@@ -0,0 +1,140 @@
+"""
+健康检查模块
+/api/health（存活）和 /api/ready（就绪）的数据全部来自内存中的状态，不读文件、不发请求：
+- 调度器：主循环每轮记录心跳和下一个任务的计划时间
+- 值班计划：读取计划缓存和最近一次加载错误
+- 钉钉：发送路径记录最近一次发送结果
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from config.settings import HEALTH_CONFIG
+from src.services.dingtalk_directory import directory
+from src.services.duty_plan import last_plan_error, peek_duty_plan
+from src.services.team_registry import Team
+
+_started_at = time.time()
+
+# 调度器状态（由调度线程写入）
+_scheduler = {
+    "started": False,
+    "started_at": None,
+    "heartbeat": None,
+    "next_run": None,
+    "next_job": None,
+}
+
+# 最近一次钉钉发送结果（由发送路径写入）
+_last_send = {
+    "at": None,
+    "errcode": None,
+    "errmsg": None,
+}
+_last_send_lock = threading.Lock()
+
+
+def record_scheduler_started():
+    """调度线程启动时调用：此后长时间没有心跳（例如启动过程中异常退出）视为调度器已停止"""
+    _scheduler["started"] = True
+    _scheduler["started_at"] = time.time()
+
+
+def record_scheduler_heartbeat(next_run: Optional[datetime] = None, next_job: Optional[str] = None):
+    """调度器主循环每轮调用一次"""
+    _scheduler["started"] = True
+    _scheduler["heartbeat"] = time.time()
+    _scheduler["next_run"] = next_run.timestamp() if next_run else None
+    _scheduler["next_job"] = next_job
+
+
+def record_dingtalk_send(result: Optional[dict]):
+    """记录一次钉钉发送结果"""
+    result = result or {}
+    with _last_send_lock:
+        _last_send["at"] = time.time()
+        _last_send["errcode"] = result.get("errcode")
+        _last_send["errmsg"] = result.get("errmsg")
+
+
+def _age(timestamp: Optional[float], now: float) -> Optional[float]:
+    return round(now - timestamp, 3) if timestamp else None
+
+
+def scheduler_status(now: float) -> dict:
+    """调度器状态：心跳间隔、下一个任务及其延迟"""
+    heartbeat_age = _age(_scheduler["heartbeat"], now)
+    next_run = _scheduler["next_run"]
+    lag = round(now - next_run, 3) if next_run and now > next_run else 0.0
+    status = {
+        "started": _scheduler["started"],
+        "heartbeat_age": heartbeat_age,
+        "next_job": _scheduler["next_job"],
+        "next_run": datetime.fromtimestamp(next_run).strftime('%Y-%m-%d %H:%M:%S') if next_run else None,
+        "lag": lag,
+    }
+    if not _scheduler["started"]:
+        # 本进程从未启动调度器（例如只运行Web服务）时不影响就绪状态
+        status["ok"] = True
+    else:
+        # 还没有心跳时按启动时间计算，启动后一直没有进入主循环同样视为已停止
+        silence = heartbeat_age if heartbeat_age is not None else _age(_scheduler["started_at"], now)
+        status["ok"] = (silence is not None and silence <= HEALTH_CONFIG['max_heartbeat_age']
+                        and lag <= HEALTH_CONFIG['max_job_lag'])
+    return status
+
+
+def plan_status(team: Team, now: float) -> dict:
+    """团队值班计划状态：最近一次成功加载、文件新鲜度、覆盖到哪一天"""
+    plan = peek_duty_plan(team.plan_file)
+    error = last_plan_error(team.plan_file)
+    status = {"team": team.team_id, "loaded": plan is not None}
+    if plan is not None:
+        today = datetime.fromtimestamp(now).strftime('%Y-%m-%d')
+        status.update({
+            "version": plan.version,
+            "rows": plan.row_count,
+            "loaded_age": _age(plan.loaded_at, now),
+            "file_age": _age(plan.mtime, now),
+            "last_date": plan.last_date,
+            "covers_today": today in plan,
+        })
+    if error is not None:
+        status["last_error"] = {"age": _age(error[0], now), "message": error[1]}
+    status["ok"] = plan is not None and error is None
+    return status
+
+
+def dingtalk_status(now: float) -> dict:
+    with _last_send_lock:
+        return {
+            "last_send_age": _age(_last_send["at"], now),
+            "errcode": _last_send["errcode"],
+            "errmsg": _last_send["errmsg"],
+            "ok": _last_send["at"] is None or _last_send["errcode"] == 0,
+        }
+
+
+def liveness() -> dict:
+    """存活检查：进程能处理请求即可"""
+    now = time.time()
+    return {"status": "ok", "pid": os.getpid(), "uptime": round(now - _started_at, 3)}
+
+
+def readiness(teams: List[Team]) -> dict:
+    """就绪检查：调度器心跳正常且各团队的值班计划已成功加载；钉钉发送结果和通讯录缓存只报告、不影响就绪"""
+    now = time.time()
+    scheduler = scheduler_status(now)
+    plans = [plan_status(team, now) for team in teams]
+    ready = scheduler["ok"] and all(plan["ok"] for plan in plans)
+    return {
+        "status": "ready" if ready else "not_ready",
+        "ready": ready,
+        "scheduler": scheduler,
+        "plans": plans,
+        "dingtalk": dingtalk_status(now),
+        "directory": directory.status(),
+    }
@@ -0,0 +1,199 @@
+"""
+通知并发分发模块
+定时任务触发时，为每个团队（钉钉群）渲染各自的综合通知，并在有界线程池中并发发送：
+- 每个工作线程持有一个 requests.Session，复用到同一Webhook的长连接
+- 按Webhook限流（钉钉自定义机器人每分钟最多20条），多个团队共用同一机器人时也不会超限
+- 返回每个团队的发送结果，并输出汇总日志，最近一次汇总可通过 get_last_dispatch_summary 查询
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.settings import NOTIFICATION_DISPATCH_CONFIG
+from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+from src.services.excel_handler import get_bug_assignment_person, get_original_duty_person, get_today_date
+from src.services.team_registry import Team
+from src.utils.clock import get_clock
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('notification_dispatcher')
+
+# 消息渲染函数：(团队, 日期) -> 消息内容，无内容时返回None
+Renderer = Callable[[Team, str], Optional[str]]
+
+
+class WebhookRateLimiter:
+    """滑动窗口限流：每个Webhook在 period 秒内最多发送 limit 条消息，超出时阻塞等待"""
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self._sent: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """获取发送许可，返回等待的秒数"""
+        waited = 0.0
+        clock = get_clock()
+        while True:
+            with self._lock:
+                now = clock.monotonic()
+                sent = self._sent.setdefault(key, deque())
+                while sent and now - sent[0] >= self.period:
+                    sent.popleft()
+                if len(sent) < self.limit:
+                    sent.append(now)
+                    return waited
+                delay = self.period - (now - sent[0])
+            clock.sleep(delay)
+            waited += delay
+
+
+def oncall_mention(team: Team, target_date: str) -> Tuple[str, dict]:
+    """当天值班人的@文本和发送参数（见 Team.mention），综合通知只@值班人"""
+    return team.mention(get_original_duty_person(target_date, team))
+
+
+def render_combined_notification(team: Team, target_date: str) -> Optional[str]:
+    """渲染团队的综合通知（值班+禅道指派），没有任何工作安排时返回None"""
+    oncall_person = get_original_duty_person(target_date, team)
+    bug_person = get_bug_assignment_person(target_date, team)
+    logger.info(f"团队 {team.team_id} 值班人员: {oncall_person or '未找到'}, 禅道指派: {bug_person or '未找到'}")
+
+    content_parts = [f"【OnCall】\n日期：{target_date}"]
+    if oncall_person:
+        mention_text, _ = team.mention(oncall_person)
+        content_parts.append(f"值班人：{oncall_person} {mention_text}".rstrip())
+    if bug_person:
+        content_parts.append(f"禅道指派：{bug_person}")
+
+    if len(content_parts) == 1:  # 只有标题
+        return None
+    return "\n".join(content_parts)
+
+
+class NotificationDispatcher:
+    """在有界线程池中并发向多个团队发送通知"""
+
+    def __init__(self, max_workers: int, rate_limit: int, rate_period: float, timeout: Optional[float] = None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.rate_limiter = WebhookRateLimiter(rate_limit, rate_period)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self._last_summary: Optional[dict] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # 线程池常驻复用，工作线程上的 Session（及其长连接）在多次分发之间保持
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='notify')
+            return self._executor
+
+    def _get_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _send_one(self, team: Team, target_date: str, renderer: Renderer) -> dict:
+        """渲染并发送单个团队的通知（在工作线程中执行）"""
+        started = time.monotonic()
+        result = {"team": team.team_id, "status": "sent", "errcode": None, "errmsg": None,
+                  "waited": 0.0, "elapsed": 0.0}
+        try:
+            content = renderer(team, target_date)
+            if content is None:
+                result["status"] = "skipped"
+                result["errmsg"] = "没有工作安排"
+            else:
+                _, at = oncall_mention(team, target_date)
+                result["waited"] = round(self.rate_limiter.acquire(team.webhook), 3)
+                response = send_dingtalk_message_reliably(content, webhook_url=team.webhook,
+                                                          secret=team.webhook_secret,
+                                                          session=self._get_session(), timeout=self.timeout,
+                                                          **at)
+                result["errcode"] = response.get("errcode")
+                result["errmsg"] = response.get("errmsg")
+                if result["errcode"] != 0:
+                    result["status"] = "failed"
+        except Exception as e:
+            result["status"] = "failed"
+            result["errmsg"] = str(e)
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        return result
+
+    def dispatch(self, teams: List[Team], target_date: Optional[str] = None,
+                 renderer: Renderer = render_combined_notification) -> dict:
+        """
+        并发向各团队发送通知
+
+        参数:
+            teams: 目标团队
+            target_date: 日期（YYYY-MM-DD），默认今天
+            renderer: 消息渲染函数，默认为综合通知
+
+        返回:
+            汇总信息，results 为每个团队的发送结果（顺序与 teams 一致）
+        """
+        target_date = target_date or get_today_date()
+        started = time.monotonic()
+        executor = self._get_executor()
+        futures = [executor.submit(self._send_one, team, target_date, renderer) for team in teams]
+        results = [future.result() for future in futures]
+
+        counts = {"sent": 0, "skipped": 0, "failed": 0}
+        for result in results:
+            counts[result["status"]] += 1
+        summary = {
+            "date": target_date,
+            "finished_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "elapsed": round(time.monotonic() - started, 3),
+            "total": len(results),
+            **counts,
+            "results": results,
+        }
+        self._last_summary = summary
+
+        logger.info(f"📤 通知分发完成: {target_date} 共{summary['total']}个团队，成功 {counts['sent']}，"
+                    f"跳过 {counts['skipped']}，失败 {counts['failed']}，耗时 {summary['elapsed']:.3f}秒")
+        for result in results:
+            if result["status"] == "failed":
+                logger.error(f"❌ 团队 {result['team']} 通知发送失败: "
+                             f"errcode={result['errcode']}, errmsg={result['errmsg']}")
+            elif result["status"] == "skipped":
+                logger.warning(f"⚠️ 团队 {result['team']} 未找到{target_date}的工作安排信息，跳过发送")
+            else:
+                logger.debug(f"团队 {result['team']} 发送成功，限流等待 {result['waited']}秒，"
+                             f"耗时 {result['elapsed']}秒")
+        return summary
+
+    def get_last_summary(self) -> Optional[dict]:
+        return self._last_summary
+
+
+# 全局分发器
+dispatcher = NotificationDispatcher(
+    NOTIFICATION_DISPATCH_CONFIG['max_workers'],
+    NOTIFICATION_DISPATCH_CONFIG['rate_limit'],
+    NOTIFICATION_DISPATCH_CONFIG['rate_period'],
+    NOTIFICATION_DISPATCH_CONFIG['timeout'],
+)
+
+
+def dispatch_combined_notifications(teams: List[Team], target_date: Optional[str] = None) -> dict:
+    """并发向多个团队发送综合通知的便捷函数"""
+    return dispatcher.dispatch(teams, target_date)
+
+
+def get_last_dispatch_summary() -> Optional[dict]:
+    """最近一次分发的汇总信息"""
+    return dispatcher.get_last_summary()
@@ -0,0 +1,157 @@
+"""
+值班计划差异与变更通知
+比较新旧两份值班计划：按日序号把两份计划编码为等长的人员编号数组，一次向量化比较找出所有变化的日期，
+再按人员汇总新增 / 取消的值班日；只给受影响的人员发送通知，每人合并为一条消息
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+from config.settings import DEFAULT_TEAM_ID, PLAN_CHANGE_NOTIFY_CONFIG
+from src.services.dingtalk_resilience import send_dingtalk_message_reliably
+from src.services.duty_plan import WEEKDAY_NAMES, DutyPlan
+from src.services.team_registry import Team
+from src.utils.clock import get_clock
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('plan_diff')
+
+
+class PersonChanges:
+    """某人的值班变化"""
+
+    __slots__ = ('person', 'added', 'removed')
+
+    def __init__(self, person: str):
+        self.person = person
+        self.added: List[str] = []
+        self.removed: List[str] = []
+
+    def to_dict(self) -> dict:
+        return {"added": self.added, "removed": self.removed}
+
+
+class PlanDiff:
+    """两份计划的差异：变化的日期数，以及 人员 -> PersonChanges"""
+
+    def __init__(self, changed_dates: int, changes: Dict[str, PersonChanges]):
+        self.changed_dates = changed_dates
+        self.changes = changes
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def summary(self) -> Dict[str, dict]:
+        return {person: {"added": len(item.added), "removed": len(item.removed)}
+                for person, item in self.changes.items()}
+
+
+def _encode(index, codes: Dict[str, int], lo: int, length: int):
+    """把 人员 -> 值班日序号 的索引编码为数组：第 i 个元素为 lo+i 那天值班人的编号，未排班为 -1"""
+    import numpy as np
+
+    encoded = np.full(length, -1, dtype=np.int32)
+    for person, ordinals in index.items():
+        positions = np.frombuffer(ordinals, dtype=np.dtype(ordinals.typecode)) - lo
+        positions = positions[(positions >= 0) & (positions < length)]
+        encoded[positions] = codes.setdefault(person, len(codes))
+    return encoded
+
+
+def diff_plans(old: Optional[DutyPlan], new: DutyPlan, since: Optional[date] = None) -> PlanDiff:
+    """
+    比较新旧计划
+
+    参数:
+        old: 旧计划，None 表示没有旧计划（新计划中的值班全部视为新增）
+        new: 新计划
+        since: 只比较该日期（含）之后的值班，默认今天
+
+    返回:
+        PlanDiff
+    """
+    import numpy as np
+
+    since = since or get_clock().now().date()
+    old_index = old.shift_index() if old is not None else {}
+    new_index = new.shift_index()
+
+    ends = [ordinals[-1] for ordinals in list(old_index.values()) + list(new_index.values()) if len(ordinals)]
+    lo = since.toordinal()
+    hi = max(ends) if ends else lo - 1
+    if hi < lo:
+        return PlanDiff(0, {})
+
+    codes: Dict[str, int] = {}
+    length = hi - lo + 1
+    old_codes = _encode(old_index, codes, lo, length)
+    new_codes = _encode(new_index, codes, lo, length)
+
+    changed = np.flatnonzero(old_codes != new_codes)
+    if not len(changed):
+        return PlanDiff(0, {})
+    # 变化日期整体转换为 YYYY-MM-DD 字符串，再按人员编号分组
+    day_strings = (np.datetime64(date.fromordinal(lo).isoformat(), 'D') + changed).astype(str)
+    removed_codes = old_codes[changed]
+    added_codes = new_codes[changed]
+
+    changes: Dict[str, PersonChanges] = {}
+    for person, code in codes.items():
+        removed = day_strings[removed_codes == code]
+        added = day_strings[added_codes == code]
+        if len(removed) or len(added):
+            item = changes[person] = PersonChanges(person)
+            item.removed = removed.tolist()
+            item.added = added.tolist()
+    return PlanDiff(len(changed), changes)
+
+
+def _format_dates(dates: List[str], limit: int) -> str:
+    shown = [f"{date_str}（{WEEKDAY_NAMES[date.fromisoformat(date_str).weekday()]}）" for date_str in dates[:limit]]
+    text = "、".join(shown)
+    if len(dates) > limit:
+        text += f" 等{len(dates)}天"
+    return text
+
+
+def render_change_message(team: Team, item: PersonChanges) -> str:
+    """渲染某人的值班变更通知"""
+    limit = PLAN_CHANGE_NOTIFY_CONFIG['max_dates_listed']
+    # 钉钉只有消息中出现 @手机号 / @userId 时才会显示为@，找不到时只写姓名
+    mention_text, _ = team.mention(item.person)
+    parts = [f"📋 值班计划变更 {item.person} {mention_text}" if mention_text
+             else f"📋 值班计划变更 @{item.person}"]
+    if item.added:
+        parts.append(f"新增值班：{_format_dates(item.added, limit)}")
+    if item.removed:
+        parts.append(f"取消值班：{_format_dates(item.removed, limit)}")
+    download_url = PLAN_CHANGE_NOTIFY_CONFIG['download_url']
+    if download_url:
+        if team.team_id != DEFAULT_TEAM_ID:
+            download_url += f"?team={team.team_id}"
+        parts.append(f"完整计划：{download_url}")
+    return "\n".join(parts)
+
+
+def notify_plan_changes(team: Team, old: Optional[DutyPlan], new: DutyPlan, reason: str) -> PlanDiff:
+    """比较新旧计划，给每个值班发生变化的人员发送一条变更通知"""
+    diff = diff_plans(old, new)
+    if not diff:
+        logger.info("值班计划%s，今天起的值班没有变化: 团队 %s", reason, team.team_id)
+        return diff
+
+    logger.info("值班计划%s: 团队 %s，%s 天变化，涉及 %s 人: %s",
+                reason, team.team_id, diff.changed_dates, len(diff.changes), '、'.join(diff.changes))
+    if not PLAN_CHANGE_NOTIFY_CONFIG['enabled']:
+        return diff
+
+    for person, item in diff.changes.items():
+        mobiles, user_ids = team.mention_targets(person)
+        try:
+            send_dingtalk_message_reliably(render_change_message(team, item), webhook_url=team.webhook,
+                                           secret=team.webhook_secret, at_all=False,
+                                           at_mobiles=mobiles, at_user_ids=user_ids)
+        except Exception as e:
+            logger.error("❌ 发送值班变更通知失败: 团队 %s，%s，%s", team.team_id, person, e)
+    return diff
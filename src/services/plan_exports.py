@@ -0,0 +1,93 @@
+"""
+值班计划导出模块
+将编译后的值班计划导出为 CSV / JSON，每个计划版本只生成一次并缓存
+"""
+
+import csv
+import io
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Tuple
+
+from src.services.duty_plan import DutyPlan, WEEKDAY_NAMES
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('plan_exports')
+
+# 支持的导出格式: 格式 -> (MIME类型, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'json': ('application/json; charset=utf-8', 'json'),
+}
+
+# 缓存: (计划文件路径, 格式) -> (计划版本, 导出内容)，每个文件每种格式只保留最新版本
+_export_cache: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
+_export_lock = threading.Lock()
+
+
+def _iter_rows(plan: DutyPlan):
+    """遍历 (日期, 周几, 姓名)"""
+    for date_str, person in plan.items():
+        try:
+            weekday = WEEKDAY_NAMES[datetime.strptime(date_str, "%Y-%m-%d").weekday()]
+        except ValueError:
+            weekday = ""
+        yield date_str, weekday, person or ""
+
+
+def render_csv(plan: DutyPlan) -> bytes:
+    """导出为CSV（带BOM，Excel可直接打开）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["日期", "周几", "姓名"])
+    writer.writerows(_iter_rows(plan))
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def render_json(plan: DutyPlan) -> bytes:
+    """导出为JSON"""
+    payload = {
+        "version": plan.version,
+        "schedule": [
+            {"日期": date_str, "周几": weekday, "姓名": person}
+            for date_str, weekday, person in _iter_rows(plan)
+        ],
+    }
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+_RENDERERS = {
+    'csv': render_csv,
+    'json': render_json,
+}
+
+
+def get_plan_export(plan: DutyPlan, fmt: str) -> bytes:
+    """
+    获取指定格式的导出内容，同一计划版本只生成一次
+
+    参数:
+        plan: 编译后的值班计划
+        fmt: 导出格式（见 EXPORT_FORMATS）
+
+    返回:
+        导出文件内容
+    """
+    if fmt not in _RENDERERS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+    key = (plan.path, fmt)
+    cached = _export_cache.get(key)
+    if cached is not None and cached[0] == plan.version:
+        return cached[1]
+
+    with _export_lock:
+        cached = _export_cache.get(key)
+        if cached is not None and cached[0] == plan.version:
+            return cached[1]
+        content = _RENDERERS[fmt](plan)
+        _export_cache[key] = (plan.version, content)
+        logger.info(f"✅ 已生成{fmt.upper()}导出: 版本 {plan.version}，{len(content)}字节")
+        return content
@@ -0,0 +1,371 @@
+"""
+值班计划上传模块
+上传的 xlsx / CSV 先保存为临时文件，再在后台线程中流式校验：
+- 必需的「日期」「姓名」列
+- 日期无法解析、日期重复、日期不连续（缺少的日期会触发自动重新生成，覆盖上传的计划）
+- 姓名为空、姓名不在团队的 duty_persons 中
+
+校验通过后按统一格式（日期、周几、姓名）写入同目录下的临时文件，用 os.replace 原子替换正式计划表
+（replace_plan_file，与重新生成计划共用计划表写锁），并把已编译的计划直接放入缓存；
+读取方只会看到旧文件或新文件，不会读到写了一半的文件。
+替换后只给值班发生变化的人员发送变更通知
+"""
+
+import csv
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from config.settings import PLAN_UPLOAD_CONFIG
+from src.services.duty_plan import (DATE_COLUMN, NAME_COLUMN, WEEKDAY_NAMES, DutyPlan, PlanFormatError,
+                                    get_duty_plan, install_duty_plan, iter_plan_rows, parse_plan_date,
+                                    plan_write_lock, replace_plan_file)
+from src.services.plan_diff import notify_plan_changes
+from src.services.team_registry import Team
+from src.utils.clock import get_clock
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('plan_upload')
+
+UPLOAD_EXTENSIONS = ('.xlsx', '.csv')
+
+
+class ValidationReport:
+    """校验结果：错误（导致拒绝）、警告、统计信息，以及校验通过的 日期 -> 姓名"""
+
+    def __init__(self, max_issues: int):
+        self.max_issues = max_issues
+        self.errors: List[dict] = []
+        self.warnings: List[dict] = []
+        self.error_count = 0
+        self.warning_count = 0
+        self.row_count = 0
+        self.by_date: Dict[str, str] = {}
+
+    def error(self, code: str, message: str, row: Optional[int] = None, **details):
+        self.error_count += 1
+        if len(self.errors) < self.max_issues:
+            self.errors.append(dict(code=code, row=row, message=message, **details))
+
+    def warning(self, code: str, message: str, row: Optional[int] = None, **details):
+        self.warning_count += 1
+        if len(self.warnings) < self.max_issues:
+            self.warnings.append(dict(code=code, row=row, message=message, **details))
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def to_dict(self) -> dict:
+        dates = sorted(self.by_date)
+        return {
+            "ok": self.ok,
+            "rows": self.row_count,
+            "dates": len(dates),
+            "first_date": dates[0] if dates else None,
+            "last_date": dates[-1] if dates else None,
+            "persons": sorted(set(self.by_date.values())),
+            "error_count": self.error_count,
+            "warning_count": self.warning_count,
+            "errors": self.errors,
+            "warnings": self.warnings,
+            "truncated": self.error_count > len(self.errors) or self.warning_count > len(self.warnings),
+        }
+
+
+def _iter_xlsx_rows(path: str) -> Iterator[tuple]:
+    """流式读取xlsx中第一个包含必需列的工作表"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        first_error = None
+        for worksheet in workbook.worksheets:
+            rows = iter_plan_rows(worksheet.iter_rows(values_only=True), numbered=True)
+            try:
+                first = next(rows, None)
+            except PlanFormatError as e:
+                first_error = first_error or e
+                continue
+            if first is not None:
+                yield first
+                yield from rows
+            return
+        if first_error is not None:
+            raise first_error
+    finally:
+        workbook.close()
+
+
+def _iter_csv_rows(path: str) -> Iterator[tuple]:
+    """流式读取CSV（UTF-8，兼容带BOM的文件）"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        yield from iter_plan_rows(csv.reader(f), numbered=True)
+
+
+def validate_plan_file(path: str, file_type: str, known_names: List[str]) -> ValidationReport:
+    """
+    流式校验上传的计划文件
+
+    参数:
+        path: 已保存的上传文件
+        file_type: .xlsx / .csv
+        known_names: 团队的值班人员名单，为空时不检查姓名
+    """
+    report = ValidationReport(PLAN_UPLOAD_CONFIG['max_report_issues'])
+    known = set(known_names)
+    rows = _iter_csv_rows(path) if file_type == '.csv' else _iter_xlsx_rows(path)
+    first_row: Dict[str, int] = {}
+
+    try:
+        for row, raw_date, raw_name in rows:
+            if all(value is None or str(value).strip() == "" for value in (raw_date, raw_name)):
+                continue  # 空行
+            report.row_count += 1
+            if report.row_count > PLAN_UPLOAD_CONFIG['max_rows']:
+                report.error('too_many_rows', f"行数超过上限 {PLAN_UPLOAD_CONFIG['max_rows']}", row)
+                break
+
+            date_str = parse_plan_date(raw_date)
+            try:
+                datetime.strptime(date_str or "", "%Y-%m-%d")
+            except ValueError:
+                report.error('invalid_date', f"{DATE_COLUMN}无法识别: {raw_date}", row, value=str(raw_date))
+                continue
+
+            name = str(raw_name).strip() if raw_name is not None else ""
+            if not name:
+                report.error('empty_name', f"{date_str} 的{NAME_COLUMN}为空", row, date=date_str)
+                continue
+            if known and name not in known:
+                report.error('unknown_name', f"{name} 不在值班人员名单中", row, date=date_str, value=name)
+
+            if date_str in first_row:
+                report.error('duplicate_date', f"{date_str} 重复（第{first_row[date_str]}行已出现）", row,
+                             date=date_str)
+                continue
+            first_row[date_str] = row
+            report.by_date[date_str] = name
+    except PlanFormatError as e:
+        report.error('missing_columns', str(e), missing=e.missing_columns, actual=e.actual_columns)
+    except UnicodeDecodeError:
+        report.error('encoding', "CSV文件不是UTF-8编码，请另存为UTF-8后重新上传")
+    except Exception as e:
+        report.error('unreadable', f"文件无法读取: {str(e)}")
+
+    if report.ok and not report.by_date:
+        report.error('empty', "文件中没有值班记录")
+
+    # 日期连续性：缺少的日期在查询时会触发自动重新生成计划
+    if report.by_date:
+        dates = sorted(report.by_date)
+        current = datetime.strptime(dates[0], "%Y-%m-%d")
+        last = datetime.strptime(dates[-1], "%Y-%m-%d")
+        missing = []
+        while current <= last:
+            date_str = current.strftime("%Y-%m-%d")
+            if date_str not in report.by_date:
+                missing.append(date_str)
+            current += timedelta(days=1)
+        for date_str in missing:
+            if PLAN_UPLOAD_CONFIG['allow_gaps']:
+                report.warning('gap', f"缺少 {date_str} 的值班记录", date=date_str)
+            else:
+                report.error('gap', f"缺少 {date_str} 的值班记录", date=date_str)
+
+        if dates[-1] < get_clock().now().strftime("%Y-%m-%d"):
+            report.warning('expired', f"计划的最后一天 {dates[-1]} 早于今天")
+    return report
+
+
+def write_plan_xlsx(path: str, by_date: Dict[str, str]):
+    """按统一格式（日期、周几、姓名）写出计划表"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append([DATE_COLUMN, "周几", NAME_COLUMN])
+    for date_str in sorted(by_date):
+        weekday = WEEKDAY_NAMES[datetime.strptime(date_str, "%Y-%m-%d").weekday()]
+        worksheet.append([date_str, weekday, by_date[date_str]])
+    workbook.save(path)
+
+
+class UploadJob:
+    """一次上传的处理任务"""
+
+    PENDING = 'pending'
+    VALIDATING = 'validating'
+    REJECTED = 'rejected'
+    VALIDATED = 'validated'
+    APPLIED = 'applied'
+    FAILED = 'failed'
+
+    def __init__(self, team: Team, filename: str, file_type: str, upload_path: str, dry_run: bool):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.team = team
+        self.filename = filename
+        self.file_type = file_type
+        self.upload_path = upload_path
+        self.dry_run = dry_run
+        self.status = self.PENDING
+        self.message: Optional[str] = None
+        self.report: Optional[ValidationReport] = None
+        self.plan_version: Optional[str] = None
+        # 人员 -> {"added": 新增天数, "removed": 取消天数}
+        self.changes: Optional[Dict[str, dict]] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (self.REJECTED, self.VALIDATED, self.APPLIED, self.FAILED)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "team": self.team.team_id,
+            "filename": self.filename,
+            "dry_run": self.dry_run,
+            "status": self.status,
+            "message": self.message,
+            "plan_version": self.plan_version,
+            "changes": self.changes,
+            "created_at": datetime.fromtimestamp(self.created_at).strftime('%Y-%m-%d %H:%M:%S'),
+            "finished_at": (datetime.fromtimestamp(self.finished_at).strftime('%Y-%m-%d %H:%M:%S')
+                            if self.finished_at else None),
+            "report": self.report.to_dict() if self.report else None,
+        }
+
+
+class PlanUploadManager:
+    """接收上传文件，在后台线程中校验并原子替换团队的计划表"""
+
+    def __init__(self, config: dict):
+        self.history_size = config['job_history']
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=config['max_workers'], thread_name_prefix='plan-upload')
+
+    def submit(self, team: Team, stream, filename: str, dry_run: bool = False) -> UploadJob:
+        """
+        保存上传的文件流并提交后台处理
+
+        参数:
+            team: 团队
+            stream: 上传文件的可读流
+            filename: 原始文件名（用于判断类型）
+            dry_run: 只校验，不替换计划表
+
+        异常:
+            ValueError: 文件类型不支持或超过大小限制
+        """
+        file_type = os.path.splitext(filename or "")[1].lower()
+        if file_type not in UPLOAD_EXTENSIONS:
+            raise ValueError(f"不支持的文件类型: {file_type or '未知'}（支持 {', '.join(UPLOAD_EXTENSIONS)}）")
+
+        # 临时文件放在计划表同目录，保证之后的 os.replace 在同一文件系统内
+        plan_dir = os.path.dirname(os.path.abspath(team.plan_file))
+        upload_path = os.path.join(plan_dir, f".upload-{uuid.uuid4().hex}{file_type}")
+        self._save_stream(stream, upload_path)
+
+        job = UploadJob(team, filename, file_type, upload_path, dry_run)
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.history_size:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._process, job)
+        logger.info("📥 收到值班计划上传: 团队 %s，文件 %s，任务 %s%s",
+                    team.team_id, filename, job.job_id, '（仅校验）' if dry_run else '')
+        return job
+
+    @staticmethod
+    def _save_stream(stream, path: str):
+        """分块写入临时文件，超过大小限制时删除并报错"""
+        max_bytes = PLAN_UPLOAD_CONFIG['max_bytes']
+        written = 0
+        try:
+            with open(path, 'wb') as f:
+                while True:
+                    chunk = stream.read(64 * 1024)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise ValueError(f"文件超过大小限制 {max_bytes // 1024 // 1024}MB")
+                    f.write(chunk)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _process(self, job: UploadJob):
+        team = job.team
+        try:
+            job.status = UploadJob.VALIDATING
+            known_names = [person["name"] for person in team.duty_persons] \
+                if PLAN_UPLOAD_CONFIG['check_names'] else []
+            job.report = validate_plan_file(job.upload_path, job.file_type, known_names)
+            if not job.report.ok:
+                job.status = UploadJob.REJECTED
+                job.message = f"校验未通过，共 {job.report.error_count} 个错误"
+                logger.warning("⚠️ 值班计划上传被拒绝: 团队 %s，任务 %s，%s", team.team_id, job.job_id, job.message)
+                return
+            if job.dry_run:
+                job.status = UploadJob.VALIDATED
+                job.message = "校验通过（仅校验，未替换计划表）"
+                return
+            self._apply(job)
+        except Exception as e:
+            job.status = UploadJob.FAILED
+            job.message = f"处理失败: {str(e)}"
+            logger.error("❌ 值班计划上传处理失败: 团队 %s，任务 %s，%s", team.team_id, job.job_id, e)
+        finally:
+            job.finished_at = time.time()
+            if os.path.exists(job.upload_path):
+                os.remove(job.upload_path)
+
+    @staticmethod
+    def _current_plan(plan_file: str) -> Optional[DutyPlan]:
+        """替换前的计划，用于比较差异；文件不存在或无法加载时返回None"""
+        try:
+            return get_duty_plan(plan_file)
+        except Exception:
+            return None
+
+    def _apply(self, job: UploadJob):
+        """写出新计划表并原子替换，保留一份旧计划表备份"""
+        team = job.team
+        plan_file = team.plan_file
+        by_date = job.report.by_date
+        # 与重新生成计划共用写锁，替换前后读取的旧计划、新计划不会被并发的改写打乱
+        with plan_write_lock(plan_file):
+            old_plan = self._current_plan(plan_file)
+            replace_plan_file(plan_file, lambda path: write_plan_xlsx(path, by_date),
+                              keep_backup=PLAN_UPLOAD_CONFIG['keep_backup'])
+            plan = install_duty_plan(plan_file, dict(by_date), job.report.row_count)
+
+        # 只通知值班发生变化的人员（每人一条）
+        try:
+            job.changes = notify_plan_changes(team, old_plan, plan, "上传更新").summary()
+        except Exception as e:
+            logger.error("❌ 值班计划变更通知失败: 团队 %s，%s", team.team_id, e)
+
+        job.plan_version = plan.version
+        job.status = UploadJob.APPLIED
+        job.message = f"计划表已更新: {min(job.report.by_date)} ~ {plan.last_date}，共 {len(plan)} 天"
+        logger.info("✅ 值班计划已替换: 团队 %s，任务 %s，版本 %s", team.team_id, job.job_id, plan.version)
+
+
+# 全局上传管理器
+plan_upload_manager = PlanUploadManager(PLAN_UPLOAD_CONFIG)
@@ -0,0 +1,114 @@
+"""
+团队注册表
+每个团队拥有独立的值班计划、人员名单、机器人和通知时间；值班计划按团队各自的文件独立加载和缓存，
+查询某个团队时不会加载其他团队的数据
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import DEFAULT_TEAM_ID, DINGTALK_DIRECTORY_CONFIG, TEAMS
+from src.services.dingtalk_directory import directory
+from src.services.duty_plan import DutyPlan, get_duty_plan
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('team_registry')
+
+
+class Team:
+    """团队配置"""
+
+    def __init__(self, team_id: str, plan_file: str, duty_persons: List[dict], bug_persons: List[dict],
+                 webhook: str, name: Optional[str] = None, webhook_secret: Optional[str] = None,
+                 schedule_times: Iterable[str] = (), conversation_ids: Iterable[str] = ()):
+        self.team_id = team_id
+        self.name = name or team_id
+        self.plan_file = plan_file
+        self.duty_persons = duty_persons
+        self.bug_persons = bug_persons
+        self.webhook = webhook
+        self.webhook_secret = webhook_secret
+        self.schedule_times = list(schedule_times)
+        self.conversation_ids = list(conversation_ids)
+
+    def get_plan(self) -> DutyPlan:
+        """获取本团队编译后的值班计划（按文件独立缓存）"""
+        return get_duty_plan(self.plan_file)
+
+    def mention_targets(self, person: Optional[str]) -> Tuple[List[str], List[str]]:
+        """
+        人员的 (手机号列表, userId列表)，用于钉钉@
+        优先取人员配置中的可选字段 mobile / userid，没有配置时查钉钉通讯录缓存（只读内存，不调用接口）
+        """
+        if not person:
+            return [], []
+        for item in self.duty_persons + self.bug_persons:
+            if item.get('name') == person and (item.get('mobile') or item.get('userid')):
+                mobiles = [item['mobile']] if item.get('mobile') else []
+                user_ids = [item['userid']] if item.get('userid') else []
+                return mobiles, user_ids
+        entry = directory.lookup(person)
+        if entry is not None:
+            userid, mobile = entry
+            return [mobile] if mobile else [], [userid]
+        return [], []
+
+    def mention(self, person: Optional[str]) -> Tuple[str, dict]:
+        """
+        @某人所需的 (消息中的@文本, 发送参数 at_all/at_mobiles/at_user_ids)
+        找不到该人员的 userId/手机号时按 fallback_at_all 配置退回为@所有人
+        """
+        mobiles, user_ids = self.mention_targets(person)
+        if not mobiles and not user_ids:
+            return "", {"at_all": DINGTALK_DIRECTORY_CONFIG['fallback_at_all']}
+        # 钉钉要求被@的手机号 / userId 出现在消息内容中才会显示为@
+        text = " ".join(f"@{target}" for target in (mobiles or user_ids))
+        return text, {"at_all": False, "at_mobiles": mobiles, "at_user_ids": user_ids}
+
+    def __repr__(self):
+        return f"Team({self.team_id!r})"
+
+
+class TeamRegistry:
+    """团队注册表：按团队ID或钉钉会话ID查找团队"""
+
+    def __init__(self, teams_config: Dict[str, dict], default_team_id: str = DEFAULT_TEAM_ID):
+        self._teams: Dict[str, Team] = {}
+        self._by_conversation: Dict[str, Team] = {}
+        self.default_team_id = default_team_id
+        for team_id, config in teams_config.items():
+            self.register(Team(team_id, **config))
+
+    def register(self, team: Team):
+        """注册（或替换）团队"""
+        self._teams[team.team_id] = team
+        for conversation_id in team.conversation_ids:
+            self._by_conversation[conversation_id] = team
+        logger.debug(f"已注册团队: {team.team_id}（{team.name}）")
+
+    def get(self, team_id: Optional[str] = None) -> Optional[Team]:
+        """按团队ID查找，未指定时返回默认团队，不存在时返回None"""
+        return self._teams.get(team_id or self.default_team_id)
+
+    def resolve(self, team_id: Optional[str] = None, conversation_id: Optional[str] = None) -> Optional[Team]:
+        """按团队ID或钉钉会话ID查找团队，团队ID优先；都未指定时返回默认团队"""
+        if team_id:
+            return self._teams.get(team_id)
+        if conversation_id and conversation_id in self._by_conversation:
+            return self._by_conversation[conversation_id]
+        return self._teams.get(self.default_team_id)
+
+    def all(self) -> List[Team]:
+        return list(self._teams.values())
+
+    def __contains__(self, team_id: str) -> bool:
+        return team_id in self._teams
+
+
+# 全局团队注册表
+team_registry = TeamRegistry(TEAMS)
+
+
+def get_team(team_id: Optional[str] = None) -> Optional[Team]:
+    """获取团队的便捷函数，未指定时返回默认团队"""
+    return team_registry.get(team_id)
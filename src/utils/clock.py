@@ -0,0 +1,78 @@
+"""
+可替换的时钟
+业务代码通过 get_clock() 获取当前时间，默认使用系统时钟；模拟测试时用 set_clock() 换成 SimulatedClock，
+不需要等待真实时间即可回放数月的定时任务和轮换逻辑
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Union
+
+
+class SystemClock:
+    """系统时钟"""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """模拟时钟：只有调用 advance / set / sleep 时时间才会前进，sleep 立即返回"""
+
+    def __init__(self, start: datetime):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def time(self) -> float:
+        return self._now.timestamp()
+
+    def monotonic(self) -> float:
+        return self._now.timestamp()
+
+    def sleep(self, seconds: float):
+        # 多个线程同时等待时，时间推进到最晚的截止时刻，而不是累加
+        if seconds > 0:
+            deadline = self._now + timedelta(seconds=seconds)
+            with self._lock:
+                if deadline > self._now:
+                    self._now = deadline
+
+    def advance(self, seconds: Union[int, float, timedelta]):
+        if not isinstance(seconds, timedelta):
+            seconds = timedelta(seconds=seconds)
+        with self._lock:
+            self._now += seconds
+
+    def set(self, value: datetime):
+        with self._lock:
+            self._now = value
+
+
+Clock = Union[SystemClock, SimulatedClock]
+
+_clock: Clock = SystemClock()
+
+
+def get_clock() -> Clock:
+    """当前使用的时钟"""
+    return _clock
+
+
+def set_clock(clock: Clock) -> Clock:
+    """替换时钟，返回之前的时钟（便于恢复）"""
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
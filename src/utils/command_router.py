@@ -0,0 +1,258 @@
+"""
+命令路由模块
+将所有命令关键词（及别名）和参数词（日期、人员等）编译为一个 Aho-Corasick 多模式匹配自动机，
+一次扫描消息即可找出命中的命令和参数，耗时只与消息长度相关，与注册的命令数量无关
+"""
+
+import re
+import threading
+from collections import deque
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式字符串匹配自动机"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, Any]]] = [[]]
+        self._built = True
+
+    def add(self, pattern: str, value: Any):
+        """添加模式串，匹配时返回 (模式串, value)"""
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((pattern, value))
+        self._built = False
+
+    def build(self):
+        """广度优先计算失配指针"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            current = queue.popleft()
+            for char, child in self._goto[current].items():
+                queue.append(child)
+                fallback = self._fail[current]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # 合并失配状态的输出，匹配时无需沿失配链回溯
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, Any]]:
+        """扫描文本，依次返回 (起始位置, 结束位置, 模式串, value)"""
+        if not self._built:
+            self.build()
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern, value in self._output[state]:
+                yield index - len(pattern) + 1, index + 1, pattern, value
+
+
+class CommandContext:
+    """命令执行上下文：原始消息及解析出的参数"""
+
+    def __init__(self, text: str, keyword: str, today: date, sender: Optional[str] = None,
+                 payload: Optional[dict] = None, scope: Any = None):
+        self.text = text
+        self.keyword = keyword
+        self.today = today
+        self.sender = sender
+        self.payload = payload or {}
+        # 调用方传入的作用域（如消息所属的团队），由命令处理函数自行解释
+        self.scope = scope
+        self.dates: List[date] = []
+        self.persons: List[str] = []
+
+    @property
+    def date(self) -> date:
+        """消息中的第一个日期，未提及时为今天"""
+        return self.dates[0] if self.dates else self.today
+
+    @property
+    def person(self) -> Optional[str]:
+        """消息中提到的第一个人员，未提及姓名时（包括「我」）为发送者"""
+        return self.persons[0] if self.persons else self.sender
+
+
+class Command:
+    """已注册的命令；exact 为True时，只有整条消息（去掉@提及和标点后）等于关键词才命中"""
+
+    def __init__(self, name: str, keywords: List[str], handler: Callable[[CommandContext], str],
+                 description: str = "", exact: bool = False):
+        self.name = name
+        self.keywords = keywords
+        self.handler = handler
+        self.description = description
+        self.exact = exact
+
+
+# 参数词的解析函数：(上下文) -> 参数值
+EntityResolver = Callable[[CommandContext], Any]
+
+# 显式日期：2025-09-20、2025/9/20、9月20日、9月20号
+_EXPLICIT_DATE_PATTERNS = [
+    re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'),
+    re.compile(r'(\d{1,2})月(\d{1,2})[日号]'),
+]
+
+# 整条匹配的命令比较前去掉的内容：@提及、空白和标点
+_MENTION_PATTERN = re.compile(r'@\S+')
+_PUNCTUATION_PATTERN = re.compile(r'[\W_]+')
+
+
+def _bare_text(text: str) -> str:
+    """去掉@提及、空白和标点后的消息文本"""
+    return _PUNCTUATION_PATTERN.sub('', _MENTION_PATTERN.sub('', text))
+
+
+class CommandRouter:
+    """
+    命令路由器
+
+    命令关键词与参数词编译进同一个自动机：
+    - 命令：取命中的最长关键词（越长越具体），相同长度取先注册的命令；exact 命令只在整条消息等于关键词时参与，参与时优先
+    - 参数：按「最左最长、互不重叠」的规则提取，交给命令处理函数
+    """
+
+    def __init__(self):
+        self._commands: List[Command] = []
+        self._entities: Dict[str, Dict[str, EntityResolver]] = {}
+        self._automaton: Optional[AhoCorasick] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, keywords: List[str], handler: Callable[[CommandContext], str],
+                 description: str = "", exact: bool = False):
+        """注册命令"""
+        with self._lock:
+            self._commands.append(Command(name, keywords, handler, description, exact))
+            self._automaton = None
+
+    def command(self, name: str, keywords: List[str], description: str = "", exact: bool = False):
+        """注册命令的装饰器"""
+
+        def decorator(handler: Callable[[CommandContext], str]):
+            self.register(name, keywords, handler, description, exact)
+            return handler
+
+        return decorator
+
+    def add_entities(self, kind: str, entities: Dict[str, EntityResolver]):
+        """添加参数词，kind 为参数类型（date / person）"""
+        with self._lock:
+            self._entities.setdefault(kind, {}).update(entities)
+            self._automaton = None
+
+    def set_entities(self, kind: str, entities: Dict[str, EntityResolver]):
+        """替换某类参数词（原有的该类参数词全部移除）"""
+        with self._lock:
+            self._entities[kind] = dict(entities)
+            self._automaton = None
+
+    @property
+    def commands(self) -> List[Command]:
+        return list(self._commands)
+
+    def _get_automaton(self) -> AhoCorasick:
+        automaton = self._automaton
+        if automaton is not None:
+            return automaton
+        with self._lock:
+            if self._automaton is None:
+                automaton = AhoCorasick()
+                for order, command in enumerate(self._commands):
+                    for keyword in command.keywords:
+                        automaton.add(keyword, ('command', order))
+                for kind, entities in self._entities.items():
+                    for word, resolver in entities.items():
+                        automaton.add(word, (kind, resolver))
+                automaton.build()
+                self._automaton = automaton
+            return self._automaton
+
+    def parse(self, text: str, today: date, sender: Optional[str] = None,
+              payload: Optional[dict] = None, scope: Any = None) -> Optional[Tuple[Command, CommandContext]]:
+        """解析消息，返回命中的命令及上下文；未命中任何命令返回None"""
+        best = None  # (是否整条匹配, 关键词长度, -注册顺序, 关键词)
+        entity_matches = []
+        bare_text = None
+        for start, end, pattern, (kind, value) in self._get_automaton().iter_matches(text):
+            if kind == 'command':
+                exact = self._commands[value].exact
+                if exact:
+                    if bare_text is None:
+                        bare_text = _bare_text(text)
+                    if bare_text != pattern:
+                        continue
+                candidate = (exact, end - start, -value, pattern)
+                if best is None or candidate[:3] > best[:3]:
+                    best = candidate
+            else:
+                entity_matches.append((start, end, kind, value))
+
+        if best is None:
+            return None
+
+        command = self._commands[-best[2]]
+        context = CommandContext(text, best[3], today, sender, payload, scope)
+
+        # 最左最长、互不重叠地选取参数词
+        entity_matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        position = 0
+        for start, end, kind, resolver in entity_matches:
+            if start < position:
+                continue
+            value = resolver(context)
+            if value is not None:
+                self._append_entity(context, kind, value)
+            position = end
+
+        for pattern in _EXPLICIT_DATE_PATTERNS:
+            for match in pattern.finditer(text):
+                numbers = [int(group) for group in match.groups()]
+                if len(numbers) == 2:
+                    numbers.insert(0, today.year)
+                try:
+                    context.dates.append(date(*numbers))
+                except ValueError:
+                    continue
+
+        return command, context
+
+    @staticmethod
+    def _append_entity(context: CommandContext, kind: str, value: Any):
+        if kind == 'date':
+            context.dates.append(value)
+        elif kind == 'person':
+            if value not in context.persons:
+                context.persons.append(value)
+
+    def dispatch(self, text: str, today: date, sender: Optional[str] = None,
+                 payload: Optional[dict] = None, scope: Any = None) -> Optional[Tuple[str, str]]:
+        """分发消息，返回 (命令名, 回复内容)；未命中任何命令返回None"""
+        parsed = self.parse(text, today, sender, payload, scope)
+        if parsed is None:
+            return None
+        command, context = parsed
+        return command.name, command.handler(context)
@@ -0,0 +1,335 @@
+"""
+日志索引模块
+日志归档时按块（约256KB，只在日志记录边界切分）写入：压缩模式下每块是一个独立的 gzip member / zstd frame，
+同时生成旁路索引文件（<归档>.idx.json），记录每块的字节偏移，以及 (小时, 级别, 日志器) -> 块编号 的映射
+
+查询时先按索引挑出可能命中的块，只读取并解压这些块，不需要扫描整个文件
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx.json'
+
+# 每块的目标大小（未压缩字节数）
+BLOCK_SIZE = 256 * 1024
+
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+# 日志记录首行：文本格式匹配 LOG_CONFIG 默认格式「时间 - 日志器 - 级别 - 消息」
+_TEXT_HEADER = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}):\d{2}:\d{2}\S* - (\S+) - ([A-Z]+) - ')
+# JSON Lines 格式（file_format 为 json）：JsonLinesFormatter 保证 ts, level, logger 固定在最前
+_JSON_HEADER = re.compile(rb'^\{"ts":"(\d{4}-\d{2}-\d{2} \d{2}):\d{2}:\d{2}[^"]*","level":"([A-Z]+)","logger":"([^"]+)"')
+
+# 索引键: (小时 'YYYY-MM-DD HH', 级别, 日志器)
+IndexKey = Tuple[str, str, str]
+
+
+def normalize_hour(value: Optional[str], end: bool = False) -> Optional[str]:
+    """把 YYYY-MM-DD / YYYY-MM-DD HH / YYYY-MM-DDTHH 转换为索引使用的小时键，格式错误抛出ValueError"""
+    if not value:
+        return None
+    value = value.strip().replace('T', ' ')
+    if re.fullmatch(r'\d{4}-\d{2}-\d{2}', value):
+        return f"{value} {'23' if end else '00'}"
+    match = re.fullmatch(r'(\d{4}-\d{2}-\d{2} \d{2})(:\d{2}(:\d{2})?)?', value)
+    if match is None:
+        raise ValueError(f"时间格式错误: {value}（应为 YYYY-MM-DD 或 YYYY-MM-DD HH）")
+    return match.group(1)
+
+
+def parse_header(line: bytes) -> Optional[IndexKey]:
+    """解析日志记录首行，返回索引键；续行（如异常堆栈）返回None"""
+    if line.startswith(b'{'):
+        match = _JSON_HEADER.match(line)
+        if match is None:
+            return None
+        hour, level, name = match.groups()
+    else:
+        match = _TEXT_HEADER.match(line)
+        if match is None:
+            return None
+        hour, name, level = match.groups()
+    return hour.decode(), level.decode(), name.decode('utf-8', 'replace')
+
+
+def _compressor(compression: Optional[str]):
+    """返回 (实际使用的压缩方式, 压缩函数)；zstandard 未安装时改用 gzip"""
+    if compression == 'zstd':
+        try:
+            import zstandard
+            compressor = zstandard.ZstdCompressor(level=10)
+            return 'zstd', compressor.compress
+        except ImportError:
+            compression = 'gzip'
+    if compression == 'gzip':
+        return 'gzip', lambda data: gzip.compress(data, compresslevel=6)
+    return None, None
+
+
+def _decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def iter_blocks(source, block_size: int = BLOCK_SIZE) -> Iterator[Tuple[bytes, Set[IndexKey]]]:
+    """按记录边界把日志切分为块，返回 (块内容, 块内出现的索引键)"""
+    lines: List[bytes] = []
+    keys: Set[IndexKey] = set()
+    size = 0
+    for line in source:
+        key = parse_header(line)
+        if key is not None:
+            if size >= block_size:
+                yield b''.join(lines), keys
+                lines, keys, size = [], set(), 0
+            keys.add(key)
+        lines.append(line)
+        size += len(line)
+    if lines:
+        yield b''.join(lines), keys
+
+
+class LogIndex:
+    """单个日志文件的块索引"""
+
+    def __init__(self, source: str, compression: Optional[str] = None):
+        self.source = source
+        self.compression = compression
+        self.blocks: List[Tuple[int, int]] = []
+        self.keys: Dict[str, List[int]] = {}
+        self.first_hour: Optional[str] = None
+        self.last_hour: Optional[str] = None
+
+    def add_block(self, offset: int, length: int, keys: Set[IndexKey]):
+        block_id = len(self.blocks)
+        self.blocks.append((offset, length))
+        for hour, level, name in keys:
+            self.keys.setdefault(f"{hour}|{level}|{name}", []).append(block_id)
+            if self.first_hour is None or hour < self.first_hour:
+                self.first_hour = hour
+            if self.last_hour is None or hour > self.last_hour:
+                self.last_hour = hour
+
+    def to_dict(self) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "source": os.path.basename(self.source),
+            "size": os.path.getsize(self.source),
+            "compression": self.compression,
+            "first_hour": self.first_hour,
+            "last_hour": self.last_hour,
+            "blocks": self.blocks,
+            "keys": self.keys,
+        }
+
+    def save(self, path: Optional[str] = None):
+        path = path or f"{self.source}{INDEX_SUFFIX}"
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, source: str) -> Optional["LogIndex"]:
+        """读取旁路索引，不存在、版本不符或与文件大小不一致时返回None"""
+        try:
+            with open(f"{source}{INDEX_SUFFIX}", 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION or data.get("size") != os.path.getsize(source):
+            return None
+        index = cls(source, data["compression"])
+        index.blocks = [tuple(block) for block in data["blocks"]]
+        index.keys = data["keys"]
+        index.first_hour = data["first_hour"]
+        index.last_hour = data["last_hour"]
+        return index
+
+    def match_blocks(self, start_hour: Optional[str] = None, end_hour: Optional[str] = None,
+                     min_level: Optional[str] = None, logger_prefix: Optional[str] = None) -> List[int]:
+        """按条件筛选可能命中的块编号（升序）"""
+        if start_hour and self.last_hour and self.last_hour < start_hour:
+            return []
+        if end_hour and self.first_hour and self.first_hour > end_hour:
+            return []
+        min_level_no = LEVELS.get(min_level or 'DEBUG', 0)
+        blocks: Set[int] = set()
+        for key, block_ids in self.keys.items():
+            hour, level, name = key.split('|', 2)
+            if start_hour and hour < start_hour:
+                continue
+            if end_hour and hour > end_hour:
+                continue
+            if LEVELS.get(level, 0) < min_level_no:
+                continue
+            if logger_prefix and not name.startswith(logger_prefix):
+                continue
+            blocks.update(block_ids)
+        return sorted(blocks)
+
+    def read_block(self, f, block_id: int) -> bytes:
+        offset, length = self.blocks[block_id]
+        f.seek(offset)
+        return _decompress(f.read(length), self.compression)
+
+
+def archive_with_index(path: str, compression: Optional[str], block_size: int = BLOCK_SIZE) -> str:
+    """
+    归档日志文件：按块压缩（每块一个独立的压缩单元）并生成索引，删除原文件；
+    compression 为 None 时不压缩，只生成索引。返回归档后的路径
+    """
+    compression, compress = _compressor(compression)
+    if compression is None:
+        index = build_index(path, block_size)
+        index.save()
+        return path
+
+    target = f"{path}{COMPRESSION_SUFFIXES[compression]}"
+    tmp_path = f"{target}.tmp"
+    index = LogIndex(target, compression)
+    offset = 0
+    with open(path, 'rb') as source, open(tmp_path, 'wb') as out:
+        for data, keys in iter_blocks(source, block_size):
+            payload = compress(data)
+            out.write(payload)
+            index.add_block(offset, len(payload), keys)
+            offset += len(payload)
+    os.replace(tmp_path, target)
+    index.save()
+    os.remove(path)
+    return target
+
+
+def build_index(path: str, block_size: int = BLOCK_SIZE) -> LogIndex:
+    """为未压缩的日志文件建立索引（不写入文件）"""
+    index = LogIndex(path)
+    offset = 0
+    with open(path, 'rb') as source:
+        for data, keys in iter_blocks(source, block_size):
+            index.add_block(offset, len(data), keys)
+            offset += len(data)
+    return index
+
+
+def get_index(path: str) -> Optional[LogIndex]:
+    """
+    获取日志文件的索引：优先读取旁路索引；未压缩的文件（如正在写入的文件、按大小轮转的归档）
+    没有索引时现场建立；整体压缩的旧归档无法按块读取，返回None
+    """
+    index = LogIndex.load(path)
+    if index is not None:
+        return index
+    if path.endswith(tuple(COMPRESSION_SUFFIXES.values())):
+        return None
+    return build_index(path)
+
+
+def _iter_records(data: bytes) -> Iterator[Tuple[Optional[IndexKey], bytes]]:
+    """把块内容拆分为日志记录（首行 + 续行）"""
+    key, lines = None, []
+    for line in data.splitlines(keepends=True):
+        line_key = parse_header(line)
+        if line_key is not None and lines:
+            yield key, b''.join(lines)
+            lines = []
+        if line_key is not None or not lines:
+            key = line_key
+        lines.append(line)
+    if lines:
+        yield key, b''.join(lines)
+
+
+def _record_matches(key: Optional[IndexKey], record: bytes, start_hour, end_hour, min_level_no,
+                    logger_prefix, contains: Optional[bytes]) -> bool:
+    if key is None:
+        return False
+    hour, level, name = key
+    if start_hour and hour < start_hour:
+        return False
+    if end_hour and hour > end_hour:
+        return False
+    if LEVELS.get(level, 0) < min_level_no:
+        return False
+    if logger_prefix and not name.startswith(logger_prefix):
+        return False
+    return contains is None or contains in record
+
+
+def search_file(path: str, start_hour: Optional[str] = None, end_hour: Optional[str] = None,
+                min_level: Optional[str] = None, logger_prefix: Optional[str] = None,
+                contains: Optional[str] = None) -> Iterator[str]:
+    """在单个日志文件中查询，返回匹配的日志记录"""
+    min_level_no = LEVELS.get(min_level or 'DEBUG', 0)
+    needle = contains.encode('utf-8') if contains else None
+    index = get_index(path)
+
+    if index is None:
+        # 没有块索引的旧归档：只能流式解压全文扫描
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for data, _ in iter_blocks(f):
+                for key, record in _iter_records(data):
+                    if _record_matches(key, record, start_hour, end_hour, min_level_no, logger_prefix, needle):
+                        yield record.decode('utf-8', 'replace').rstrip('\n')
+        return
+
+    with open(path, 'rb') as f:
+        for block_id in index.match_blocks(start_hour, end_hour, min_level, logger_prefix):
+            for key, record in _iter_records(index.read_block(f, block_id)):
+                if _record_matches(key, record, start_hour, end_hour, min_level_no, logger_prefix, needle):
+                    yield record.decode('utf-8', 'replace').rstrip('\n')
+
+
+def archive_sort_key(base_filename: str, path: str) -> Tuple[str, int]:
+    """归档文件名 <日志>.<时段>[.<序号>][.gz] 的排序键 (时段, 序号)，同一时段的首个归档序号为0"""
+    name = path[len(base_filename) + 1:]
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    period, _, sequence = name.partition('.')
+    return period, int(sequence) if sequence.isdigit() else 0
+
+
+def list_archives(base_filename: str) -> List[str]:
+    """列出某个日志文件的所有归档（不含正在写入的文件和临时文件），按 (时段, 序号) 即时间顺序排列"""
+    archives = [path for path in glob.glob(f"{glob.escape(base_filename)}.*")
+                if not path.endswith('.tmp') and not path.endswith(INDEX_SUFFIX)]
+    return sorted(archives, key=lambda path: archive_sort_key(base_filename, path))
+
+
+def log_files(base_filename: str) -> List[str]:
+    """某个日志的所有文件（归档 + 当前文件），按时间顺序"""
+    archives = list_archives(base_filename)
+    if os.path.exists(base_filename):
+        archives.append(base_filename)
+    return archives
+
+
+def search_logs(base_filename: str, start_hour: Optional[str] = None, end_hour: Optional[str] = None,
+                min_level: Optional[str] = None, logger_prefix: Optional[str] = None,
+                contains: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
+    """在某个日志的所有文件中查询，返回最多 limit 条匹配的日志记录"""
+    results: List[str] = []
+    for path in log_files(base_filename):
+        for record in search_file(path, start_hour, end_hour, min_level, logger_prefix, contains):
+            results.append(record)
+            if limit and len(results) >= limit:
+                return results
+    return results
@@ -0,0 +1,159 @@
+"""
+按时间轮转的日志处理器
+- 轮转时只做一次文件重命名（写日志的线程只承担 rename 的开销）
+- 压缩（gzip / zstd，按块压缩并生成索引，见 log_index）和过期清理交给后台线程完成
+- 启动时会把上次未来得及压缩的归档文件补充压缩
+- 归档完成后通知监听者（如日志索引），参数为归档后的文件路径
+"""
+
+import glob
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from src.utils.log_index import COMPRESSION_SUFFIXES, archive_sort_key, archive_with_index, list_archives
+
+# 轮转模式 -> TimedRotatingFileHandler 的 when 参数
+ROTATION_WHEN = {
+    'daily': 'MIDNIGHT',
+    'hourly': 'H',
+}
+
+# 归档完成监听者：(归档文件路径) -> None
+RotationListener = Callable[[str], None]
+
+
+def _internal_logger() -> logging.Logger:
+    return logging.getLogger('oncall.log_rotation')
+
+
+def compress_file(path: str, compression: Optional[str]) -> str:
+    """按块压缩归档文件并生成索引，删除原文件，返回归档后的路径"""
+    return archive_with_index(path, compression)
+
+
+class LogMaintenance:
+    """日志归档后台线程：压缩、过期清理、通知监听者"""
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._listeners: List[RotationListener] = []
+
+    def add_listener(self, listener: RotationListener):
+        self._listeners.append(listener)
+
+    def submit(self, path: str, base_filename: str, compression: Optional[str], retention_count: int):
+        """提交一个刚轮转出来的归档文件"""
+        self._ensure_started()
+        self._queue.put((path, base_filename, compression, retention_count))
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-maintenance', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path, base_filename, compression, retention_count = self._queue.get()
+            try:
+                archived = compress_file(path, compression) if os.path.exists(path) else None
+                cleanup_archives(base_filename, retention_count)
+                if archived and os.path.exists(archived):
+                    # 压缩时已在同一遍读取中生成索引，监听者可直接使用
+                    for listener in self._listeners:
+                        try:
+                            listener(archived)
+                        except Exception as e:
+                            _internal_logger().error(f"日志归档监听者执行失败: {str(e)}")
+            except Exception as e:
+                _internal_logger().error(f"日志归档处理失败: {path}，{str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """等待队列中的归档任务全部完成"""
+        self._queue.join()
+
+
+# 全局日志归档线程
+log_maintenance = LogMaintenance()
+
+
+def add_rotation_listener(listener: RotationListener):
+    """注册归档完成监听者"""
+    log_maintenance.add_listener(listener)
+
+
+def cleanup_archives(base_filename: str, retention_count: int):
+    """只保留最新的 retention_count 个归档，0 表示不清理"""
+    if retention_count <= 0:
+        return
+    archives = list_archives(base_filename)
+    for path in archives[:-retention_count]:
+        try:
+            os.remove(path)
+            # 同时删除归档对应的索引等附属文件
+            for sidecar in glob.glob(f"{glob.escape(path)}.*"):
+                os.remove(sidecar)
+        except OSError as e:
+            _internal_logger().warning(f"删除过期日志失败: {path}，{str(e)}")
+
+
+class CompressingTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    按天/按小时轮转的日志处理器
+
+    参数:
+        filename: 日志文件路径
+        rotation: daily / hourly
+        compression: gzip / zstd / None
+        retention_count: 保留的归档数量
+    """
+
+    def __init__(self, filename: str, rotation: str = 'daily', compression: Optional[str] = 'gzip',
+                 retention_count: int = 0, encoding: str = 'utf-8'):
+        self.compression = compression
+        self.retention_count = retention_count
+        # backupCount=0：基类不在写日志的线程中删除文件，清理由后台线程完成
+        super().__init__(filename, when=ROTATION_WHEN[rotation], backupCount=0, encoding=encoding)
+        self._recover_pending()
+
+    def computeRollover(self, currentTime):
+        # 基类的按小时轮转从启动时刻起算，这里对齐到整点
+        if self.when == 'H':
+            current = datetime.fromtimestamp(currentTime).replace(minute=0, second=0, microsecond=0)
+            return int((current + timedelta(hours=1)).timestamp())
+        return super().computeRollover(currentTime)
+
+    def rotation_filename(self, default_name):
+        # 同一时段已有归档（如手动触发过轮转）时追加比现有最大序号大1的序号：避免覆盖旧归档，
+        # 也不复用被清理掉的较小序号，保证序号顺序即时间顺序
+        period = archive_sort_key(self.baseFilename, default_name)[0]
+        sequences = [sequence for archive_period, sequence in
+                     (archive_sort_key(self.baseFilename, path) for path in list_archives(self.baseFilename))
+                     if archive_period == period]
+        if not sequences:
+            return default_name
+        return f"{default_name}.{max(sequences) + 1}"
+
+    def rotate(self, source, dest):
+        """轮转：只重命名，压缩和清理交给后台线程"""
+        if not os.path.exists(source):
+            return
+        os.rename(source, dest)
+        log_maintenance.submit(dest, self.baseFilename, self.compression, self.retention_count)
+
+    def _recover_pending(self):
+        """启动时补充压缩上次退出前未完成压缩的归档"""
+        if not self.compression:
+            return
+        for path in list_archives(self.baseFilename):
+            if not path.endswith(tuple(COMPRESSION_SUFFIXES.values())):
+                log_maintenance.submit(path, self.baseFilename, self.compression, self.retention_count)
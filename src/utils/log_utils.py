@@ -4,8 +4,9 @@
 """
 
 import functools
+import random
 import time
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Optional, Tuple, Type
 from .logger import get_logger, LogContext
 
 
@@ -48,12 +49,37 @@ def log_performance(threshold_seconds: float = 1.0):
     return decorator
 
 
-def log_retry(max_retries: int = 3, delay: float = 1.0):
+def backoff_delay(attempt: int, delay: float = 1.0, backoff: float = 1.0,
+                  max_delay: Optional[float] = None, jitter: bool = False) -> float:
+    """计算第 attempt 次重试（从1开始）前的等待时间
+
+    Args:
+        attempt: 重试序号
+        delay: 首次重试的等待时间（秒）
+        backoff: 退避倍数，1.0 表示固定间隔
+        max_delay: 等待时间上限（秒）
+        jitter: 是否使用全抖动（在 0 ~ 计算值 之间随机），避免多个调用方同时重试
+    """
+    wait = delay * (backoff ** (attempt - 1))
+    if max_delay is not None:
+        wait = min(wait, max_delay)
+    if jitter:
+        wait = random.uniform(0, wait)
+    return wait
+
+
+def log_retry(max_retries: int = 3, delay: float = 1.0, backoff: float = 1.0,
+              max_delay: Optional[float] = None, jitter: bool = False,
+              exceptions: Tuple[Type[BaseException], ...] = (Exception,)):
     """重试装饰器
 
     Args:
         max_retries: 最大重试次数
-        delay: 重试间隔（秒）
+        delay: 首次重试间隔（秒）
+        backoff: 退避倍数，默认 1.0 即固定间隔
+        max_delay: 重试间隔上限（秒）
+        jitter: 是否对重试间隔加随机抖动
+        exceptions: 需要重试的异常类型，其他异常直接抛出
     """
 
     def decorator(func: Callable) -> Callable:
@@ -65,14 +91,14 @@ def log_retry(max_retries: int = 3, delay: float = 1.0):
                 try:
                     if attempt > 0:
                         get_logger().info(f"重试 {attempt}/{max_retries}: {func_name}")
-                        time.sleep(delay)
+                        time.sleep(backoff_delay(attempt, delay, backoff, max_delay, jitter))
 
                     result = func(*args, **kwargs)
                     if attempt > 0:
                         get_logger().info(f"重试成功: {func_name}")
                     return result
 
-                except Exception as e:
+                except exceptions as e:
                     if attempt == max_retries:
                         get_logger().error(
                             f"重试失败: {func_name}, 已重试 {max_retries} 次, "
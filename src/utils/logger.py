@@ -1,3 +1,4 @@
+import functools
 import logging
 import logging.handlers
 import os
@@ -5,6 +6,8 @@ import sys
 from datetime import datetime
 from typing import Optional
 from config.settings import LOG_CONFIG
+from src.utils.log_rotation import CompressingTimedRotatingFileHandler
+from src.utils.structured_log import JsonLinesFormatter
 
 
 class ColoredFormatter(logging.Formatter):
@@ -20,15 +23,21 @@ class ColoredFormatter(logging.Formatter):
         'RESET': '\033[0m'  # 重置
     }
 
-    def format(self, record):
-        # 创建记录的副本，避免修改原始记录
-        record_copy = logging.makeLogRecord(record.__dict__)
-
-        # 添加颜色
-        if record_copy.levelname in self.COLORS:
-            record_copy.levelname = f"{self.COLORS[record_copy.levelname]}{record_copy.levelname}{self.COLORS['RESET']}"
+    def __init__(self, fmt=None, datefmt=None):
+        super().__init__(fmt, datefmt)
+        # 每个级别预先生成带颜色的格式器，格式化时不需要复制或修改日志记录
+        fmt = fmt or '%(levelname)s:%(name)s:%(message)s'
+        self._level_formatters = {
+            level: logging.Formatter(fmt.replace('%(levelname)s', f"{color}%(levelname)s{self.COLORS['RESET']}"),
+                                     datefmt)
+            for level, color in self.COLORS.items() if level != 'RESET'
+        }
 
-        return super().format(record_copy)
+    def format(self, record):
+        formatter = self._level_formatters.get(record.levelname)
+        if formatter is None:
+            return super().format(record)
+        return formatter.format(record)
 
 
 class OnCallLogger:
@@ -66,6 +75,12 @@ class OnCallLogger:
             datefmt=LOG_CONFIG['date_format']
         )
 
+        # 文件格式器：text 与控制台格式一致（无颜色），json 为每行一条JSON记录
+        if LOG_CONFIG.get('file_format', 'text') == 'json':
+            file_formatter = JsonLinesFormatter(datefmt=LOG_CONFIG['date_format'])
+        else:
+            file_formatter = formatter
+
         # 彩色控制台格式器
         colored_formatter = ColoredFormatter(
             LOG_CONFIG['format'],
@@ -83,27 +98,36 @@ class OnCallLogger:
         if LOG_CONFIG['file_output']:
             # 主日志文件
             log_file = os.path.join(log_dir, LOG_CONFIG['log_file'])
-            file_handler = logging.handlers.RotatingFileHandler(
-                log_file,
-                maxBytes=LOG_CONFIG['max_bytes'],
-                backupCount=LOG_CONFIG['backup_count'],
-                encoding='utf-8'
-            )
+            file_handler = self._create_file_handler(log_file)
             file_handler.setLevel(getattr(logging, LOG_CONFIG['file_level']))
-            file_handler.setFormatter(formatter)  # 使用普通格式器，确保无颜色
+            file_handler.setFormatter(file_formatter)  # 使用文件格式器，确保无颜色
             self._logger.addHandler(file_handler)
 
             # 错误日志文件
             error_log_file = os.path.join(log_dir, LOG_CONFIG['error_log_file'])
-            error_handler = logging.handlers.RotatingFileHandler(
-                error_log_file,
+            error_handler = self._create_file_handler(error_log_file)
+            error_handler.setLevel(logging.ERROR)
+            error_handler.setFormatter(file_formatter)  # 使用文件格式器，确保无颜色
+            self._logger.addHandler(error_handler)
+
+    @staticmethod
+    def _create_file_handler(log_file: str) -> logging.Handler:
+        """按配置创建按大小或按时间轮转的文件处理器"""
+        rotation = LOG_CONFIG.get('rotation', 'size')
+        if rotation == 'size':
+            return logging.handlers.RotatingFileHandler(
+                log_file,
                 maxBytes=LOG_CONFIG['max_bytes'],
                 backupCount=LOG_CONFIG['backup_count'],
                 encoding='utf-8'
             )
-            error_handler.setLevel(logging.ERROR)
-            error_handler.setFormatter(formatter)  # 使用普通格式器，确保无颜色
-            self._logger.addHandler(error_handler)
+        return CompressingTimedRotatingFileHandler(
+            log_file,
+            rotation=rotation,
+            compression=LOG_CONFIG.get('compression'),
+            retention_count=LOG_CONFIG.get('retention_count', 0),
+            encoding='utf-8'
+        )
 
     def get_logger(self, name: Optional[str] = None) -> logging.Logger:
         """获取日志器"""
@@ -149,6 +173,7 @@ def get_logger(name: Optional[str] = None) -> logging.Logger:
 def log_execution_time(func):
     """记录函数执行时间的装饰器"""
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         start_time = datetime.now()
         func_name = f"{func.__module__}.{func.__name__}"
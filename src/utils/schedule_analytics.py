@@ -0,0 +1,180 @@
+"""
+值班均衡性分析引擎
+基于 groupby / crosstab 的向量化统计，支持增量追加：
+- 每人值班次数、占比
+- 周一至周日分布、周末/节假日次数
+- 两次值班之间的最小/平均间隔
+- 最近30/90天的滚动均衡度
+
+新的值班日期通过 append 追加，只处理新增部分，不重新扫描历史数据
+"""
+
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+WEEKDAY_NAMES_CN = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+# 默认的滚动窗口（天）
+DEFAULT_WINDOWS = (30, 90)
+
+
+def balance_score(counts: pd.Series) -> float:
+    """均衡度评分：1 - (最多次数 - 最少次数) / 平均次数，1.0为完全均衡"""
+    if counts.empty:
+        return 0.0
+    avg = counts.mean()
+    if avg <= 0:
+        return 0.0
+    return float(1 - (counts.max() - counts.min()) / avg)
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """提取日期、姓名两列，解析日期并去除空值，按日期排序"""
+    frame = pd.DataFrame({
+        "日期": pd.to_datetime(df["日期"], errors='coerce'),
+        "姓名": df["姓名"],
+    }).dropna()
+    frame["姓名"] = frame["姓名"].astype(str).str.strip()
+    frame = frame[frame["姓名"] != ""]
+    return frame.sort_values("日期", kind='stable').reset_index(drop=True)
+
+
+class ScheduleAnalytics:
+    """可增量追加的值班统计"""
+
+    def __init__(self, holidays: Optional[Iterable[str]] = None, windows: Sequence[int] = DEFAULT_WINDOWS):
+        """
+        参数:
+            holidays: 节假日日期（YYYY-MM-DD）
+            windows: 滚动均衡度的窗口天数
+        """
+        self.holidays = pd.DatetimeIndex(pd.to_datetime(list(holidays or [])))
+        self.windows = tuple(sorted(windows))
+
+        self.total_days = 0
+        self.first_date: Optional[pd.Timestamp] = None
+        self.last_date: Optional[pd.Timestamp] = None
+        self.counts = pd.Series(dtype='int64')
+        self.weekday_counts = pd.DataFrame(0, index=pd.Index([], name="姓名"), columns=WEEKDAY_NAMES_CN,
+                                           dtype='int64')
+        self.weekend_counts = pd.Series(dtype='int64')
+        self.holiday_counts = pd.Series(dtype='int64')
+        self.last_shift = pd.Series(dtype='datetime64[ns]')
+        self.gap_sum = pd.Series(dtype='float64')
+        self.gap_count = pd.Series(dtype='int64')
+        self.gap_min = pd.Series(dtype='float64')
+        # 只保留最大窗口内的记录，用于滚动统计（内存有界）
+        self._recent = pd.DataFrame({"日期": pd.Series(dtype='datetime64[ns]'), "姓名": pd.Series(dtype=object)})
+
+    @staticmethod
+    def _add(total: pd.Series, delta: pd.Series) -> pd.Series:
+        return total.add(delta, fill_value=0).astype(total.dtype if not total.empty else delta.dtype)
+
+    def append(self, df: pd.DataFrame) -> "ScheduleAnalytics":
+        """
+        追加新的值班记录（需包含「日期」「姓名」列）
+
+        新记录的日期必须晚于已追加的最后日期，否则抛出 ValueError
+        """
+        frame = _normalize(df)
+        if frame.empty:
+            return self
+        if self.last_date is not None and frame["日期"].iloc[0] <= self.last_date:
+            raise ValueError(f"追加的日期必须晚于 {self.last_date.strftime('%Y-%m-%d')}")
+
+        names = frame["姓名"]
+        dates = frame["日期"]
+        weekday = dates.dt.dayofweek
+
+        # 次数与周几分布
+        self.counts = self._add(self.counts, names.value_counts())
+        crosstab = pd.crosstab(names, weekday).reindex(columns=range(7), fill_value=0)
+        crosstab.columns = WEEKDAY_NAMES_CN
+        self.weekday_counts = self.weekday_counts.add(crosstab, fill_value=0).astype('int64')
+
+        is_holiday = dates.isin(self.holidays)
+        is_weekend = (weekday >= 5) | is_holiday
+        self.weekend_counts = self._add(self.weekend_counts, names[is_weekend].value_counts())
+        self.holiday_counts = self._add(self.holiday_counts, names[is_holiday].value_counts())
+
+        # 间隔：把每人上次值班日期作为前导记录拼接，再按人 diff
+        previous = pd.DataFrame({"日期": self.last_shift.values, "姓名": self.last_shift.index})
+        combined = pd.concat([previous, frame], ignore_index=True)
+        gaps = combined.groupby("姓名")["日期"].diff().dt.days.iloc[len(previous):]
+        gap_frame = pd.DataFrame({"姓名": names.values, "gap": gaps.values}).dropna()
+        if not gap_frame.empty:
+            grouped = gap_frame.groupby("姓名")["gap"]
+            self.gap_sum = self._add(self.gap_sum, grouped.sum().astype('float64'))
+            self.gap_count = self._add(self.gap_count, grouped.count())
+            new_min = grouped.min().astype('float64')
+            self.gap_min = pd.concat([self.gap_min, new_min]).groupby(level=0).min()
+
+        last = frame.groupby("姓名")["日期"].max()
+        self.last_shift = pd.concat([self.last_shift, last]).groupby(level=0).max()
+
+        # 滚动窗口记录
+        self.total_days += len(frame)
+        self.first_date = dates.iloc[0] if self.first_date is None else self.first_date
+        self.last_date = dates.iloc[-1]
+        recent = pd.concat([self._recent, frame], ignore_index=True)
+        if self.windows:
+            cutoff = self.last_date - pd.Timedelta(days=self.windows[-1] - 1)
+            recent = recent[recent["日期"] >= cutoff]
+        self._recent = recent.reset_index(drop=True)
+        return self
+
+    def rolling_counts(self, window: int) -> pd.Series:
+        """最近 window 天内每人的值班次数（包括0次的人员）"""
+        if self.last_date is None:
+            return pd.Series(dtype='int64')
+        cutoff = self.last_date - pd.Timedelta(days=window - 1)
+        counts = self._recent.loc[self._recent["日期"] >= cutoff, "姓名"].value_counts()
+        return counts.reindex(self.counts.index, fill_value=0)
+
+    def person_report(self) -> pd.DataFrame:
+        """每人一行的统计表"""
+        report = pd.DataFrame({"次数": self.counts})
+        report["占比"] = report["次数"] / self.total_days if self.total_days else 0.0
+        report = report.join(self.weekday_counts)
+        report["周末"] = self.weekend_counts.reindex(report.index, fill_value=0)
+        report["节假日"] = self.holiday_counts.reindex(report.index, fill_value=0)
+        report["最小间隔"] = self.gap_min.reindex(report.index)
+        report["平均间隔"] = (self.gap_sum / self.gap_count).reindex(report.index)
+        report["间隔次数"] = self.gap_count.reindex(report.index, fill_value=0)
+        for window in self.windows:
+            report[f"近{window}天"] = self.rolling_counts(window)
+        report.index.name = "姓名"
+        return report.sort_values("次数", ascending=False)
+
+    def summary(self) -> Dict:
+        """整体统计结果（可直接序列化为JSON）"""
+        report = self.person_report()
+        gap_min = self.gap_min.min() if not self.gap_min.empty else np.nan
+        total_gaps = self.gap_count.sum()
+        result = {
+            "total_days": int(self.total_days),
+            "first_date": self.first_date.strftime("%Y-%m-%d") if self.first_date is not None else None,
+            "last_date": self.last_date.strftime("%Y-%m-%d") if self.last_date is not None else None,
+            "unique_persons": int(len(self.counts)),
+            "balance_score": balance_score(self.counts),
+            "weekend_balance_score": balance_score(self.weekend_counts.reindex(self.counts.index, fill_value=0)),
+            "min_gap": None if pd.isna(gap_min) else int(gap_min),
+            "mean_gap": float(self.gap_sum.sum() / total_gaps) if total_gaps else None,
+            "rolling_balance": {str(window): balance_score(self.rolling_counts(window)) for window in self.windows},
+            "persons": {},
+        }
+        # 转为 object 后逐列取值，保留整数列的类型
+        for name, row in report.astype(object).to_dict(orient='index').items():
+            result["persons"][name] = {
+                key: (None if pd.isna(value) else value.item() if hasattr(value, 'item') else value)
+                for key, value in row.items()
+            }
+        return result
+
+
+def analyze_schedule(df: pd.DataFrame, holidays: Optional[Iterable[str]] = None,
+                     windows: Sequence[int] = DEFAULT_WINDOWS) -> ScheduleAnalytics:
+    """一次性分析完整的值班计划"""
+    return ScheduleAnalytics(holidays, windows).append(df)
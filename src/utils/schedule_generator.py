@@ -1,7 +1,10 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+import numpy as np
 import pandas as pd
 import math  # 用于计算最小公倍数
+import os
 from config.settings import duty_persons  # 从配置文件导入值班人员列表
+from src.utils.clock import get_clock
 
 
 def calculate_lcm(a, b):
@@ -10,17 +13,18 @@ def calculate_lcm(a, b):
     return a * b // math.gcd(a, b)
 
 
-def generate_duty_schedule(cycle_days=None, start_date_str=None):
-    """
-    生成间隔均衡的值班计划，支持人员数量动态变化
-    核心优化：周期自动适配人数，人数不足时主动提示
+# 周几名称（按 Monday=0 的顺序），用于向量化映射
+WEEKDAY_NAMES_CN = np.array(["周一", "周二", "周三", "周四", "周五", "周六", "周日"])
 
-    参数:
-        cycle_days: 值班周期天数（可选，默认=人数与7的最小公倍数，保证长期均衡）
-        start_date_str: 起始日期字符串（格式"YYYY-MM-DD"，默认=今天）
-    返回:
-        包含日期、周几、姓名的DataFrame，或None（人数不合法时）
-    """
+# 流式输出时每块生成的天数
+STREAM_CHUNK_DAYS = 10000
+
+# 写入SQLite时使用的表名
+SQLITE_TABLE_NAME = "duty_schedule"
+
+
+def _get_duty_names():
+    """校验值班人员列表，返回姓名数组；人数不合法时返回None"""
     # 1. 基础校验：人员列表非空
     if not duty_persons:
         print("错误：值班人员列表为空")
@@ -34,6 +38,51 @@ def generate_duty_schedule(cycle_days=None, start_date_str=None):
         print(f"错误：当前仅{people_count}人，最少需要{min_required_people}人（否则值班间隔会小于5天）")
         return None
 
+    return np.array([person["name"] for person in duty_persons])
+
+
+def _parse_start_date(start_date_str=None):
+    """解析起始日期（默认今天），返回 numpy 的 datetime64[D]"""
+    if start_date_str is None:
+        return np.datetime64(get_clock().now().date(), 'D')
+    return np.datetime64(datetime.strptime(start_date_str, "%Y-%m-%d").date(), 'D')
+
+
+def _build_schedule_chunk(start_date, names, offset, days):
+    """
+    向量化生成一段排班数据（第 offset 天起共 days 天）
+
+    日期、周几、姓名均由整数索引数组一次计算得到，不逐天循环
+    """
+    day_index = np.arange(offset, offset + days)
+    dates = start_date + day_index
+    # 1970-01-01 是周四，据此换算为 Monday=0 的周几索引
+    weekday_index = (dates.astype('int64') + 3) % 7
+
+    return pd.DataFrame({
+        "日期": dates.astype(str),
+        "周几": WEEKDAY_NAMES_CN[weekday_index],
+        # 通用轮值逻辑：无论人数多少，都按"当前天数%人数"分配（间隔=人数，天然≥5天）
+        "姓名": names[day_index % len(names)],
+    })
+
+
+def generate_duty_schedule(cycle_days=None, start_date_str=None):
+    """
+    生成间隔均衡的值班计划，支持人员数量动态变化
+    核心优化：周期自动适配人数，人数不足时主动提示
+
+    参数:
+        cycle_days: 值班周期天数（可选，默认=人数与7的最小公倍数，保证长期均衡）
+        start_date_str: 起始日期字符串（格式"YYYY-MM-DD"，默认=今天）
+    返回:
+        包含日期、周几、姓名的DataFrame，或None（人数不合法时）
+    """
+    names = _get_duty_names()
+    if names is None:
+        return None
+    people_count = len(names)
+
     try:
         # 3. 动态确定周期：默认=人数与7（一周）的最小公倍数（保证周末值班长期均衡）
         if cycle_days is None:
@@ -41,33 +90,10 @@ def generate_duty_schedule(cycle_days=None, start_date_str=None):
             print(f"自动适配周期：{people_count}人与7天的最小公倍数={cycle_days}天")
 
         # 4. 解析起始日期（默认今天）
-        if start_date_str is None:
-            start_date = datetime.now()
-        else:
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-
-        # 5. 生成排班数据（核心逻辑：i % 人数 适配任意人数）
-        schedule_data = []
-        for i in range(cycle_days):
-            current_date = start_date + timedelta(days=i)
-            weekday = current_date.strftime("%A")  # 英文星期名
-            weekday_cn = {
-                "Monday": "周一", "Tuesday": "周二", "Wednesday": "周三",
-                "Thursday": "周四", "Friday": "周五", "Saturday": "周六", "Sunday": "周日"
-            }[weekday]
-
-            # 通用轮值逻辑：无论人数多少，都按"当前天数%人数"分配（间隔=人数，天然≥5天）
-            person_index = i % people_count
-            person_name = duty_persons[person_index]["name"]
-
-            schedule_data.append({
-                "日期": current_date.strftime("%Y-%m-%d"),
-                "周几": weekday_cn,
-                "姓名": person_name
-            })
-
-        # 6. 转换为DataFrame并返回
-        schedule_df = pd.DataFrame(schedule_data)
+        start_date = _parse_start_date(start_date_str)
+
+        # 5. 向量化生成排班数据
+        schedule_df = _build_schedule_chunk(start_date, names, 0, cycle_days)
         print(f"成功生成{cycle_days}天的值班计划（{people_count}人轮值，间隔{people_count}天）")
         return schedule_df
 
@@ -76,6 +102,81 @@ def generate_duty_schedule(cycle_days=None, start_date_str=None):
         return None
 
 
+def iter_duty_schedule_chunks(total_days, start_date_str=None, chunk_days=STREAM_CHUNK_DAYS):
+    """
+    分块生成长周期值班计划，每次只在内存中保留一块
+
+    参数:
+        total_days: 总天数
+        start_date_str: 起始日期字符串（格式"YYYY-MM-DD"，默认=今天）
+        chunk_days: 每块天数
+    返回:
+        逐块产出包含日期、周几、姓名的DataFrame
+    """
+    names = _get_duty_names()
+    if names is None:
+        return
+
+    start_date = _parse_start_date(start_date_str)
+    for offset in range(0, total_days, chunk_days):
+        yield _build_schedule_chunk(start_date, names, offset, min(chunk_days, total_days - offset))
+
+
+def write_duty_schedule(output_path, total_days, start_date_str=None, chunk_days=STREAM_CHUNK_DAYS):
+    """
+    将长周期值班计划流式写入文件，不在内存中保留完整计划
+
+    参数:
+        output_path: 输出路径，按扩展名选择格式：.xlsx / .csv / .db、.sqlite（SQLite）
+        total_days: 总天数
+        start_date_str: 起始日期字符串（格式"YYYY-MM-DD"，默认=今天）
+        chunk_days: 每块天数
+    返回:
+        写入的行数，失败时返回None
+    """
+    file_ext = os.path.splitext(output_path)[1].lower()
+    chunks = iter_duty_schedule_chunks(total_days, start_date_str, chunk_days)
+    written = 0
+
+    try:
+        if file_ext == '.csv':
+            with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+                for index, chunk in enumerate(chunks):
+                    chunk.to_csv(f, index=False, header=(index == 0))
+                    written += len(chunk)
+
+        elif file_ext == '.xlsx':
+            # openpyxl 只写模式逐行写入，内存占用与总行数无关
+            import openpyxl
+            workbook = openpyxl.Workbook(write_only=True)
+            worksheet = workbook.create_sheet()
+            worksheet.append(["日期", "周几", "姓名"])
+            for chunk in chunks:
+                for row in chunk.itertuples(index=False, name=None):
+                    worksheet.append(row)
+                written += len(chunk)
+            workbook.save(output_path)
+
+        elif file_ext in ('.db', '.sqlite', '.sqlite3'):
+            import sqlite3
+            with sqlite3.connect(output_path) as conn:
+                for index, chunk in enumerate(chunks):
+                    chunk.to_sql(SQLITE_TABLE_NAME, conn, index=False,
+                                 if_exists='replace' if index == 0 else 'append')
+                    written += len(chunk)
+
+        else:
+            print(f"不支持的输出格式: {file_ext}")
+            return None
+
+    except Exception as e:
+        print(f"写入值班计划时发生错误：{str(e)}")
+        return None
+
+    print(f"成功写入{written}天的值班计划：{output_path}")
+    return written
+
+
 def analyze_schedule_balance(schedule_df):
     """
     分析值班计划的均衡性
@@ -0,0 +1,259 @@
+"""
+带约束的均衡排班求解器
+在 generate_duty_schedule 的简单轮值（i % 人数）基础上，支持：
+- 请假：指定人员在指定日期不可值班
+- 不排周末：指定人员不安排周末/节假日
+- 最小间隔：同一人两次值班至少间隔 N 天
+- 均衡：总次数、周末/节假日次数在人员之间尽量平均
+
+求解分两步：贪心构造（每天选当前负担最轻的可用人员），再做局部搜索修复
+（把负担最重者的班次转移或交换给负担最轻者），直到无法继续改进
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from config.settings import duty_persons
+from src.utils.schedule_generator import WEEKDAY_NAMES_CN
+
+# 默认最小值班间隔（天），与 generate_duty_schedule 的最少人数要求一致
+DEFAULT_MIN_GAP = 5
+
+# 局部搜索的最大迭代次数
+MAX_REPAIR_ITERATIONS = 10000
+
+
+class ScheduleConstraints:
+    """排班约束"""
+
+    def __init__(self, min_gap: int = DEFAULT_MIN_GAP,
+                 leave: Optional[Dict[str, Iterable[str]]] = None,
+                 no_weekend: Optional[Iterable[str]] = None,
+                 holidays: Optional[Iterable[str]] = None):
+        """
+        参数:
+            min_gap: 同一人两次值班的最小间隔天数
+            leave: 请假日期，格式 {姓名: ["YYYY-MM-DD", ...]}
+            no_weekend: 不安排周末/节假日的人员
+            holidays: 节假日日期列表（按周末对待，并单独统计均衡）
+        """
+        self.min_gap = min_gap
+        self.leave: Dict[str, Set[str]] = {name: set(dates) for name, dates in (leave or {}).items()}
+        self.no_weekend: Set[str] = set(no_weekend or [])
+        self.holidays: Set[str] = set(holidays or [])
+
+
+class _SolverState:
+    """求解过程中的状态：每天的值班人、每人的班次（升序的天序号）"""
+
+    def __init__(self, names: List[str], dates: List[str], weekday_index: List[int],
+                 constraints: ScheduleConstraints):
+        self.names = names
+        self.dates = dates
+        self.constraints = constraints
+        self.is_holiday = [d in constraints.holidays for d in dates]
+        self.is_weekend = [weekday_index[i] >= 5 or self.is_holiday[i] for i in range(len(dates))]
+        self.assignment: List[Optional[str]] = [None] * len(dates)
+        self.shifts: Dict[str, List[int]] = {name: [] for name in names}
+        self.weekend_counts: Dict[str, int] = {name: 0 for name in names}
+        self.holiday_counts: Dict[str, int] = {name: 0 for name in names}
+
+    def available(self, name: str, day: int) -> bool:
+        """是否满足请假和周末约束"""
+        if self.dates[day] in self.constraints.leave.get(name, ()):
+            return False
+        if self.is_weekend[day] and name in self.constraints.no_weekend:
+            return False
+        return True
+
+    def gap_ok(self, name: str, day: int, ignore: Optional[int] = None) -> bool:
+        """在 day 安排 name 是否满足最小间隔（ignore 为将被移走的班次）"""
+        shifts = self.shifts[name]
+        pos = bisect_left(shifts, day)
+        min_gap = self.constraints.min_gap
+        before = pos - 1
+        if before >= 0 and shifts[before] == ignore:
+            before -= 1
+        after = pos
+        if after < len(shifts) and shifts[after] == ignore:
+            after += 1
+        if before >= 0 and day - shifts[before] < min_gap:
+            return False
+        if after < len(shifts) and shifts[after] - day < min_gap:
+            return False
+        return True
+
+    def assign(self, name: str, day: int):
+        self.assignment[day] = name
+        insort(self.shifts[name], day)
+        if self.is_weekend[day]:
+            self.weekend_counts[name] += 1
+        if self.is_holiday[day]:
+            self.holiday_counts[name] += 1
+
+    def unassign(self, day: int):
+        name = self.assignment[day]
+        self.assignment[day] = None
+        shifts = self.shifts[name]
+        shifts.pop(bisect_left(shifts, day))
+        if self.is_weekend[day]:
+            self.weekend_counts[name] -= 1
+        if self.is_holiday[day]:
+            self.holiday_counts[name] -= 1
+
+    def can_take(self, name: str, day: int, ignore: Optional[int] = None) -> bool:
+        return self.available(name, day) and self.gap_ok(name, day, ignore)
+
+
+def _greedy_construct(state: _SolverState) -> int:
+    """贪心构造：每天选当前负担最轻的可用人员，返回违反最小间隔的天数"""
+    violations = 0
+    for day in range(len(state.dates)):
+        weekend = state.is_weekend[day]
+
+        def load(name):
+            # 周末/节假日优先平衡周末次数，其余按总次数，再按距上次值班最久优先
+            last = state.shifts[name][-1] if state.shifts[name] else -len(state.dates)
+            weekend_load = state.weekend_counts[name] if weekend else 0
+            return weekend_load, len(state.shifts[name]), last
+
+        candidates = [name for name in state.names if state.can_take(name, day)]
+        if not candidates:
+            # 无人满足最小间隔时放宽间隔，选距上次值班最久的可用人员
+            candidates = [name for name in state.names if state.available(name, day)]
+            if not candidates:
+                continue
+            violations += 1
+            candidates.sort(key=lambda name: state.shifts[name][-1] if state.shifts[name] else -1)
+            state.assign(candidates[0], day)
+            continue
+
+        state.assign(min(candidates, key=load), day)
+    return violations
+
+
+def _spread(counts: Dict[str, int], names: Iterable[str]):
+    """返回 (最多者, 最少者, 差值)"""
+    names = list(names)
+    if not names:
+        return None, None, 0
+    most = max(names, key=lambda name: counts[name])
+    least = min(names, key=lambda name: counts[name])
+    return most, least, counts[most] - counts[least]
+
+
+def _repair(state: _SolverState):
+    """局部搜索修复：缩小总次数和周末次数的差距"""
+    weekend_names = [name for name in state.names if name not in state.constraints.no_weekend]
+
+    for _ in range(MAX_REPAIR_ITERATIONS):
+        totals = {name: len(state.shifts[name]) for name in state.names}
+        improved = False
+
+        # 1. 总次数：把最多者的一个班次转移给最少者
+        most, least, spread = _spread(totals, state.names)
+        if spread > 1:
+            for day in state.shifts[most]:
+                if state.can_take(least, day):
+                    # 周末班次转移时不能让周末差距变大
+                    if state.is_weekend[day] and \
+                            state.weekend_counts[least] + 1 > state.weekend_counts[most]:
+                        continue
+                    state.unassign(day)
+                    state.assign(least, day)
+                    improved = True
+                    break
+            if improved:
+                continue
+
+        # 2. 周末次数：最多者的一个周末班次与最少者的一个工作日班次交换
+        most, least, spread = _spread(state.weekend_counts, weekend_names)
+        if spread > 1:
+            weekend_days = [day for day in state.shifts[most] if state.is_weekend[day]]
+            weekday_days = [day for day in state.shifts[least] if not state.is_weekend[day]]
+            for weekend_day in weekend_days:
+                if not state.available(least, weekend_day):
+                    continue
+                for weekday_day in weekday_days:
+                    if not state.available(most, weekday_day):
+                        continue
+                    if state.gap_ok(least, weekend_day, ignore=weekday_day) and \
+                            state.gap_ok(most, weekday_day, ignore=weekend_day):
+                        state.unassign(weekend_day)
+                        state.unassign(weekday_day)
+                        state.assign(least, weekend_day)
+                        state.assign(most, weekday_day)
+                        improved = True
+                        break
+                if improved:
+                    break
+
+        if not improved:
+            return
+
+
+def check_schedule_constraints(schedule_df: pd.DataFrame, constraints: ScheduleConstraints) -> List[str]:
+    """检查值班计划是否满足约束，返回违反约束的说明列表"""
+    problems = []
+    last_seen: Dict[str, datetime] = {}
+    for date_str, name in zip(schedule_df["日期"], schedule_df["姓名"]):
+        current = datetime.strptime(date_str, "%Y-%m-%d")
+        if date_str in constraints.leave.get(name, ()):
+            problems.append(f"{date_str} {name} 请假期间被安排值班")
+        if name in constraints.no_weekend and (current.weekday() >= 5 or date_str in constraints.holidays):
+            problems.append(f"{date_str} {name} 不排周末却被安排值班")
+        if name in last_seen and (current - last_seen[name]).days < constraints.min_gap:
+            problems.append(f"{date_str} {name} 距上次值班不足{constraints.min_gap}天")
+        last_seen[name] = current
+    return problems
+
+
+def solve_duty_schedule(days: int, start_date_str: Optional[str] = None,
+                        constraints: Optional[ScheduleConstraints] = None,
+                        names: Optional[List[str]] = None):
+    """
+    生成满足约束且均衡的值班计划
+
+    参数:
+        days: 排班天数
+        start_date_str: 起始日期字符串（格式"YYYY-MM-DD"，默认=今天）
+        constraints: 排班约束（默认只要求最小间隔）
+        names: 参与排班的人员（默认使用配置中的值班人员）
+    返回:
+        包含日期、周几、姓名的DataFrame（与 generate_duty_schedule 一致），或None（无法排班时）
+    """
+    constraints = constraints or ScheduleConstraints()
+    names = names or [person["name"] for person in duty_persons]
+    if not names:
+        print("错误：值班人员列表为空")
+        return None
+
+    if start_date_str is None:
+        start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
+
+    day_list = [start_date + timedelta(days=i) for i in range(days)]
+    dates = [d.strftime("%Y-%m-%d") for d in day_list]
+    weekday_index = [d.weekday() for d in day_list]
+
+    state = _SolverState(names, dates, weekday_index, constraints)
+    violations = _greedy_construct(state)
+    _repair(state)
+
+    if any(name is None for name in state.assignment):
+        unassigned = [dates[i] for i, name in enumerate(state.assignment) if name is None]
+        print(f"错误：以下日期所有人员都不可值班，无法排班：{'、'.join(unassigned)}")
+        return None
+
+    if violations:
+        print(f"警告：人数不足，有{violations}天无法满足最小间隔{constraints.min_gap}天")
+
+    return pd.DataFrame({
+        "日期": dates,
+        "周几": [WEEKDAY_NAMES_CN[i] for i in weekday_index],
+        "姓名": state.assignment,
+    })
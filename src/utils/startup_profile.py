@@ -0,0 +1,124 @@
+"""
+启动性能分析模块
+记录启动阶段各模块的导入耗时（类似 python -X importtime 的输出）以及首个请求到达的时间
+
+注意：本模块只依赖标准库，必须在其他业务模块之前导入，才能统计到完整的导入耗时
+"""
+
+import builtins
+import importlib.util
+import os
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# 模块首次导入的时间点，作为启动计时的起点
+_boot_time = time.perf_counter()
+
+_original_import = builtins.__import__
+_lock = threading.Lock()
+
+# 导入记录: (模块名, 自身耗时微秒, 累计耗时微秒, 嵌套深度)
+_import_records: List[Tuple[str, int, int, int]] = []
+# 导入调用栈，每项为 [模块名, 开始时间, 子模块累计耗时]
+_import_stack: List[list] = []
+_profiling = False
+
+# 启动阶段标记: (阶段名, 距启动的秒数)
+_marks: List[Tuple[str, float]] = []
+_first_request_at: Optional[float] = None
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """替换内置 __import__，仅对首次导入的模块计时"""
+    if not _profiling or threading.current_thread() is not threading.main_thread():
+        return _original_import(name, globals, locals, fromlist, level)
+
+    full_name = name
+    if level:
+        try:
+            package = (globals or {}).get('__package__') or ''
+            full_name = importlib.util.resolve_name('.' * level + name, package)
+        except (ImportError, ValueError):
+            full_name = name
+
+    if full_name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    frame = [full_name, time.perf_counter(), 0.0]
+    _import_stack.append(frame)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_stack.pop()
+        cumulative = time.perf_counter() - frame[1]
+        if _import_stack:
+            _import_stack[-1][2] += cumulative
+        _import_records.append((
+            full_name,
+            int((cumulative - frame[2]) * 1_000_000),
+            int(cumulative * 1_000_000),
+            len(_import_stack),
+        ))
+
+
+def start_import_profiling():
+    """开始统计模块导入耗时"""
+    global _profiling
+    with _lock:
+        if _profiling:
+            return
+        _profiling = True
+        builtins.__import__ = _timed_import
+
+
+def stop_import_profiling():
+    """停止统计模块导入耗时并恢复内置 __import__"""
+    global _profiling
+    with _lock:
+        if not _profiling:
+            return
+        _profiling = False
+        if builtins.__import__ is _timed_import:
+            builtins.__import__ = _original_import
+
+
+def mark(label: str) -> float:
+    """记录一个启动阶段，返回距启动的秒数"""
+    elapsed = time.perf_counter() - _boot_time
+    _marks.append((label, elapsed))
+    return elapsed
+
+
+def mark_first_request() -> Optional[float]:
+    """记录首个请求到达的时间，仅第一次调用时返回距启动的秒数，之后返回None"""
+    global _first_request_at
+    if _first_request_at is not None:
+        return None
+    with _lock:
+        if _first_request_at is not None:
+            return None
+        _first_request_at = time.perf_counter() - _boot_time
+        return _first_request_at
+
+
+def get_import_records(top_n: Optional[int] = None) -> List[Tuple[str, int, int, int]]:
+    """按累计耗时降序返回导入记录"""
+    records = sorted(_import_records, key=lambda r: r[2], reverse=True)
+    return records[:top_n] if top_n else records
+
+
+def log_startup_report(logger, top_n: int = 15):
+    """输出启动性能报告：各阶段耗时与最慢的模块导入"""
+    logger.info(f"⏱️ [进程{os.getpid()}] 启动性能报告（距启动 {time.perf_counter() - _boot_time:.3f}秒）")
+    for label, elapsed in _marks:
+        logger.info(f"  阶段 {label}: {elapsed:.3f}秒")
+
+    records = get_import_records(top_n)
+    if records:
+        total_us = sum(r[2] for r in _import_records if r[3] == 0)
+        logger.info(f"  模块导入总耗时: {total_us / 1_000_000:.3f}秒，最慢的{len(records)}个模块:")
+        logger.info("  import time: self [us] | cumulative | imported package")
+        for name, self_us, cumulative_us, depth in records:
+            logger.info(f"  import time: {self_us:>9} | {cumulative_us:>10} | {'  ' * depth}{name}")
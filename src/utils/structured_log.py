@@ -0,0 +1,139 @@
+"""
+结构化日志
+- log_event(logger, level, event, **fields)：按「事件名 + 字段」记录日志，级别未开启时直接返回；
+  消息文本和JSON都在处理器真正输出记录时才生成
+- LazyJSON：作为 %s 参数传入普通日志调用，输出时才执行 json.dumps
+- JsonLinesFormatter：每条记录一行JSON，字段顺序固定（ts, level, logger 在最前），日志索引可直接解析
+- 超长字段按 LOG_CONFIG['max_field_length'] 截断；LOG_CONFIG['sample_every'] 中的事件每N条只记录1条
+"""
+
+import itertools
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from config.settings import LOG_CONFIG
+
+TRUNCATED_MARK = '...(截断，共{}字符)'
+
+
+def truncate(text: str, max_length: Optional[int] = None) -> str:
+    """截断超长文本并注明原始长度；max_length 为 0 或 None 时使用配置，配置为 0 表示不截断"""
+    max_length = max_length or LOG_CONFIG.get('max_field_length', 0)
+    if max_length and len(text) > max_length:
+        return text[:max_length] + TRUNCATED_MARK.format(len(text))
+    return text
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(',', ':'))
+
+
+def _field_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return _dumps(value)
+    return str(value)
+
+
+class LazyJSON:
+    """延迟序列化的JSON参数：logger.debug("数据: %s", LazyJSON(data))，级别未开启时不序列化"""
+
+    __slots__ = ('value', 'max_length')
+
+    def __init__(self, value: Any, max_length: Optional[int] = None):
+        self.value = value
+        self.max_length = max_length
+
+    def __str__(self) -> str:
+        return truncate(_dumps(self.value), self.max_length)
+
+
+class EventMessage:
+    """结构化事件的消息对象，str() 时才渲染为「事件名 key=value ...」"""
+
+    __slots__ = ('event', 'fields')
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        if not self.fields:
+            return self.event
+        parts = [f"{key}={truncate(_field_text(value))}" for key, value in self.fields.items()]
+        return f"{self.event} {' '.join(parts)}"
+
+
+class _Sampler:
+    """按事件名计数，每N条放行1条（第1条总是放行）"""
+
+    def __init__(self):
+        self._counters: Dict[str, "itertools.count"] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, event: str) -> bool:
+        every = LOG_CONFIG.get('sample_every', {}).get(event, 1)
+        if every <= 1:
+            return True
+        counter = self._counters.get(event)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(event, itertools.count())
+        # itertools.count 的 next() 在 CPython 中是原子的
+        return next(counter) % every == 0
+
+
+_sampler = _Sampler()
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """
+    记录结构化事件
+
+    参数:
+        logger: 日志器
+        level: 日志级别，如 logging.INFO
+        event: 事件名，如 'dingtalk.webhook.payload'
+        fields: 事件字段，输出时渲染（超长的值会被截断）
+    """
+    if not logger.isEnabledFor(level) or not _sampler.allow(event):
+        return
+    logger.log(level, '%s', EventMessage(event, fields), extra={'event': event, 'fields': fields},
+               stacklevel=2)
+
+
+def _json_field(value: Any) -> Any:
+    """JSON输出中的字段值：未超长的保持原始结构，超长的转为截断后的文本"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = _field_text(value)
+    truncated = truncate(text)
+    if truncated is text and isinstance(value, (dict, list, tuple)):
+        return value
+    return truncated
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """JSON Lines 格式化器（用于日志文件），ts/level/logger 固定在最前，便于日志索引按行解析"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        event = getattr(record, 'event', None)
+        if event is not None:
+            entry["event"] = event
+            entry["fields"] = {key: _json_field(value) for key, value in record.fields.items()}
+        else:
+            entry["message"] = truncate(record.getMessage())
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return _dumps(entry)
@@ -0,0 +1,124 @@
+"""
+哈希时间轮
+将定时任务按到期 tick 散列到固定数量的槽位中，添加和取消都是 O(1)，
+每个 tick 只处理当前槽位，适合大量、大多会被取消的超时任务（如未确认通知的升级）
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.utils.logger import get_logger
+
+# 获取日志器
+logger = get_logger('timer_wheel')
+
+
+class TimerHandle:
+    """定时任务句柄，可用于取消"""
+
+    __slots__ = ('callback', 'args', 'slot', 'rounds', 'cancelled', '_wheel')
+
+    def __init__(self, wheel: "HashedTimerWheel", callback: Callable, args: tuple, slot: int, rounds: int):
+        self._wheel = wheel
+        self.callback = callback
+        self.args = args
+        self.slot = slot
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self) -> bool:
+        """取消任务，返回是否成功取消（已执行或已取消返回False）"""
+        return self._wheel.cancel(self)
+
+
+class HashedTimerWheel:
+    """
+    哈希时间轮
+
+    参数:
+        tick: 每个刻度的秒数（定时精度）
+        slots: 槽位数量；超过 tick * slots 秒的任务记录剩余圈数
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self.slots = slots
+        # 每个槽位用字典保存任务，取消时 O(1) 删除
+        self._wheel: List[Dict[TimerHandle, None]] = [{} for _ in range(slots)]
+        self._cursor = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def schedule(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒后执行 callback(*args)，至少延迟一个刻度"""
+        ticks = max(1, int(math.ceil(delay / self.tick)))
+        with self._lock:
+            slot = (self._cursor + ticks) % self.slots
+            handle = TimerHandle(self, callback, args, slot, (ticks - 1) // self.slots)
+            self._wheel[slot][handle] = None
+            self._pending += 1
+        return handle
+
+    def cancel(self, handle: TimerHandle) -> bool:
+        with self._lock:
+            if handle.cancelled or handle not in self._wheel[handle.slot]:
+                return False
+            del self._wheel[handle.slot][handle]
+            handle.cancelled = True
+            self._pending -= 1
+            return True
+
+    def advance(self, ticks: int = 1) -> int:
+        """推进时间轮 ticks 个刻度并执行到期任务，返回执行的任务数"""
+        fired = 0
+        for _ in range(ticks):
+            expired = []
+            with self._lock:
+                self._cursor = (self._cursor + 1) % self.slots
+                bucket = self._wheel[self._cursor]
+                for handle in list(bucket):
+                    if handle.rounds > 0:
+                        handle.rounds -= 1
+                    else:
+                        del bucket[handle]
+                        expired.append(handle)
+                self._pending -= len(expired)
+
+            # 在锁外执行回调，回调中可以再次添加或取消任务
+            for handle in expired:
+                fired += 1
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error(f"定时任务执行异常: {getattr(handle.callback, '__name__', handle.callback)}，{str(e)}")
+        return fired
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while not self._stop.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            # 落后时一次追赶多个刻度，保证到期时间不漂移
+            behind = int((time.monotonic() - next_tick) // self.tick) + 1
+            self.advance(behind)
+            next_tick += behind * self.tick
+
+    def start(self):
+        """启动后台推进线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='timer-wheel', daemon=True)
+            self._thread.start()
+        logger.info(f"时间轮已启动：刻度 {self.tick}秒，槽位 {self.slots}")
+
+    def stop(self):
+        self._stop.set()
+
+    def __len__(self):
+        return self._pending
@@ -0,0 +1,230 @@
+"""
+批量值班计划分析工具
+并行分析多个历史值班计划文件（xlsx/xls/csv），合并为一份汇总报告（JSON/CSV）
+
+每个文件的分析结果按「文件内容哈希 + 分析参数」缓存，重复运行时只分析有变化的文件
+
+用法（在项目根目录下执行）:
+    python -m tools.batch_analyzer ./history/ "./plans/**/*.xlsx" -o report.json
+    python -m tools.batch_analyzer ./history/ -o report.csv --workers 4 --holidays 2025-10-01 2025-10-02
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = './.analysis_cache'
+
+# CSV 每次读取的行数
+DEFAULT_CHUNKSIZE = 50000
+
+# 缓存格式版本，分析逻辑变化时递增以使旧缓存失效
+CACHE_VERSION = 1
+
+
+def collect_files(inputs: List[str]) -> List[str]:
+    """展开输入的文件、目录和通配符，返回去重后的文件列表"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in names
+                             if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith('~$'))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            files.extend(path for path in glob.glob(item, recursive=True)
+                         if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS))
+    return sorted(set(os.path.abspath(path) for path in files))
+
+
+def file_digest(file_path: str, holidays: List[str], windows: List[int]) -> str:
+    """缓存键：文件内容与分析参数的 SHA-256"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"v": CACHE_VERSION, "holidays": sorted(holidays), "windows": windows}).encode())
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def analyze_file(file_path: str, holidays: List[str], windows: List[int],
+                 chunksize: int = DEFAULT_CHUNKSIZE) -> Dict:
+    """分析单个文件（在子进程中执行），CSV按块流式读取"""
+    import pandas as pd
+    from src.utils.schedule_analytics import ScheduleAnalytics, analyze_schedule
+
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext == '.csv':
+        analytics = ScheduleAnalytics(holidays, windows)
+        try:
+            for chunk in pd.read_csv(file_path, usecols=["日期", "姓名"], chunksize=chunksize):
+                analytics.append(chunk)
+        except ValueError:
+            # 文件内日期未按顺序排列时，退回整体读取后排序分析
+            analytics = analyze_schedule(pd.read_csv(file_path, usecols=["日期", "姓名"]), holidays, windows)
+    else:
+        analytics = analyze_schedule(pd.read_excel(file_path, usecols=["日期", "姓名"]), holidays, windows)
+    return analytics.summary()
+
+
+def _analyze_task(file_path: str, digest: str, holidays: List[str], windows: List[int], chunksize: int) -> Dict:
+    """子进程任务：返回带文件信息的分析结果，失败时返回错误信息"""
+    try:
+        summary = analyze_file(file_path, holidays, windows, chunksize)
+        return {"file": file_path, "sha256": digest, "summary": summary}
+    except Exception as e:
+        return {"file": file_path, "sha256": digest, "error": str(e)}
+
+
+def _load_cache(cache_dir: str, digest: str) -> Optional[Dict]:
+    cache_file = os.path.join(cache_dir, f"{digest}.json")
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache(cache_dir: str, digest: str, summary: Dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"{digest}.json")
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    os.replace(tmp_file, cache_file)
+
+
+def merge_summaries(summaries: List[Dict]) -> Dict:
+    """合并多个文件的分析结果：次数类指标相加，最小间隔取最小，平均间隔按间隔次数加权"""
+    persons: Dict[str, Dict] = {}
+    total_days = 0
+    for summary in summaries:
+        total_days += summary["total_days"]
+        for name, stats in summary["persons"].items():
+            merged = persons.setdefault(name, {"间隔总天数": 0.0})
+            for key, value in stats.items():
+                if key in ("占比", "平均间隔") or key.startswith("近"):
+                    continue
+                if key == "最小间隔":
+                    if value is not None:
+                        current = merged.get(key)
+                        merged[key] = value if current is None else min(current, value)
+                    else:
+                        merged.setdefault(key, None)
+                else:
+                    merged[key] = merged.get(key, 0) + (value or 0)
+            if stats.get("平均间隔") is not None:
+                merged["间隔总天数"] += stats["平均间隔"] * stats.get("间隔次数", 0)
+
+    for stats in persons.values():
+        gap_total = stats.pop("间隔总天数")
+        stats["占比"] = stats.get("次数", 0) / total_days if total_days else 0.0
+        stats["平均间隔"] = gap_total / stats["间隔次数"] if stats.get("间隔次数") else None
+
+    counts = [stats.get("次数", 0) for stats in persons.values()]
+    avg = sum(counts) / len(counts) if counts else 0
+    return {
+        "files": len(summaries),
+        "total_days": total_days,
+        "unique_persons": len(persons),
+        "balance_score": 1 - (max(counts) - min(counts)) / avg if avg else 0.0,
+        "persons": persons,
+    }
+
+
+def write_report(report: Dict, output_path: str):
+    """按扩展名写出报告：.json 为完整报告，.csv 为 文件×人员 的明细表（汇总行的文件列为 ALL）"""
+    if output_path.lower().endswith('.csv'):
+        rows = []
+        for item in report["results"]:
+            for name, stats in item.get("summary", {}).get("persons", {}).items():
+                rows.append({"文件": item["file"], "姓名": name, **stats})
+        for name, stats in report["combined"]["persons"].items():
+            rows.append({"文件": "ALL", "姓名": name, **stats})
+
+        fieldnames = []
+        for row in rows:
+            fieldnames.extend(key for key in row if key not in fieldnames)
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def run_batch(inputs: List[str], workers: Optional[int] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+              holidays: Optional[List[str]] = None, windows: Optional[List[int]] = None,
+              chunksize: int = DEFAULT_CHUNKSIZE) -> Dict:
+    """批量分析并返回汇总报告"""
+    holidays = holidays or []
+    windows = windows or [30, 90]
+    files = collect_files(inputs)
+    print(f"共找到{len(files)}个值班计划文件")
+
+    results = []
+    pending = []
+    for file_path in files:
+        digest = file_digest(file_path, holidays, windows)
+        cached = _load_cache(cache_dir, digest) if cache_dir else None
+        if cached is not None:
+            results.append({"file": file_path, "sha256": digest, "summary": cached, "cached": True})
+        else:
+            pending.append((file_path, digest))
+    print(f"命中缓存{len(results)}个，需要分析{len(pending)}个")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_analyze_task, path, digest, holidays, windows, chunksize)
+                       for path, digest in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                if "error" in result:
+                    print(f"分析失败: {result['file']} - {result['error']}")
+                else:
+                    print(f"分析完成: {result['file']}")
+                    if cache_dir:
+                        _save_cache(cache_dir, result["sha256"], result["summary"])
+                results.append(result)
+
+    results.sort(key=lambda item: item["file"])
+    succeeded = [item["summary"] for item in results if "summary" in item]
+    return {"results": results, "combined": merge_summaries(succeeded)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量分析值班计划文件的均衡性")
+    parser.add_argument('inputs', nargs='+', help="文件、目录或通配符（支持 **）")
+    parser.add_argument('-o', '--output', default='batch_report.json', help="报告路径（.json 或 .csv）")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="并行进程数（默认CPU核数）")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="结果缓存目录，传空字符串禁用缓存")
+    parser.add_argument('--holidays', nargs='*', default=[], help="节假日日期（YYYY-MM-DD）")
+    parser.add_argument('--windows', nargs='*', type=int, default=[30, 90], help="滚动均衡度窗口天数")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="CSV每块读取的行数")
+    args = parser.parse_args(argv)
+
+    report = run_batch(args.inputs, args.workers, args.cache_dir, args.holidays, args.windows, args.chunksize)
+    write_report(report, args.output)
+
+    combined = report["combined"]
+    print(f"汇总: {combined['files']}个文件，{combined['total_days']}天，{combined['unique_persons']}人，"
+          f"均衡度 {combined['balance_score']:.2f}")
+    print(f"报告已保存: {args.output}")
+    return 0 if all("summary" in item for item in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+本地钉钉机器人桩服务
+接收机器人Webhook消息（POST /robot/send?access_token=...）并记录，不真正发送；
+可按比例返回限流错误（130101）或增加响应延迟，用于模拟测试和联调
+
+同时提供通讯录接口（GET /gettoken、POST /topapi/v2/department/listsubid、POST /topapi/v2/user/list），
+返回 --directory 指定的部门和成员，用于联调通讯录缓存
+
+用法（在项目根目录下执行）:
+    python -m tools.dingtalk_stub --port 18999
+    python -m tools.dingtalk_stub --port 18999 --fail-rate 0.1 --latency 0.2
+    python -m tools.dingtalk_stub --port 18999 --directory directory.json
+
+然后把团队的 webhook 配置为 http://127.0.0.1:18999/robot/send?access_token=<任意标识>，
+DINGTALK_DIRECTORY_CONFIG['api_base'] 配置为 http://127.0.0.1:18999
+
+通讯录文件格式: {"departments": {"1": [2, 3]}, "users": [{"userid": "u1", "name": "张三", "mobile": "138...", "dept_id": 2}]}
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class DingTalkStub:
+    """
+    钉钉机器人桩服务（后台线程运行）
+
+    参数:
+        host, port: 监听地址，port 为 0 时自动分配
+        fail_rate: 返回限流错误（errcode 130101）的比例
+        latency: 每次响应前等待的秒数
+        seed: 随机数种子（fail_rate 大于0时使结果可复现）
+        departments: 通讯录部门树 {部门ID: [子部门ID]}
+        users: 通讯录成员 [{"userid", "name", "mobile", "dept_id"}]，dept_id 缺省为根部门1
+    """
+
+    # 通讯录接口签发的访问令牌
+    ACCESS_TOKEN = 'stub-access-token'
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, fail_rate: float = 0.0,
+                 latency: float = 0.0, seed: Optional[int] = None,
+                 departments: Optional[Dict[int, List[int]]] = None, users: Optional[List[dict]] = None):
+        self.fail_rate = fail_rate
+        self.latency = latency
+        self.messages: List[dict] = []
+        self.failures = 0
+        self.departments = departments or {}
+        self.users = users or []
+        # 通讯录接口调用次数：路径 -> 次数
+        self.api_calls: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._drained = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def api_base(self) -> str:
+        """通讯录接口地址，对应 DINGTALK_DIRECTORY_CONFIG['api_base']"""
+        return f"http://{self._server.server_address[0]}:{self.port}"
+
+    def webhook_url(self, token: str) -> str:
+        """指向桩服务的机器人Webhook地址，token 用于区分不同的群"""
+        host = self._server.server_address[0]
+        return f"http://{host}:{self.port}/robot/send?access_token={token}"
+
+    def start(self) -> "DingTalkStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name='dingtalk-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def drain(self) -> List[dict]:
+        """返回上次调用以来收到的消息"""
+        with self._lock:
+            messages = self.messages[self._drained:]
+            self._drained = len(self.messages)
+        return messages
+
+    def _record(self, token: str, body: dict) -> dict:
+        """记录一条消息，返回钉钉格式的响应"""
+        with self._lock:
+            if self.fail_rate and self._random.random() < self.fail_rate:
+                self.failures += 1
+                return {"errcode": 130101, "errmsg": "send too fast"}
+            msgtype = body.get("msgtype", "")
+            self.messages.append({
+                "token": token,
+                "msgtype": msgtype,
+                "content": body.get(msgtype, {}).get("content") or body.get(msgtype, {}).get("text", ""),
+                "at": body.get("at", {}),
+                "received_at": time.time(),
+            })
+        return {"errcode": 0, "errmsg": "ok"}
+
+    def _directory_api(self, path: str, access_token: str, body: dict) -> dict:
+        """通讯录接口，返回钉钉格式的响应"""
+        with self._lock:
+            self.api_calls[path] = self.api_calls.get(path, 0) + 1
+        if path == '/gettoken':
+            return {"errcode": 0, "errmsg": "ok", "access_token": self.ACCESS_TOKEN, "expires_in": 7200}
+        if access_token != self.ACCESS_TOKEN:
+            return {"errcode": 40014, "errmsg": "不合法的access_token"}
+        dept_id = int(body.get('dept_id', 1))
+        if path == '/topapi/v2/department/listsubid':
+            return {"errcode": 0, "errmsg": "ok", "result": {"dept_id_list": self.departments.get(dept_id, [])}}
+        # 成员列表：按 cursor 分页
+        members = [user for user in self.users if int(user.get('dept_id', 1)) == dept_id]
+        cursor = int(body.get('cursor', 0))
+        size = int(body.get('size', 100))
+        page = [{key: value for key, value in user.items() if key != 'dept_id'}
+                for user in members[cursor:cursor + size]]
+        has_more = cursor + size < len(members)
+        result = {"has_more": has_more, "list": page}
+        if has_more:
+            result["next_cursor"] = cursor + size
+        return {"errcode": 0, "errmsg": "ok", "result": result}
+
+    def _handler_class(self):
+        stub = self
+
+        directory_paths = ('/topapi/v2/department/listsubid', '/topapi/v2/user/list')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != '/gettoken':
+                    self._reply(404, {"errcode": 404, "errmsg": "not found"})
+                    return
+                self._reply(200, stub._directory_api(url.path, '', {}))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != '/robot/send' and url.path not in directory_paths:
+                    self._reply(404, {"errcode": 404, "errmsg": "not found"})
+                    return
+                token = parse_qs(url.query).get('access_token', [''])[0]
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._reply(400, {"errcode": 40035, "errmsg": "invalid json"})
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if url.path in directory_paths:
+                    self._reply(200, stub._directory_api(url.path, token, body))
+                else:
+                    self._reply(200, stub._record(token, body))
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="本地钉钉机器人桩服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=18999, help="监听端口")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="返回限流错误的比例（0~1）")
+    parser.add_argument('--latency', type=float, default=0.0, help="响应延迟（秒）")
+    parser.add_argument('--seed', type=int, help="随机数种子")
+    parser.add_argument('--directory', help="通讯录JSON文件（部门树和成员）")
+    args = parser.parse_args(argv)
+
+    departments, users = {}, []
+    if args.directory:
+        with open(args.directory, encoding='utf-8') as f:
+            data = json.load(f)
+        departments = {int(dept_id): children for dept_id, children in data.get('departments', {}).items()}
+        users = data.get('users', [])
+
+    stub = DingTalkStub(args.host, args.port, args.fail_rate, args.latency, args.seed,
+                        departments=departments, users=users).start()
+    print(f"钉钉桩服务已启动: {stub.webhook_url('<token>')}")
+    if args.directory:
+        print(f"通讯录接口: {stub.api_base}（{len(users)} 人）")
+    try:
+        while True:
+            time.sleep(0.5)
+            for message in stub.drain():
+                print(f"[{message['token']}] {message['content']}")
+    except KeyboardInterrupt:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -31,35 +31,30 @@ def analyze_name_weekdays_dates(file_path):
                 print(f"表格中未找到'{col}'列，请检查表格结构")
                 return None
 
-        # 初始化结果字典
-        result = {}
-
         # 周几的排序顺序
         weekday_order = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
 
-        # 遍历数据行
-        for _, row in df.iterrows():
-            name = row["姓名"]
-            weekday = str(row["周几"])
-            date = str(row["日期"])
-
-            # 跳过空值
-            if pd.isna(name) or pd.isna(weekday) or pd.isna(date):
-                continue
-
-            # 确保姓名在结果中存在
-            if name not in result:
-                result[name] = {
-                    "count": 0,
-                    "weekdays": {}  # 格式: {"周一": {"dates": set(), "order": 0}, ...}
-                }
-                # 初始化所有周几的条目
-                for idx, wd in enumerate(weekday_order):
-                    result[name]["weekdays"][wd] = {"dates": set(), "order": idx}
-
-            # 更新计数和日期信息
-            result[name]["count"] += 1
-            result[name]["weekdays"][weekday]["dates"].add(date)
+        # 跳过空值，统一转为字符串
+        df = df[required_columns].dropna()
+        df = df.assign(周几=df["周几"].astype(str), 日期=df["日期"].astype(str))
+
+        # 向量化统计：每人次数，以及每人每个周几对应的日期集合
+        counts = df.groupby("姓名").size()
+        dates_by_weekday = df.groupby(["姓名", "周几"])["日期"].agg(set)
+
+        # 初始化结果字典（格式: {"周一": {"dates": set(), "order": 0}, ...}）
+        result = {
+            name: {
+                "count": int(count),
+                "weekdays": {wd: {"dates": set(), "order": idx} for idx, wd in enumerate(weekday_order)}
+            }
+            for name, count in counts.items()
+        }
+        for (name, weekday), dates in dates_by_weekday.items():
+            weekdays = result[name]["weekdays"]
+            if weekday not in weekdays:
+                weekdays[weekday] = {"dates": set(), "order": len(weekdays)}
+            weekdays[weekday]["dates"] = dates
 
         return result
 
@@ -0,0 +1,64 @@
+"""
+日志查询工具
+按 时间范围 / 级别 / 日志器 / 关键字 查询所有日志文件（含已压缩的归档）。
+归档带有块索引时只读取命中的块，不需要逐个解压扫描
+
+用法（在项目根目录下执行）:
+    python -m tools.log_search --from "2025-10-12 08" --to "2025-10-12 09" --logger oncall.app
+    python -m tools.log_search --from 2025-10-12 --level ERROR --grep 综合通知
+    python -m tools.log_search --error-log --from 2025-10-01 --to 2025-10-31 --limit 50
+    python -m tools.log_search --reindex
+"""
+
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from config.settings import LOG_CONFIG
+    from src.utils.log_index import (COMPRESSION_SUFFIXES, LEVELS, LogIndex, archive_with_index,
+                                     log_files, normalize_hour, search_logs)
+
+    parser = argparse.ArgumentParser(description="按时间、级别、日志器查询OnCall日志（含压缩归档）")
+    parser.add_argument('--log-dir', default=LOG_CONFIG['log_dir'], help="日志目录")
+    parser.add_argument('--error-log', action='store_true', help="查询错误日志（默认查询主日志）")
+    parser.add_argument('--from', dest='start', help="起始时间（YYYY-MM-DD 或 YYYY-MM-DD HH）")
+    parser.add_argument('--to', dest='end', help="结束时间（YYYY-MM-DD 或 YYYY-MM-DD HH，含）")
+    parser.add_argument('--level', choices=list(LEVELS), help="最低日志级别")
+    parser.add_argument('--logger', help="日志器名称前缀，如 oncall.app")
+    parser.add_argument('--grep', help="日志内容包含的关键字")
+    parser.add_argument('--limit', type=int, default=0, help="最多输出的条数（0 表示不限制）")
+    parser.add_argument('--reindex', action='store_true',
+                        help="为没有索引的未压缩归档建立索引（不改动压缩归档和当前日志文件）")
+    args = parser.parse_args(argv)
+
+    file_name = LOG_CONFIG['error_log_file'] if args.error_log else LOG_CONFIG['log_file']
+    base_filename = os.path.abspath(os.path.join(args.log_dir, file_name))
+
+    if args.reindex:
+        for path in log_files(base_filename):
+            if path == base_filename or path.endswith(tuple(COMPRESSION_SUFFIXES.values())):
+                continue
+            if LogIndex.load(path) is None:
+                archive_with_index(path, None)
+                print(f"已建立索引: {path}")
+        return 0
+
+    try:
+        start = normalize_hour(args.start)
+        end = normalize_hour(args.end, end=True)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    records = search_logs(base_filename, start, end, args.level, args.logger, args.grep, args.limit or None)
+    for record in records:
+        print(record)
+    print(f"共 {len(records)} 条", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
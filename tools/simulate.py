@@ -0,0 +1,395 @@
+"""
+加速时间模拟工具
+用模拟时钟按分钟回放定时任务（与 run_scheduler 注册的任务相同）、群内值班查询和人员变动，
+几秒内跑完一年：值班计划到期时会按真实逻辑重新生成，钉钉消息全部发送到本地桩服务并记录
+
+输出：所有本应发送的消息、调度耗时统计、查询与通知的一致性，以及值班 / 禅道指派的公平性统计
+模拟使用值班计划表的临时副本，不会修改 data/ 下的文件
+
+用法（在项目根目录下执行）:
+    python -m tools.simulate --start 2026-01-01 --days 365
+    python -m tools.simulate --days 90 --roster-change 2026-02-01:-魏来 --roster-change 2026-03-01:+新同事
+    python -m tools.simulate --days 30 --fail-rate 0.05 --show-messages --output sim_report.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from tools.dingtalk_stub import DingTalkStub
+
+# 每天模拟的群内查询时间范围（分钟）
+QUERY_WINDOW = (9 * 60, 18 * 60)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _parse_field(content: str, label: str) -> Optional[str]:
+    """从消息内容中取出「label：值」"""
+    for line in content.splitlines():
+        line = line.strip()
+        for prefix in (f"{label}：", f"🔧 {label}："):
+            if line.startswith(prefix):
+                return line[len(prefix):].strip()
+    return None
+
+
+def parse_roster_change(value: str) -> Tuple[str, str, str]:
+    """解析人员变动 YYYY-MM-DD:+姓名 / YYYY-MM-DD:-姓名"""
+    try:
+        date_str, change = value.split(':', 1)
+        datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"人员变动格式错误: {value}（应为 YYYY-MM-DD:+姓名 或 YYYY-MM-DD:-姓名）")
+    if len(change) < 2 or change[0] not in '+-':
+        raise argparse.ArgumentTypeError(f"人员变动格式错误: {value}（应为 YYYY-MM-DD:+姓名 或 YYYY-MM-DD:-姓名）")
+    return date_str, change[0], change[1:]
+
+
+def fairness(assignments: Dict[str, str]) -> dict:
+    """按日期 -> 人员 统计每人的次数和相邻两次之间的间隔天数"""
+    days_by_person: Dict[str, List[datetime]] = {}
+    for date_str, person in sorted(assignments.items()):
+        days_by_person.setdefault(person, []).append(datetime.strptime(date_str, '%Y-%m-%d'))
+
+    persons = {}
+    for person, days in days_by_person.items():
+        gaps = [(later - earlier).days for earlier, later in zip(days, days[1:])]
+        persons[person] = {
+            "count": len(days),
+            "min_gap": min(gaps) if gaps else None,
+            "max_gap": max(gaps) if gaps else None,
+        }
+    counts = [item["count"] for item in persons.values()]
+    return {
+        "days": len(assignments),
+        "persons": persons,
+        "min_count": min(counts) if counts else 0,
+        "max_count": max(counts) if counts else 0,
+        "stdev": round(statistics.pstdev(counts), 3) if counts else 0.0,
+    }
+
+
+class Simulation:
+    """
+    模拟运行
+
+    参数:
+        teams: 参与模拟的团队（会被修改为使用临时计划文件和桩服务Webhook）
+        start: 模拟开始时间
+        days: 模拟天数
+        stub: 钉钉桩服务
+        tick: 调度器每轮间隔（秒），与 run_scheduler 的轮询间隔一致
+        queries_per_day: 每个团队每天模拟的群内查询次数
+        roster_changes: [(日期, '+'/'-', 姓名)]
+        seed: 随机数种子
+    """
+
+    def __init__(self, teams, start: datetime, days: int, stub: DingTalkStub, workdir: str, tick: int = 60,
+                 queries_per_day: int = 3, roster_changes: Optional[List[Tuple[str, str, str]]] = None,
+                 seed: int = 0):
+        self.teams = teams
+        self.start = start
+        self.days = days
+        self.stub = stub
+        self.workdir = workdir
+        self.tick = tick
+        self.queries_per_day = queries_per_day
+        self.roster_changes = sorted(roster_changes or [])
+        self.random = random.Random(seed)
+
+        self.messages: List[dict] = []
+        self.dispatches: List[dict] = []
+        self.queries: List[dict] = []
+        self.roster_log: List[dict] = []
+
+    def _prepare_teams(self):
+        """团队改用计划表临时副本和桩服务Webhook，人员名单复制一份供人员变动修改"""
+        for team in self.teams:
+            plan_copy = os.path.join(self.workdir, f"{team.team_id}.xlsx")
+            shutil.copyfile(team.plan_file, plan_copy)
+            team.plan_file = plan_copy
+            team.webhook = self.stub.webhook_url(team.team_id)
+            team.duty_persons = [dict(person) for person in team.duty_persons]
+            team.bug_persons = [dict(person) for person in team.bug_persons]
+
+    def _collect(self, now: datetime, source: str):
+        """收集桩服务收到的消息，标记模拟时间"""
+        for message in self.stub.drain():
+            content = message["content"] or ""
+            kind = "plan_change" if "值班计划变更" in content else source
+            self.messages.append({
+                "time": now.strftime('%Y-%m-%d %H:%M'),
+                "team": message["token"],
+                "kind": kind,
+                "content": content,
+            })
+
+    def _apply_roster_change(self, date_str: str, op: str, name: str):
+        """人员变动：修改名单，并从变动当天起按新名单重写值班计划表，通知值班发生变化的人员"""
+        import pandas as pd
+        from src.services.duty_plan import WEEKDAY_NAMES, invalidate_duty_plan, replace_plan_file
+        from src.services.plan_diff import notify_plan_changes
+
+        for team in self.teams:
+            names = [person["name"] for person in team.duty_persons]
+            if op == '-':
+                team.duty_persons = [person for person in team.duty_persons if person["name"] != name]
+                team.bug_persons = [person for person in team.bug_persons if person["name"] != name]
+            elif name not in names:
+                next_id = max((person.get("id", 0) for person in team.duty_persons), default=0) + 1
+                team.duty_persons.append({"id": next_id, "name": name})
+            roster = [person["name"] for person in team.duty_persons]
+            if not roster:
+                continue
+
+            # 从前一天的值班人之后开始轮换，保持轮换顺序连续
+            plan = team.get_plan()
+            start = datetime.strptime(date_str, '%Y-%m-%d')
+            previous = plan.get_person((start - timedelta(days=1)).strftime('%Y-%m-%d'))
+            offset = roster.index(previous) + 1 if previous in roster else 0
+            rows = max(plan.row_count, len(roster))
+            dates = [start + timedelta(days=i) for i in range(rows)]
+            frame = pd.DataFrame({
+                "日期": [day.strftime('%Y-%m-%d') for day in dates],
+                "周几": [WEEKDAY_NAMES[day.weekday()] for day in dates],
+                "姓名": [roster[(offset + i) % len(roster)] for i in range(rows)],
+            })
+            replace_plan_file(team.plan_file, lambda path: frame.to_excel(path, index=False))
+            invalidate_duty_plan(team.plan_file)
+            notify_plan_changes(team, plan, team.get_plan(), "人员变动")
+            self.roster_log.append({"date": date_str, "team": team.team_id, "change": f"{op}{name}",
+                                    "roster": roster})
+
+    def _query(self, client, team, now: datetime):
+        """模拟群成员发送「值班」查询"""
+        sender = self.random.choice(team.duty_persons)["name"] if team.duty_persons else None
+        response = client.post(f"/api/dingtalk/webhook?team={team.team_id}", json={
+            "msgtype": "text",
+            "text": {"content": "值班"},
+            "senderNick": sender,
+        })
+        reply = (response.get_json() or {}).get("text", {}).get("content", "")
+        self.queries.append({
+            "time": now.strftime('%Y-%m-%d %H:%M'),
+            "date": now.strftime('%Y-%m-%d'),
+            "team": team.team_id,
+            "status": response.status_code,
+            "duty_person": _parse_field(reply, "值班人"),
+        })
+
+    def run(self, app, jobs, send_scheduled_notifications, clock):
+        self._prepare_teams()
+        client = app.test_client()
+        jobs_by_minute = {}
+        for at_time, teams in jobs:
+            hour, minute = at_time.split(':')
+            jobs_by_minute[int(hour) * 60 + int(minute)] = (at_time, teams)
+        pending_changes = list(self.roster_changes)
+
+        end = self.start + timedelta(days=self.days)
+        queries_today: Dict[int, list] = {}
+        current_day = None
+        while clock.now() < end:
+            now = clock.now()
+            if now.date() != current_day:
+                current_day = now.date()
+                date_str = current_day.strftime('%Y-%m-%d')
+                while pending_changes and pending_changes[0][0] <= date_str:
+                    self._apply_roster_change(*pending_changes.pop(0))
+                    self._collect(now, "roster")
+                queries_today = {}
+                for team in self.teams:
+                    for minute in self.random.sample(range(*QUERY_WINDOW), self.queries_per_day):
+                        queries_today.setdefault(minute, []).append(team)
+
+            minute_of_day = now.hour * 60 + now.minute
+            job = jobs_by_minute.get(minute_of_day)
+            if job is not None:
+                at_time, teams = job
+                started = time.perf_counter()
+                summary = send_scheduled_notifications(teams)
+                self.dispatches.append({
+                    "time": now.strftime('%Y-%m-%d %H:%M'),
+                    "elapsed": time.perf_counter() - started,
+                    "sent": summary["sent"],
+                    "failed": summary["failed"],
+                    "skipped": summary["skipped"],
+                    "waited": sum(result.get("waited", 0) for result in summary["results"]),
+                })
+                self._collect(now, "notification")
+            for team in queries_today.get(minute_of_day, ()):
+                self._query(client, team, now)
+                self._collect(now, "query")
+
+            clock.advance(self.tick)
+
+    def report(self, wall_time: float) -> dict:
+        """汇总模拟结果"""
+        duty_by_team: Dict[str, Dict[str, str]] = {}
+        bug_by_team: Dict[str, Dict[str, str]] = {}
+        for message in self.messages:
+            if message["kind"] != "notification":
+                continue
+            date_str = _parse_field(message["content"], "日期")
+            duty_person = _parse_field(message["content"], "值班人")
+            bug_person = _parse_field(message["content"], "禅道指派")
+            if date_str and duty_person:
+                duty_by_team.setdefault(message["team"], {}).setdefault(date_str, duty_person)
+            if date_str and bug_person:
+                bug_by_team.setdefault(message["team"], {}).setdefault(date_str, bug_person)
+
+        mismatches = [query for query in self.queries
+                      if query["duty_person"] != duty_by_team.get(query["team"], {}).get(query["date"])]
+        elapsed = [dispatch["elapsed"] for dispatch in self.dispatches]
+        kinds: Dict[str, int] = {}
+        for message in self.messages:
+            kinds[message["kind"]] = kinds.get(message["kind"], 0) + 1
+
+        return {
+            "start": self.start.strftime('%Y-%m-%d %H:%M'),
+            "days": self.days,
+            "wall_time": round(wall_time, 3),
+            "messages": {
+                "total": len(self.messages),
+                "by_kind": kinds,
+                "stub_rejected": self.stub.failures,
+            },
+            "dispatch": {
+                "runs": len(self.dispatches),
+                "sent": sum(dispatch["sent"] for dispatch in self.dispatches),
+                "failed": sum(dispatch["failed"] for dispatch in self.dispatches),
+                "skipped": sum(dispatch["skipped"] for dispatch in self.dispatches),
+                "rate_limit_waited": round(sum(dispatch["waited"] for dispatch in self.dispatches), 3),
+                "p50": round(_percentile(elapsed, 50), 4),
+                "p95": round(_percentile(elapsed, 95), 4),
+                "max": round(max(elapsed, default=0.0), 4),
+            },
+            "queries": {
+                "total": len(self.queries),
+                "errors": sum(1 for query in self.queries if query["status"] != 200),
+                "mismatches": len(mismatches),
+                "mismatch_samples": mismatches[:10],
+            },
+            "roster_changes": self.roster_log,
+            "fairness": {
+                team.team_id: {
+                    "duty": fairness(duty_by_team.get(team.team_id, {})),
+                    "bug": fairness(bug_by_team.get(team.team_id, {})),
+                    "missing_duty_days": self.days - len(duty_by_team.get(team.team_id, {})),
+                }
+                for team in self.teams
+            },
+            "message_log": self.messages,
+        }
+
+
+def print_report(report: dict, show_messages: bool = False):
+    if show_messages:
+        for message in report["message_log"]:
+            content = message["content"].replace("\n", " | ")
+            print(f"{message['time']} [{message['team']}] ({message['kind']}) {content}")
+        print()
+
+    print(f"模拟区间: {report['start']} 起 {report['days']} 天，实际耗时 {report['wall_time']}秒")
+    messages = report["messages"]
+    print(f"钉钉消息: 共 {messages['total']} 条 {messages['by_kind']}，桩服务模拟拒绝 {messages['stub_rejected']} 次")
+    dispatch = report["dispatch"]
+    print(f"定时分发: {dispatch['runs']} 次，成功 {dispatch['sent']}，失败 {dispatch['failed']}，"
+          f"跳过 {dispatch['skipped']}，限流等待 {dispatch['rate_limit_waited']}秒（模拟时间）")
+    print(f"分发耗时: p50 {dispatch['p50'] * 1000:.1f}ms，p95 {dispatch['p95'] * 1000:.1f}ms，"
+          f"最大 {dispatch['max'] * 1000:.1f}ms")
+    queries = report["queries"]
+    print(f"群内查询: {queries['total']} 次，错误 {queries['errors']}，与当天通知不一致 {queries['mismatches']}")
+    for change in report["roster_changes"]:
+        print(f"人员变动: {change['date']} 团队 {change['team']} {change['change']} -> {'、'.join(change['roster'])}")
+
+    for team_id, stats in report["fairness"].items():
+        print(f"\n团队 {team_id}（缺少值班通知 {stats['missing_duty_days']} 天）")
+        for label, key in (("值班", "duty"), ("禅道指派", "bug")):
+            item = stats[key]
+            print(f"  {label}: {item['days']} 天，每人 {item['min_count']}~{item['max_count']} 次，标准差 {item['stdev']}")
+            for person, detail in sorted(item["persons"].items(), key=lambda pair: -pair[1]["count"]):
+                print(f"    {person}: {detail['count']} 次，间隔 {detail['min_gap']}~{detail['max_gap']} 天")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="加速时间模拟：回放定时任务、群内查询和人员变动")
+    parser.add_argument('--start', help="模拟开始日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument('--days', type=int, default=365, help="模拟天数")
+    parser.add_argument('--tick', type=int, default=60, help="调度器每轮间隔（秒）")
+    parser.add_argument('--queries-per-day', type=int, default=3, help="每个团队每天的群内查询次数")
+    parser.add_argument('--roster-change', action='append', type=parse_roster_change, default=[],
+                        help="人员变动 YYYY-MM-DD:+姓名 / YYYY-MM-DD:-姓名，可重复")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="桩服务返回限流错误的比例")
+    parser.add_argument('--seed', type=int, default=0, help="随机数种子")
+    parser.add_argument('--show-messages', action='store_true', help="输出所有本应发送的消息")
+    parser.add_argument('--output', help="把完整报告（含全部消息）写入JSON文件")
+    parser.add_argument('--verbose', action='store_true', help="输出系统日志")
+    args = parser.parse_args(argv)
+
+    try:
+        start = datetime.strptime(args.start, '%Y-%m-%d') if args.start else \
+            datetime.combine(datetime.now().date(), datetime.min.time())
+    except ValueError:
+        print(f"日期格式错误: {args.start}（应为 YYYY-MM-DD）", file=sys.stderr)
+        return 2
+
+    # 在导入业务模块之前调整配置：日志只输出到控制台，升级确认依赖真实时间，模拟时关闭
+    from config.settings import ESCALATION_CONFIG, LOG_CONFIG
+    LOG_CONFIG['file_output'] = False
+    if not args.verbose:
+        LOG_CONFIG['level'] = 'WARNING'
+    ESCALATION_CONFIG['enabled'] = False
+
+    from app import create_app, scheduled_jobs, send_scheduled_notifications
+    from src.services.team_registry import team_registry
+    from src.utils.clock import SimulatedClock, set_clock
+
+    stub = DingTalkStub(fail_rate=args.fail_rate, seed=args.seed).start()
+    workdir = tempfile.mkdtemp(prefix='oncall-sim-')
+    clock = SimulatedClock(start)
+    previous_clock = set_clock(clock)
+    try:
+        simulation = Simulation(team_registry.all(), start, args.days, stub, workdir, args.tick,
+                                args.queries_per_day, args.roster_change, args.seed)
+        app = create_app()
+        started = time.perf_counter()
+        # 钉钉发送模块会直接 print 每次的发送结果，非 verbose 模式下丢弃
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            simulation.run(app, scheduled_jobs(), send_scheduled_notifications, clock)
+        report = simulation.report(time.perf_counter() - started)
+    finally:
+        set_clock(previous_clock)
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report, args.show_messages)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n完整报告已保存: {args.output}")
+
+    mismatched = report["queries"]["mismatches"] or report["queries"]["errors"]
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())